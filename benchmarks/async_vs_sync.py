@@ -0,0 +1,88 @@
+"""
+Compares the sync and the asyncio variants of the DynamoDB enrollment service.
+
+Start one instance of each variant next to DynamoDB Local and Redis, e.g.
+
+    uvicorn ddb_enrollment_service.app:app --port 5100
+    uvicorn ddb_enrollment_service.aio.app:app --port 5110
+
+then run
+
+    python benchmarks/async_vs_sync.py --sync http://localhost:5100 --async http://localhost:5110
+
+For every concurrency level the script keeps that many requests in
+flight against each service for a fixed number of requests, and reports
+throughput and p50/p99 latency. Requests go straight to the services,
+bypassing the gateway, so the x-cwid header is set by the script.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import httpx
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def next_request(class_ids):
+    """Picks a read-heavy mix: catalog browsing and waitlist polling."""
+    class_id = random.choice(class_ids)
+    student_id = random.randint(1, 100000)
+    headers = {"x-cwid": str(student_id)}
+    if random.random() < 0.3:
+        return "GET", "/classes/available/", headers
+    return "GET", f"/waitlist/{class_id}/position/", headers
+
+async def run_level(base_url, concurrency, total_requests, class_ids):
+    latencies = []
+    errors = 0
+    remaining = total_requests
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                method, url, headers = next_request(class_ids)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, headers=headers)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": errors,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync", dest="sync_url", default="http://localhost:5100")
+    parser.add_argument("--async", dest="async_url", default="http://localhost:5110")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 40, 100, 200])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per level and variant")
+    parser.add_argument("--class-ids", nargs="+", default=["1"])
+    args = parser.parse_args()
+
+    print(f"{'variant':<8} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for concurrency in args.concurrency:
+        for name, url in (("sync", args.sync_url), ("async", args.async_url)):
+            result = await run_level(url, concurrency, args.requests, args.class_ids)
+            print(f"{name:<8} {concurrency:>5} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} "
+                  f"{result['p99_ms']:>9.2f} {result['errors']:>7}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Times the database lookup of a login on a generated user database.
+
+Compares the two queries login used to run (the user row, then its
+roles) with the single LOGIN_QUERY statement, once through the index of
+the UNIQUE constraint on username and once through the covering
+user_login_index. Password verification is left out; this is the
+per-login query time only.
+
+    python benchmarks/login_query.py                  # 1M users in a temporary database
+    python benchmarks/login_query.py --users 100000 --db ./var/bench_users.db
+
+A database given with --db is generated once and reused by later runs.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_service.queries import LOGIN_QUERY
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "share", "user_schema.sql")
+
+TWO_QUERIES = (
+    "SELECT id, hashed_password, first_name, last_name FROM user WHERE username=? LIMIT 1",
+    """SELECT roles.role_name
+       FROM roles INNER JOIN user_role ON roles.id = user_role.role_id
+       WHERE user_role.user_id = ? """,
+)
+
+# A realistic pbkdf2_sha256 value, so index entries have their real size
+HASHED_PASSWORD = "pbkdf2_sha256$260000$" + "0" * 32 + "$" + "A" * 43 + "="
+
+def generate(path, users, batch_size=50000):
+    with open(SCHEMA_PATH) as f:
+        schema = f.read()
+    db = sqlite3.connect(path)
+    db.executescript(schema)
+    started = time.perf_counter()
+    for first in range(1, users + 1, batch_size):
+        ids = range(first, min(first + batch_size, users + 1))
+        with db:
+            db.executemany("INSERT INTO user VALUES (?, ?, ?, ?, ?)",
+                           ((n, f"user{n:07d}", HASHED_PASSWORD, f"First{n}", f"Last{n}") for n in ids))
+            # Every user is a student; one in fifty also teaches
+            db.executemany("INSERT INTO user_role VALUES (?, ?)",
+                           ((n, role) for n in ids for role in ((1, 2) if n % 50 == 0 else (1,))))
+    db.execute("ANALYZE")
+    db.close()
+    print(f"Generated {users:,} users in {time.perf_counter() - started:.1f}s")
+
+def two_queries(db, username):
+    user = db.execute(TWO_QUERIES[0], [username]).fetchone()
+    roles = [row[0] for row in db.execute(TWO_QUERIES[1], [user[0]])]
+    return user, roles
+
+# LOGIN_QUERY without the covering index
+UNCOVERED_LOGIN_QUERY = LOGIN_QUERY.replace(" INDEXED BY user_login_index", "")
+
+def single_statement_uncovered(db, username):
+    return db.execute(UNCOVERED_LOGIN_QUERY, [username]).fetchone()
+
+def single_statement(db, username):
+    return db.execute(LOGIN_QUERY, [username]).fetchone()
+
+def time_lookups(db, lookup, usernames):
+    samples = []
+    for username in usernames:
+        started = time.perf_counter()
+        lookup(db, username)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+def query_plan(db, sql):
+    return "; ".join(row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", ["user0000001"]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--logins", type=int, default=20000, help="Lookups timed per variant")
+    parser.add_argument("--db", help="Database to generate or reuse")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="login_query_"), "user.db")
+    if not os.path.exists(path):
+        generate(path, args.users)
+
+    db = sqlite3.connect(path)
+    users = db.execute("SELECT max(id) FROM user").fetchone()[0]
+    rng = random.Random(449)
+    usernames = [f"user{rng.randint(1, users):07d}" for _ in range(args.logins)]
+
+    variants = (
+        ("two queries", two_queries),
+        ("single statement, username index", single_statement_uncovered),
+        ("single statement, covering index", single_statement),
+    )
+    print(f"{'variant':<36} {'median':>10} {'p99':>10}")
+    for name, lookup in variants:
+        time_lookups(db, lookup, usernames[:1000])  # warm the page cache
+        median, p99 = time_lookups(db, lookup, usernames)
+        print(f"{name:<36} {median * 1e6:>8.1f}us {p99 * 1e6:>8.1f}us")
+    print(f"\nplan: {query_plan(db, LOGIN_QUERY)}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
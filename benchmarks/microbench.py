@@ -0,0 +1,420 @@
+"""
+Microbenchmarks for the hot functions of the services.
+
+    python benchmarks/microbench.py run                   # print results
+    python benchmarks/microbench.py run --save-baseline   # record benchmarks/baselines/microbench.json
+    python benchmarks/microbench.py compare               # fail on regressions against the baseline
+
+Like pytest-benchmark, every benchmark is calibrated so that one round
+lasts at least --min-time seconds, then timed for several rounds; the
+median time per call is what gets compared. compare exits with status 1
+when a benchmark got slower than the baseline by more than --threshold.
+
+The enroll and drop handlers run in process against stub DynamoDB,
+waitlist and cache objects, so they measure the handler code only. The
+waitlist benchmarks need a local redis-server and are skipped without
+one. Benchmarks whose dependencies are not installed are skipped too.
+compare also fails when a benchmark was skipped or has no counterpart in
+the baseline, and --save-baseline only records runs of every benchmark.
+Record the baseline on the machine that runs compare, with every
+dependency installed and redis-server running.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_service.queries import LOGIN_QUERY
+
+# user_service reads its settings on import; the database benchmarks pass
+# their own paths, and the others never open the database
+os.environ.setdefault("USER_SERVICE_PRIMARY_DB_PATH", os.devnull)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "microbench.json")
+
+BENCHMARKS = {}
+
+class Skip(Exception):
+    """Raised by a benchmark setup when its environment is missing."""
+
+def benchmark(name, rounds=10):
+    """
+    Registers a benchmark. The decorated function does the setup and
+    returns the zero-argument callable to time.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, rounds)
+        return setup
+    return register
+
+def time_benchmark(func, rounds, min_time):
+    # Calibrate the number of calls per round
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        if time.perf_counter() - started >= min_time:
+            break
+        iterations *= 2
+
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter() - started) / iterations)
+
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": iterations,
+        "ops": 1 / statistics.median(samples),
+    }
+
+# --- user service ---------------------------------------------------------
+
+@benchmark("user.hash_password", rounds=5)
+def bench_hash_password():
+    from user_service.app import hash_password
+    return lambda: hash_password("correct horse battery staple")
+
+@benchmark("user.verify_password", rounds=5)
+def bench_verify_password():
+    from user_service.app import hash_password, verify_password
+    password_hash = hash_password("correct horse battery staple")
+    return lambda: verify_password("correct horse battery staple", password_hash)
+
+@benchmark("user.generate_claims")
+def bench_generate_claims():
+    from user_service.app import generate_claims
+    return lambda: generate_claims("johnsmith", 1, ["Student", "Instructor"], "John", "Smith")
+
+# The database work of login and register, without PBKDF2: the
+# connect_per_request variants open and configure a connection per call,
+# as get_db did before the connection pool, the pooled ones check one out.
+# Both run the LOGIN_QUERY the service runs.
+
+def user_database(users=1000):
+    path = os.path.join(tempfile.mkdtemp(prefix="microbench_"), "user.db")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, "share", "user_schema.sql")) as f, sqlite3.connect(path) as db:
+        db.executescript(f.read())
+        db.executemany("INSERT INTO user VALUES (?, ?, 'hash', 'John', 'Smith')",
+                       [(n, f"user_{n}") for n in range(users)])
+        db.executemany("INSERT INTO user_role VALUES (?, 1)", [(n,) for n in range(users)])
+    return path
+
+def connect_per_request(path):
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA foreign_keys=ON")
+    return db
+
+def login_queries(db):
+    db.execute(LOGIN_QUERY, ["user_500"]).fetchone()
+
+def register_queries(db, user_id):
+    db.execute("INSERT INTO user(id, username, hashed_password, first_name, last_name) VALUES (?, ?, ?, ?, ?)",
+               [user_id, f"user_{user_id}", "hash", "John", "Smith"])
+    db.execute("""INSERT INTO user_role(user_id, role_id)
+                  SELECT ? AS user_id, id AS role_id FROM roles WHERE role_name IN (?)""", [user_id, "Student"])
+    db.commit()
+
+@benchmark("user.db.login.connect_per_request")
+def bench_login_connect_per_request():
+    path = user_database()
+
+    def login():
+        db = connect_per_request(path)
+        try:
+            login_queries(db)
+        finally:
+            db.close()
+    return login
+
+@benchmark("user.db.login.pooled")
+def bench_login_pooled():
+    path = user_database()
+    from user_service.connection_pool import ConnectionPool
+    pool = ConnectionPool(path)
+
+    def login():
+        with pool.connection() as db:
+            login_queries(db)
+    return login
+
+@benchmark("user.db.register.connect_per_request")
+def bench_register_connect_per_request():
+    path = user_database()
+    user_ids = iter(range(10 ** 6, 10 ** 9))
+
+    def register():
+        db = connect_per_request(path)
+        try:
+            register_queries(db, next(user_ids))
+        finally:
+            db.close()
+    return register
+
+@benchmark("user.db.register.pooled")
+def bench_register_pooled():
+    path = user_database()
+    from user_service.connection_pool import ConnectionPool
+    pool = ConnectionPool(path)
+    user_ids = iter(range(10 ** 6, 10 ** 9))
+
+    def register():
+        with pool.connection() as db:
+            register_queries(db, next(user_ids))
+    return register
+
+# --- enrollment handlers against stubs ------------------------------------
+
+class TransactionCanceledException(Exception):
+    def __init__(self, reasons):
+        super().__init__("Transaction cancelled")
+        self.response = {"CancellationReasons": [{"Code": code} for code in reasons]}
+
+class StubClient:
+    class exceptions:
+        TransactionCanceledException = TransactionCanceledException
+        ConditionalCheckFailedException = type("ConditionalCheckFailedException", (Exception,), {})
+
+    def __init__(self, reasons=None):
+        self.reasons = reasons
+
+    def transact_write_items(self, TransactItems):
+        if self.reasons:
+            raise TransactionCanceledException(self.reasons)
+        return {}
+
+class StubTable:
+    def __init__(self, client):
+        self.meta = type("meta", (), {"client": client})
+
+    def update_item(self, **kwargs):
+        return {}
+
+class StubDynamoDB:
+    def __init__(self, reasons=None):
+        self.client = StubClient(reasons)
+
+    def Table(self, table_name):
+        return StubTable(self.client)
+
+class StubWaitlist:
+    def join(self, class_id, student_id, score):
+        return 1, 5
+
+class StubClassCache:
+    def get(self, class_id):
+        return {"id": str(class_id)}
+
+class StubHelper:
+    def is_auto_enroll_enabled(self):
+        return False
+
+@benchmark("enrollment.enroll")
+def bench_enroll():
+    from ddb_enrollment_service.student_router import enroll
+    db = StubDynamoDB()
+    return lambda: enroll(class_id=1, student_id=1, first_name="John", last_name="Smith",
+                          db=db, waitlist=StubWaitlist(), class_cache=StubClassCache())
+
+@benchmark("enrollment.enroll_waitlisted")
+def bench_enroll_waitlisted():
+    from ddb_enrollment_service.student_router import enroll
+    db = StubDynamoDB(reasons=["ConditionalCheckFailed", "None"])
+    return lambda: enroll(class_id=1, student_id=1, first_name="John", last_name="Smith",
+                          db=db, waitlist=StubWaitlist(), class_cache=StubClassCache())
+
+@benchmark("enrollment.drop_class")
+def bench_drop_class():
+    from ddb_enrollment_service.student_router import drop_class
+    db = StubDynamoDB()
+    return lambda: drop_class(class_id=1, student_id=1, db=db, redis_conn=None, ddb_helper=StubHelper())
+
+# --- waitlist operations ----------------------------------------------------
+
+def local_redis():
+    import redis
+    redis_conn = redis.Redis(decode_responses=True)
+    try:
+        redis_conn.ping()
+    except redis.exceptions.ConnectionError:
+        raise Skip("no redis-server on localhost:6379")
+    return redis_conn
+
+@benchmark("waitlist.join")
+def bench_waitlist_join():
+    from ddb_enrollment_service.waitlist import Waitlist
+    redis_conn = local_redis()
+    waitlist = Waitlist(redis_conn, capacity=10 ** 9, max_waitlists_per_student=10 ** 9)
+    student_ids = iter(range(10 ** 9))
+
+    def join():
+        waitlist.join("microbench", next(student_ids), time.time())
+    redis_conn.delete("waitlist_microbench")
+    return join
+
+@benchmark("waitlist.zrank")
+def bench_waitlist_zrank():
+    redis_conn = local_redis()
+    redis_conn.delete("waitlist_microbench")
+    redis_conn.zadd("waitlist_microbench", {f"microbench_{n}": n for n in range(15)})
+    return lambda: redis_conn.zrank("waitlist_microbench", "microbench_7")
+
+# --- item (de)serialization -------------------------------------------------
+
+CLASS_ITEM = {
+    "id": "1", "dept_code": "CPSC", "course_num": 449, "section_no": 1, "academic_year": 2023,
+    "semester": "FA", "instructor_id": 1, "room_num": 101, "room_capacity": 30,
+    "course_start_date": "2023-08-21", "enrollment_start": "2023-06-01 09:00:00",
+    "enrollment_end": "2023-08-15 17:00:00", "enrollment_count": 12, "open_for_enrollment": "Y",
+}
+
+@benchmark("items.serialize_class")
+def bench_serialize_class():
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    return lambda: {k: serializer.serialize(v) for k, v in CLASS_ITEM.items()}
+
+@benchmark("items.deserialize_class")
+def bench_deserialize_class():
+    from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+    serialized = {k: TypeSerializer().serialize(v) for k, v in CLASS_ITEM.items()}
+    deserializer = TypeDeserializer()
+    return lambda: {k: deserializer.deserialize(v) for k, v in serialized.items()}
+
+@benchmark("items.class_metadata")
+def bench_class_metadata():
+    from ddb_enrollment_service.class_cache import class_metadata
+    item = {k: Decimal(v) if isinstance(v, int) else v for k, v in CLASS_ITEM.items()}
+    return lambda: class_metadata(item)
+
+@benchmark("items.jsonable_class_page")
+def bench_jsonable_class_page():
+    from fastapi.encoders import jsonable_encoder
+    page = [{k: Decimal(v) if isinstance(v, int) else v for k, v in CLASS_ITEM.items()}] * 100
+    return lambda: jsonable_encoder({"available_classes": page, "next_cursor": None})
+
+@benchmark("items.cursor_roundtrip")
+def bench_cursor_roundtrip():
+    from ddb_enrollment_service.pagination import encode_cursor, decode_cursor
+    key = {"open_for_enrollment": "Y", "enrollment_end": "2023-08-15 17:00:00", "id": "1"}
+    return lambda: decode_cursor(encode_cursor(key))
+
+# --- commands -----------------------------------------------------------------
+
+def run_benchmarks(selected, min_time):
+    results = {}
+    skipped = {}
+    for name, (setup, rounds) in BENCHMARKS.items():
+        if not is_selected(name, selected):
+            continue
+        try:
+            func = setup()
+        except (Skip, ImportError) as e:
+            print(f"{name:<40} skipped: {e}")
+            skipped[name] = str(e)
+            continue
+        results[name] = time_benchmark(func, rounds, min_time)
+        print(f"{name:<40} {results[name]['median'] * 1e6:>12.2f} us  ({results[name]['ops']:,.0f} ops/s)")
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor()},
+        "benchmarks": results,
+        "skipped": skipped,
+    }
+
+def is_selected(name, selected):
+    return not selected or any(name.startswith(prefix) for prefix in selected)
+
+def compare(results, baseline, threshold, selected=()):
+    """
+    Prints the change of every benchmark against the baseline.
+
+    :return: A (regressed, unmatched) tuple of benchmark names; unmatched
+             ones were skipped in either run, or are missing from the
+             results or the baseline.
+    """
+    regressions = []
+    unmatched = []
+    expected = [name for name in BENCHMARKS if is_selected(name, selected)]
+    for name in expected:
+        result = results["benchmarks"].get(name)
+        baseline_result = baseline["benchmarks"].get(name)
+        if result is None or baseline_result is None:
+            missing = "skipped" if result is None else "no baseline"
+            if name in baseline.get("skipped", {}):
+                missing = "skipped in baseline"
+            unmatched.append(name)
+            print(f"{name:<40} {missing:>12}  UNMATCHED")
+            continue
+        change = result["median"] / baseline_result["median"] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<40} {change:>+12.1%}  {flag}")
+    # Entries of benchmarks that were removed or renamed since
+    for name in sorted(set(baseline["benchmarks"]) - set(BENCHMARKS)):
+        if is_selected(name, selected):
+            unmatched.append(name)
+            print(f"{name:<40} {'removed':>12}  UNMATCHED")
+    return regressions, unmatched
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["run", "compare"])
+    parser.add_argument("benchmarks", nargs="*", help="Name prefixes of the benchmarks to run")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per round")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown, e.g. 0.15 for 15%%")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmarks, args.min_time)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        missing = [name for name in BENCHMARKS if name not in results["benchmarks"]]
+        if missing:
+            sys.exit(f"Not saving a baseline without {', '.join(missing)}; run every benchmark, "
+                     "with every dependency installed and redis-server running")
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.command == "compare":
+        if not os.path.exists(args.baseline):
+            sys.exit(f"No baseline at {args.baseline}; record one with: run --save-baseline")
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        regressions, unmatched = compare(results, baseline, args.threshold, args.benchmarks)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        if unmatched:
+            print(f"\n{len(unmatched)} benchmark(s) not measured in both runs")
+        if regressions or unmatched:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
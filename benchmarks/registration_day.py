@@ -0,0 +1,281 @@
+"""
+Replays a registration-open workload against the enrollment and user services.
+
+The run has four phases:
+
+- login: every load-test user logs in at once
+- enroll: students enroll in classes picked with Zipf-distributed
+  popularity, so a few sections fill up and build waitlists
+- poll: students poll their waitlist positions
+- drop: enrolled students drop classes while polling goes on
+
+Each phase reports throughput, p50/p95/p99 latency, error rate (5xx and
+transport errors; 4xx answers such as "already enrolled" are expected
+and counted as rejected) and DynamoDB calls per request.
+
+By default both services run in this process through ASGI transports,
+which lets the script count the DynamoDB calls of the enrollment
+service. It needs a local redis-server and either DynamoDB Local with
+the tables created (bin/create-enrollment-ddb.sh) or --moto, which
+serves the tables from an in-process moto server on --moto-port (the
+DynamoDB Local port by default) and points the in-process enrollment
+service at it. --moto needs moto's server extra, which is not in
+requirements.txt:
+
+    pip install "moto[server]"
+    python benchmarks/registration_day.py --moto --students 500 --classes 50
+
+The in-process user service uses the database named in .env.
+
+The classes, users and enrollments a run creates are left behind. Each
+run takes its class and student IDs from its own range, starting at
+--id-base (by default derived from the current time), so runs against
+the same databases do not collide.
+
+Pass --enrollment-url and --user-url to load running services instead;
+DynamoDB calls are then not counted.
+"""
+import argparse
+import asyncio
+import bisect
+import contextlib
+import itertools
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Class and student IDs of a run are id_base + 0..ID_RANGE-1
+ID_RANGE = 100000
+PASSWORD = "load-test"
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class Zipf:
+    """Samples ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s."""
+
+    def __init__(self, n, s=1.1, rng=random):
+        self.cumulative = list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(n)))
+        self.rng = rng
+
+    def sample(self):
+        return bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+class CallCounter:
+    """Counts the DynamoDB API calls made by a botocore client."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        # The in-process service makes its calls from worker threads
+        with self._lock:
+            self.calls += 1
+
+    def attach(self, client):
+        client.meta.events.register("before-call.dynamodb", self)
+
+class PhaseResult:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.rejected = 0
+        self.elapsed = 0.0
+        self.dynamodb_calls = None
+
+    def record(self, started, response=None):
+        self.latencies.append(time.perf_counter() - started)
+        if response is None or response.status_code >= 500:
+            self.errors += 1
+        elif response.status_code >= 400:
+            self.rejected += 1
+
+    def row(self):
+        count = len(self.latencies)
+        if not count:
+            return f"{self.name:<8} {0:>7}"
+        calls = f"{self.dynamodb_calls / count:>9.2f}" if self.dynamodb_calls is not None else f"{'n/a':>9}"
+        return (f"{self.name:<8} {count:>7} {count / self.elapsed:>9.1f} "
+                f"{statistics.median(self.latencies) * 1000:>8.1f} {percentile(self.latencies, 95) * 1000:>8.1f} "
+                f"{percentile(self.latencies, 99) * 1000:>8.1f} {self.errors / count:>7.2%} "
+                f"{self.rejected / count:>8.2%} {calls}")
+
+HEADER = (f"{'phase':<8} {'reqs':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'errors':>7} {'rejected':>8} {'ddb/req':>9}")
+
+async def run_phase(name, requests, concurrency, counter=None):
+    """
+    Sends the requests with at most concurrency of them in flight.
+
+    :param requests: An iterable of zero-argument coroutine functions
+                     returning an httpx.Response.
+    """
+    result = PhaseResult(name)
+    requests = iter(requests)
+    calls_before = counter.calls if counter else 0
+
+    async def worker():
+        for send in requests:
+            started = time.perf_counter()
+            try:
+                response = await send()
+            except httpx.HTTPError:
+                response = None
+            result.record(started, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    if counter:
+        result.dynamodb_calls = counter.calls - calls_before
+    return result
+
+def class_body(class_id, capacity):
+    now = datetime.now()
+    return {
+        "id": str(class_id), "dept_code": "LOAD", "course_num": 100, "section_no": class_id % 100,
+        "academic_year": now.year, "semester": "FA", "instructor_id": 1, "room_num": 100,
+        "room_capacity": capacity, "course_start_date": (now + timedelta(days=30)).strftime("%Y-%m-%d"),
+        "enrollment_start": (now - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"),
+        "enrollment_end": (now + timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def student_headers(student_id):
+    return {"x-cwid": str(student_id), "x-first-name": "Load", "x-last-name": f"Student{student_id}"}
+
+@contextlib.contextmanager
+def moto_server(port):
+    import boto3
+    from moto.server import ThreadedMotoServer
+    server = ThreadedMotoServer(port=port)
+    server.start()
+    endpoint_url = f"http://localhost:{port}"
+    # Read by ddb_enrollment_service.db_connection, imported after this
+    os.environ["DYNAMODB_ENDPOINT_URL"] = endpoint_url
+    try:
+        from ddb_enrollment_service import ddb_enrollment_schema as schema
+        resource = boto3.resource("dynamodb", region_name="local", endpoint_url=endpoint_url)
+        for table_class, table_name in ((schema.Class, "class_table"), (schema.Configs, "configs_table"),
+                                        (schema.Enrollment, "enrollment_table"), (schema.Course, "course_table"),
+                                        (schema.Droplist, "droplist_table")):
+            table_class(resource).create_table(table_name)
+        yield
+    finally:
+        server.stop()
+
+@contextlib.asynccontextmanager
+async def service_client(url, app_path, counter=None):
+    """Yields a client for a running service, or for the app run in process."""
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+            yield client
+        return
+
+    if app_path == "enrollment":
+        from ddb_enrollment_service.app import app
+    else:
+        from user_service.app import app
+    async with app.router.lifespan_context(app):
+        if counter and hasattr(app.state, "dynamodb"):
+            counter.attach(app.state.dynamodb.client)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30) as client:
+            yield client
+
+async def run(args):
+    rng = random.Random(args.seed)
+    zipf = Zipf(args.classes, args.zipf, rng)
+    id_base = args.id_base if args.id_base is not None else int(time.time()) * ID_RANGE
+    print(f"Class and student IDs start at {id_base}", file=sys.stderr)
+    class_ids = [id_base + n for n in range(args.classes)]
+    student_ids = [id_base + n for n in range(args.students)]
+    counter = None if args.enrollment_url else CallCounter()
+
+    async with service_client(args.enrollment_url, "enrollment", counter) as enrollment, \
+               service_client(args.user_url, "user") as users:
+        # Setup: classes sized so the popular ones overflow into waitlists
+        for class_id in class_ids:
+            response = await enrollment.post("/classes/", json=class_body(class_id, args.capacity))
+            if response.status_code != 201:
+                sys.exit(f"Creating class {class_id} failed: {response.status_code} {response.text}")
+        registered = await run_phase("register", (
+            lambda student_id=student_id: users.post("/register/", json={
+                "id": student_id, "username": f"loadtest{student_id}", "password": PASSWORD,
+                "first_name": "Load", "last_name": f"Student{student_id}", "roles": ["Student"],
+            }) for student_id in student_ids
+        ), args.concurrency)
+        if registered.errors or registered.rejected:
+            sys.exit(f"Registering students failed: {registered.errors} errors, {registered.rejected} rejected")
+
+        results = [await run_phase("login", (
+            lambda student_id=student_id: users.post("/login/", json={
+                "username": f"loadtest{student_id}", "password": PASSWORD,
+            }) for student_id in student_ids
+        ), args.concurrency)]
+
+        enrollments = [(student_id, class_ids[zipf.sample()])
+                       for student_id in student_ids for _ in range(args.enrollments_per_student)]
+        results.append(await run_phase("enroll", (
+            lambda student_id=student_id, class_id=class_id: enrollment.post(
+                "/enrollment/", json={"class_id": class_id}, headers=student_headers(student_id))
+            for student_id, class_id in enrollments
+        ), args.concurrency, counter))
+
+        results.append(await run_phase("poll", (
+            lambda student_id=rng.choice(student_ids): enrollment.get(
+                "/waitlist/positions/", headers=student_headers(student_id))
+            for _ in range(args.polls)
+        ), args.concurrency, counter))
+
+        drops = rng.sample(enrollments, int(len(enrollments) * args.drop_ratio))
+
+        def drops_and_polls():
+            for student_id, class_id in drops:
+                yield lambda student_id=student_id, class_id=class_id: enrollment.delete(
+                    f"/enrollment/{class_id}", headers=student_headers(student_id))
+                yield lambda student_id=rng.choice(student_ids): enrollment.get(
+                    "/waitlist/positions/", headers=student_headers(student_id))
+
+        results.append(await run_phase("drop", drops_and_polls(), args.concurrency, counter))
+
+    print(HEADER)
+    for result in results:
+        print(result.row())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--enrollment-url", help="A running enrollment service (default: in process)")
+    parser.add_argument("--user-url", help="A running user service (default: in process)")
+    parser.add_argument("--moto", action="store_true", help="Serve DynamoDB from an in-process moto server")
+    parser.add_argument("--moto-port", type=int, default=5300)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--capacity", type=int, default=30)
+    parser.add_argument("--enrollments-per-student", type=int, default=3)
+    parser.add_argument("--polls", type=int, default=2000)
+    parser.add_argument("--drop-ratio", type=float, default=0.1)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of class popularity")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=449)
+    parser.add_argument("--id-base", type=int,
+                        help=f"First class and student ID (default: the current time * {ID_RANGE})")
+    args = parser.parse_args()
+    if max(args.students, args.classes) > ID_RANGE:
+        parser.error(f"--students and --classes are limited to {ID_RANGE}")
+
+    with moto_server(args.moto_port) if args.moto else contextlib.nullcontext():
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# One-off: add the missing indexes and enrollment_count to tables created by an older version
+python -m ddb_enrollment_service.enrollment_count_backfill
@@ -36,8 +36,11 @@ insert_if_not_exists "ENROLLMENT_SERVICE_DB_PATH" '"./var/enrollment_local.db"'
 insert_if_not_exists "USER_SERVICE_PRIMARY_DB_PATH" '"./var/primary/fuse/user.db"'
 insert_if_not_exists "USER_SERVICE_SECONDARY_DB_PATH" '"./var/secondary/fuse/user.db"'
 insert_if_not_exists "USER_SERVICE_TERTIARY_DB_PATH" '"./var/tertiary/fuse/user.db"'
+insert_if_not_exists "USER_SERVICE_PRIMARY_URL" '"http://localhost:5200"'
+insert_if_not_exists "USER_SERVICE_LOCAL_INSTANCES" '3'
 insert_if_not_exists "DYNAMODB_LIBRARY_PATH" '"./lib"'
 insert_if_not_exists "DYNAMODB_DATABASE_PATH" '"./var"'
 insert_if_not_exists "AWS_ACCESS_KEY_ID" '"enrollment"'
 insert_if_not_exists "AWS_SECRET_ACCESS_KEY" '"123456"'
-insert_if_not_exists "AWS_REGION_NAME" '"local"'
\ No newline at end of file
+insert_if_not_exists "AWS_REGION_NAME" '"local"'
+insert_if_not_exists "PROMETHEUS_MULTIPROC_DIR" '"./var/prometheus"'
\ No newline at end of file
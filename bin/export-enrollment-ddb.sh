@@ -0,0 +1,3 @@
+#!/bin/bash
+
+python ddb_enrollment_service/ddb_enrollment_export.py "$@"
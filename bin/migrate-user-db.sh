@@ -0,0 +1,28 @@
+#!/bin/bash
+
+ENV_FILE=".env"
+
+# Check if ENV_FILE exists
+if [ ! -f $ENV_FILE ]; then
+	echo "\e[31mError: .env File Not Found\e[0m"
+	echo "To create .env file, run this command:"
+	echo '   "sh ./bin/create-dotenv.sh"'
+	exit 1
+fi
+
+# Load ENV_FILE
+export $(grep -v '^#' $ENV_FILE | xargs)
+
+if [ ! -f $USER_SERVICE_PRIMARY_DB_PATH ]; then
+	echo "Error: User database does not exist."
+	exit 1
+fi
+
+# Brings a database created from an older share/user_schema.sql up to date.
+# Run against the primary; LiteFS replicates the changes.
+sqlite3 $USER_SERVICE_PRIMARY_DB_PATH <<SQL
+CREATE INDEX IF NOT EXISTS user_login_index ON user(username, hashed_password, first_name, last_name);
+ANALYZE;
+SQL
+
+echo "User database has been migrated."
@@ -0,0 +1,47 @@
+import contextlib
+import redis.asyncio
+from fastapi import FastAPI
+from .db_connection import AsyncDynamoDB
+from .ddb_enrollment_helper import AsyncDynamoDBRedisHelper
+from ..configs import AsyncConfigStore
+from ..waitlist import AsyncWaitlist
+from ..tracing import tracing_middleware
+from ..metrics import AsyncInstrumentedRedis, instrument_dynamodb, mark_process_dead, metrics_middleware, metrics_router
+from .student_router import student_router
+from .instructor_router import instructor_router
+from .registrar_router import registrar_router
+
+# Requests no longer hold a thread while they wait on DynamoDB or Redis,
+# so the pools are sized for in-flight calls rather than threads.
+MAX_POOL_CONNECTIONS = 200
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.dynamodb = AsyncDynamoDB(max_pool_connections=MAX_POOL_CONNECTIONS)
+    await app.state.dynamodb.open()
+    instrument_dynamodb(app.state.dynamodb.client)
+    app.state.redis = AsyncInstrumentedRedis(
+        connection_pool=redis.asyncio.BlockingConnectionPool(max_connections=MAX_POOL_CONNECTIONS, decode_responses=True)
+    )
+    app.state.configs = AsyncConfigStore(app.state.dynamodb, app.state.redis)
+    await app.state.configs.start()
+    app.state.waitlist = AsyncWaitlist(app.state.redis)
+    app.state.ddb_helper = AsyncDynamoDBRedisHelper(app.state.dynamodb, app.state.redis, app.state.configs)
+    yield
+    await app.state.configs.stop()
+    await app.state.redis.aclose()
+    await app.state.redis.connection_pool.disconnect()
+    await app.state.dynamodb.close()
+    mark_process_dead()
+
+# Create the asyncio variant of the enrollment service
+app = FastAPI(lifespan=lifespan)
+
+app.middleware("http")(tracing_middleware)
+app.middleware("http")(metrics_middleware)
+
+# Attach the routers to the main application
+app.include_router(metrics_router)
+app.include_router(student_router)
+app.include_router(instructor_router)
+app.include_router(registrar_router)
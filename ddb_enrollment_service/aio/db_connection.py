@@ -0,0 +1,111 @@
+import contextlib
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from boto3.dynamodb.transform import TransformationInjector, copy_dynamodb_params
+from boto3.dynamodb.types import TypeDeserializer
+from fastapi import Request
+from ..db_connection import DYNAMODB_ENDPOINT_URL, DYNAMODB_REGION_NAME, DEFAULT_MAX_POOL_CONNECTIONS
+
+class AsyncTable:
+    """Minimal asyncio counterpart of a boto3 Table resource."""
+
+    def __init__(self, client, table_name):
+        self.client = client
+        self.name = table_name
+
+    async def get_item(self, **kwargs):
+        return await self.client.get_item(TableName=self.name, **kwargs)
+
+    async def put_item(self, **kwargs):
+        return await self.client.put_item(TableName=self.name, **kwargs)
+
+    async def update_item(self, **kwargs):
+        return await self.client.update_item(TableName=self.name, **kwargs)
+
+    async def delete_item(self, **kwargs):
+        return await self.client.delete_item(TableName=self.name, **kwargs)
+
+    async def query(self, **kwargs):
+        return await self.client.query(TableName=self.name, **kwargs)
+
+    async def scan(self, **kwargs):
+        return await self.client.scan(TableName=self.name, **kwargs)
+
+class AsyncDynamoDB:
+    """Process-wide asyncio DynamoDB data access object.
+
+    Wraps one aiobotocore client with a keep-alive connection pool. The
+    client is given the same parameter transformations boto3 installs on
+    resources, so it accepts and returns native Python values and
+    boto3.dynamodb.conditions expressions, exactly like DynamoDB.client.
+    """
+
+    def __init__(self, endpoint_url=DYNAMODB_ENDPOINT_URL, region_name=DYNAMODB_REGION_NAME,
+                 max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS):
+        """
+        :param endpoint_url: The DynamoDB endpoint.
+        :param region_name: The AWS region name.
+        :param max_pool_connections: Size of the HTTP connection pool. Should
+                                     match the expected number of concurrent calls.
+        """
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self.config = AioConfig(
+            max_pool_connections=max_pool_connections,
+            connect_timeout=2,
+            read_timeout=5,
+            retries={"max_attempts": 3, "mode": "standard"},
+            connector_args={"keepalive_timeout": 60},
+        )
+        self.session = get_session()
+        self.client = None
+        self._tables = {}
+        self._exit_stack = contextlib.AsyncExitStack()
+
+    async def open(self):
+        self.client = await self._exit_stack.enter_async_context(
+            self.session.create_client(
+                'dynamodb',
+                region_name=self.region_name,
+                endpoint_url=self.endpoint_url,
+                config=self.config,
+            )
+        )
+
+        injector = TransformationInjector(deserializer=TypeDeserializer())
+        events = self.client.meta.events
+        events.register('provide-client-params.dynamodb', copy_dynamodb_params)
+        events.register('before-parameter-build.dynamodb', injector.inject_condition_expressions)
+        events.register('before-parameter-build.dynamodb', injector.inject_attribute_value_input)
+        events.register('after-call.dynamodb', injector.inject_attribute_value_output)
+
+    async def close(self):
+        self._tables.clear()
+        await self._exit_stack.aclose()
+
+    def Table(self, table_name):
+        """
+        Returns a cached AsyncTable handle.
+
+        :param table_name: The name of the table.
+        """
+        # No lock needed: everything runs on the event loop thread
+        table = self._tables.get(table_name)
+        if table is None:
+            table = self._tables[table_name] = AsyncTable(self.client, table_name)
+        return table
+
+def get_db(request: Request) -> AsyncDynamoDB:
+    return request.app.state.dynamodb
+
+def get_redis_db(request: Request):
+    return request.app.state.redis
+
+def get_ddb_helper(request: Request):
+    return request.app.state.ddb_helper
+
+def get_configs(request: Request):
+    return request.app.state.configs
+
+def get_waitlist(request: Request):
+    return request.app.state.waitlist
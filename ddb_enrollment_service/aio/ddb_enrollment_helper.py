@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime
+from ..waitlist import AsyncWaitlist
+from ..ddb_enrollment_helper import (enrollment_count_claim, enrollment_put, cancellation_reasons,
+                                     available_seats, promotion_batches, chunks, backoff_delay,
+                                     BATCH_GET_SIZE, MAX_BATCH_ATTEMPTS, OPEN_FOR_ENROLLMENT)
+
+async def close_class_for_enrollment(class_table, class_id):
+    """
+    Removes a full class from the open classes index. The condition
+    guards against a seat having been freed in the meantime.
+
+    :param class_table: The class_table AsyncTable handle.
+    :param class_id: The ID of the class.
+    """
+    try:
+        await class_table.update_item(
+            Key={"id": str(class_id)},
+            UpdateExpression="REMOVE open_for_enrollment",
+            ConditionExpression="enrollment_count >= room_capacity",
+        )
+    except class_table.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+async def reopen_class_for_enrollment(class_table, class_id):
+    """
+    Asyncio counterpart of reopen_class_for_enrollment.
+
+    :param class_table: The class_table AsyncTable handle.
+    :param class_id: The ID of the class.
+    """
+    try:
+        await class_table.update_item(
+            Key={"id": str(class_id)},
+            UpdateExpression="SET open_for_enrollment = :open",
+            ConditionExpression="attribute_exists(id)",
+            ExpressionAttributeValues={":open": OPEN_FOR_ENROLLMENT},
+        )
+    except class_table.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+async def batch_get_classes(dynamodb, class_ids):
+    """
+    Asyncio counterpart of batch_get_classes. The chunks are fetched
+    concurrently.
+    """
+    async def get_chunk(chunk):
+        items = []
+        request_items = {"class_table": {"Keys": [{"id": class_id} for class_id in chunk]}}
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            response = await dynamodb.client.batch_get_item(RequestItems=request_items)
+            items.extend(response["Responses"].get("class_table", []))
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                return items
+            await asyncio.sleep(backoff_delay(attempt))
+        raise RuntimeError(f"Couldn't fetch {len(request_items['class_table']['Keys'])} classes")
+
+    results = await asyncio.gather(*(get_chunk(chunk) for chunk in chunks(sorted(set(map(str, class_ids))), BATCH_GET_SIZE)))
+    return {item["id"]: item for items in results for item in items}
+
+class AsyncDynamoDBRedisHelper:
+    def __init__(self, dynamodb, redis_conn, configs):
+        """
+        :param dynamodb: The shared AsyncDynamoDB data access object.
+        :param redis_conn: A redis.asyncio client.
+        :param configs: The AsyncConfigStore holding configs_table in memory.
+        """
+        self.dynamodb = dynamodb
+        self.redis_conn = redis_conn
+        self.configs = configs
+        self.waitlist = AsyncWaitlist(redis_conn)
+
+    async def is_auto_enroll_enabled(self):
+        return await self.configs.get("automatic_enrollment", False) is True
+
+    async def enroll_students_from_waitlist(self, class_id_list):
+        counts = await asyncio.gather(*(self._enroll_class_from_waitlist(class_id) for class_id in class_id_list))
+        return sum(counts)
+
+    async def _enroll_class_from_waitlist(self, class_id):
+        class_table = self.dynamodb.Table("class_table")
+        class_response = await class_table.get_item(Key={"id": str(class_id)})
+        class_info = class_response.get("Item", {})
+
+        claims = await self.waitlist.claim(class_id, available_seats(class_info))
+        batches = promotion_batches(claims)
+        enrollment_count = 0
+
+        for index, batch in enumerate(batches):
+            try:
+                enrolled, unplaced = await self._persist_promotions(class_id, batch, class_info["room_capacity"])
+            except Exception:
+                await self.waitlist.restore(class_id, [claim for rest in batches[index:] for claim in rest])
+                raise
+            enrollment_count += enrolled
+            if unplaced:
+                await self.waitlist.restore(class_id, unplaced + [claim for rest in batches[index + 1:] for claim in rest])
+                break
+
+        if enrollment_count and "open_for_enrollment" not in class_info:
+            await reopen_class_for_enrollment(class_table, class_id)
+
+        return enrollment_count
+
+    async def _persist_promotions(self, class_id, batch, room_capacity):
+        client = self.dynamodb.client
+        enrollment_date = datetime.now().isoformat()
+
+        while batch:
+            try:
+                await client.transact_write_items(TransactItems=[
+                    enrollment_count_claim(class_id, len(batch), room_capacity),
+                    *(enrollment_put(class_id, student_id, enrollment_date) for student_id, _ in batch),
+                ])
+            except client.exceptions.TransactionCanceledException as e:
+                seat_reason, *enrollment_reasons = cancellation_reasons(e)
+                if seat_reason == "ConditionalCheckFailed":
+                    return 0, batch
+                enrolled = {student_id for (student_id, _), reason in zip(batch, enrollment_reasons)
+                            if reason == "ConditionalCheckFailed"}
+                if not enrolled:
+                    raise
+                batch = [claim for claim in batch if claim[0] not in enrolled]
+            else:
+                return len(batch), []
+
+        return 0, []
@@ -0,0 +1,143 @@
+from typing import Optional
+from datetime import datetime
+import botocore
+import redis.asyncio
+from fastapi import Depends, HTTPException, Query, status, APIRouter
+from boto3.dynamodb.conditions import Key
+from .db_connection import AsyncDynamoDB, get_db, get_redis_db
+from ..ddb_enrollment_helper import enrollment_count_update, cancellation_reasons
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, async_query_page, async_iter_query, ndjson_response
+
+instructor_router = APIRouter()
+
+@instructor_router.get("/classes/{class_id}/students")
+async def get_current_enrollment(class_id: str,
+                                 limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                 cursor: Optional[str] = None,
+                                 response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                                 db: AsyncDynamoDB = Depends(get_db)):
+    """
+    Retreive current enrollment for the classes.
+
+    Parameters:
+    - class_id (int): The ID of the class.
+    - limit (int, in the query string): The maximum number of students per page.
+    - cursor (str, in the query string): The next_cursor of the previous page.
+    - format (str, in the query string): "json" for one page, "ndjson" to stream every student.
+
+    Returns:
+    - dict: A page of students and the cursor of the next page (null on the last page),
+      or an NDJSON stream of all of them.
+    """
+    table = db.Table("enrollment_table")
+    key_condition = Key('class_id').eq(str(class_id))
+
+    if response_format == "ndjson":
+        return ndjson_response(async_iter_query(table, page_size=limit, KeyConditionExpression=key_condition))
+
+    try:
+        items, next_cursor = await async_query_page(table, limit, cursor, KeyConditionExpression=key_condition)
+        return {'Items': items, 'next_cursor': next_cursor}
+
+    except botocore.exceptions.ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving enrollment: {str(e)}")
+
+@instructor_router.get("/classes/{class_id}/waitlist/")
+async def get_waitlist(class_id: str, redis_conn: redis.asyncio.Redis = Depends(get_redis_db)):
+    """
+    Retreive current waiting list for the class.
+
+    Parameters:
+    - class_id (int): The ID of the class.
+
+    Returns:
+    - dict: A dictionary containing the details of the classes
+    """
+    try:
+        return {"waitlist" : await redis_conn.zrange(f"waitlist_{class_id}", 0, -1)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving waitlist: {str(e)}")
+
+@instructor_router.get("/classes/{class_id}/droplist/")
+async def get_droplist(class_id: str,
+                       limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                       cursor: Optional[str] = None,
+                       response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                       db: AsyncDynamoDB = Depends(get_db)):
+    """
+    Retreive students who have dropped the class.
+
+    Parameters:
+    - class_id (int): The ID of the class.
+    - limit (int, in the query string): The maximum number of students per page.
+    - cursor (str, in the query string): The next_cursor of the previous page.
+    - format (str, in the query string): "json" for one page, "ndjson" to stream every student.
+
+    Returns:
+    - dict: A page of students and the cursor of the next page (null on the last page),
+      or an NDJSON stream of all of them.
+    """
+    table = db.Table("droplist_table")
+    key_condition = Key('class_id').eq(str(class_id))
+
+    if response_format == "ndjson":
+        return ndjson_response(async_iter_query(table, page_size=limit, KeyConditionExpression=key_condition))
+
+    try:
+        items, next_cursor = await async_query_page(table, limit, cursor, KeyConditionExpression=key_condition)
+        return {'Items': items, 'next_cursor': next_cursor}
+
+    except botocore.exceptions.ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving drop list: {str(e)}")
+
+@instructor_router.delete("/enrollment/{class_id}/{student_id}/administratively/", status_code=status.HTTP_200_OK)
+async def drop_class(class_id: str, student_id: str, db: AsyncDynamoDB = Depends(get_db)):
+    """
+    Handles a DELETE request to administratively drop a student from a specific class.
+
+    Parameters:
+    - class_id (int): The ID of the class from which the student is being administratively dropped.
+    - student_id (int): The ID of the student being administratively dropped.
+
+    Returns:
+    - dict: A dictionary with the detail message indicating the success of the administrative drop.
+
+    Raises:
+    - HTTPException (404): If the student is not enrolled in the class.
+    - HTTPException (409): If there is a conflict in the delete operation.
+    """
+    transact_items = [
+        {
+            'Delete': {
+                'TableName': 'enrollment_table',
+                'Key': {'class_id': class_id, 'student_id': student_id},
+                'ConditionExpression': 'attribute_exists(student_id)'
+            }
+        },
+        enrollment_count_update(class_id, -1),
+        {
+            'Put': {
+                'TableName': 'droplist_table',
+                'Item': {
+                    'class_id': class_id,
+                    'student_id': student_id,
+                    'drop_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'administrative': True
+                }
+            }
+        }
+    ]
+
+    try:
+        await db.client.transact_write_items(TransactItems=transact_items)
+    except db.client.exceptions.TransactionCanceledException as e:
+        if "ConditionalCheckFailed" in cancellation_reasons(e):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Record Not Found")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"type": type(e).__name__, "msg": str(e)},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error dropping student: {str(e)}")
+
+    return {"detail": "Item deleted successfully"}
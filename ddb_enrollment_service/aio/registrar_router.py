@@ -0,0 +1,177 @@
+from typing import Annotated
+import asyncio
+import redis.asyncio
+from fastapi import Depends, Request, HTTPException, Body, status, APIRouter
+from .db_connection import AsyncDynamoDB, get_db, get_redis_db, get_configs
+from ..configs import AsyncConfigStore
+from ..class_cache import async_invalidate_class
+from ..models import Course, ClassCreate, ClassPatch
+from ..ddb_enrollment_helper import new_class_item, new_course_item, class_patch_update
+from ..bulk_import import BulkImport, iter_rows, async_batch_write
+
+registrar_router = APIRouter()
+
+@registrar_router.put("/auto-enrollment/")
+async def set_auto_enrollment(enabled: Annotated[bool, Body(embed=True)], db: AsyncDynamoDB = Depends(get_db),
+                              configs: AsyncConfigStore = Depends(get_configs)):
+    """
+    Endpoint for enabling/disabling automatic enrollment.
+
+    Parameters:
+    - enabled (bool): A boolean indicating whether automatic enrollment should be enabled or disabled.
+
+    Returns:
+        dict: A dictionary containing a detail message confirming the status of auto enrollment.
+    """
+    try:
+        await db.Table('configs_table').put_item(
+            Item={
+                'variable_name': 'automatic_enrollment',
+                'value': enabled,
+            }
+        )
+        # Every instance keeps configs_table in memory; tell them to reload
+        await configs.publish_change('automatic_enrollment')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error setting auto enrollment: {str(e)}")
+
+    return {"detail": f"Auto enrollment: {enabled}"}
+
+@registrar_router.post("/classes/", status_code=status.HTTP_201_CREATED)
+async def create_class(body_data: ClassCreate, db: AsyncDynamoDB = Depends(get_db),
+                       redis_conn: redis.asyncio.Redis = Depends(get_redis_db)):
+    """
+    Creates a new class.
+
+    Parameters:
+    - `class` (ClassCreate): The JSON object representing the class.
+
+    Returns:
+    - dict: A dictionary containing the details of the created item.
+    """
+    try:
+        item_to_add = new_class_item(body_data)
+        await db.Table("class_table").put_item(Item=item_to_add)
+        await async_invalidate_class(redis_conn, item_to_add["id"])
+
+        return {"added to class table": item_to_add}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating class: {str(e)}")
+
+@registrar_router.post("/courses/", status_code=status.HTTP_201_CREATED)
+async def create_course(course: Course, db: AsyncDynamoDB = Depends(get_db)):
+    """
+    Creates a new course with the provided details.
+
+    Parameters:
+    - `course` (Course): JSON body input for the course.
+
+    Returns:
+    - dict: A dictionary containing the details of the created item.
+    """
+    try:
+        await db.Table('course_table').put_item(Item=new_course_item(course))
+
+        return {"Course created"}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating course: {str(e)}")
+
+@registrar_router.post("/classes/bulk", status_code=status.HTTP_200_OK)
+async def bulk_create_classes(request: Request, db: AsyncDynamoDB = Depends(get_db),
+                              redis_conn: redis.asyncio.Redis = Depends(get_redis_db)):
+    """
+    Creates many classes from an NDJSON or CSV upload.
+
+    Returns:
+    - dict: The number of created, invalid, conflicting and failed
+      rows, and the status of every row. Rows whose key already
+      exists are conflicts; existing items are never replaced.
+    """
+    async def write(rows):
+        failures = await async_batch_write(db, "class_table", bulk_import, rows)
+        await asyncio.gather(*(async_invalidate_class(redis_conn, item["id"])
+                               for row_number, item in rows if row_number not in failures))
+        return failures
+
+    bulk_import = BulkImport(ClassCreate, new_class_item, ("id",))
+    async for row_number, row in iter_rows(request):
+        if bulk_import.add(row_number, row):
+            rows = bulk_import.take_pending()
+            bulk_import.record(rows, await write(rows))
+    rows = bulk_import.take_pending()
+    bulk_import.record(rows, await write(rows))
+
+    return bulk_import.summary()
+
+@registrar_router.post("/courses/bulk", status_code=status.HTTP_200_OK)
+async def bulk_create_courses(request: Request, db: AsyncDynamoDB = Depends(get_db)):
+    """
+    Creates many courses from an NDJSON or CSV upload.
+
+    Returns:
+    - dict: The number of created, invalid, conflicting and failed
+      rows, and the status of every row. Rows whose key already
+      exists are conflicts; existing items are never replaced.
+    """
+    bulk_import = BulkImport(Course, new_course_item, ("department_code", "course_no"))
+    async for row_number, row in iter_rows(request):
+        if bulk_import.add(row_number, row):
+            rows = bulk_import.take_pending()
+            bulk_import.record(rows, await async_batch_write(db, "course_table", bulk_import, rows))
+    rows = bulk_import.take_pending()
+    bulk_import.record(rows, await async_batch_write(db, "course_table", bulk_import, rows))
+
+    return bulk_import.summary()
+
+@registrar_router.delete("/classes/{id}", status_code=status.HTTP_200_OK)
+async def delete_class(id: int, db: AsyncDynamoDB = Depends(get_db),
+                       redis_conn: redis.asyncio.Redis = Depends(get_redis_db)):
+    """
+    Deletes a specific class.
+
+    Parameters:
+    - `id` (int): The ID of the class to delete.
+
+    Returns:
+    - dict: A dictionary indicating the success of the deletion operation.
+    """
+    try:
+        await db.Table('class_table').delete_item(Key={'id': str(id)})
+        await async_invalidate_class(redis_conn, id)
+
+        return {"message": "Item deleted successfully"}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting class: {str(e)}")
+
+@registrar_router.patch("/classes/{id}", status_code=status.HTTP_200_OK)
+async def update_class(id: int, body_data: ClassPatch, db: AsyncDynamoDB = Depends(get_db),
+                       redis_conn: redis.asyncio.Redis = Depends(get_redis_db)):
+    """
+    Updates specific details of a class.
+
+    Parameters:
+    - `class` (ClassPatch): The JSON object with the fields to update.
+
+    Returns:
+    - dict: A dictionary indicating the success of the update operation.
+
+    Raises:
+    - HTTPException (404): If the class with the specified ID is not found.
+    """
+    fields = body_data.model_dump(exclude_none=True)
+    if not fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    try:
+        await db.Table('class_table').update_item(**class_patch_update(id, fields))
+        await async_invalidate_class(redis_conn, id)
+
+        return {"message": "Item updated successfully"}
+
+    except db.client.exceptions.ConditionalCheckFailedException:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Class Not Found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating item: {str(e)}")
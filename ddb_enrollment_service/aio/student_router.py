@@ -0,0 +1,292 @@
+from typing import Annotated, Optional
+import asyncio
+import time
+import botocore
+import redis.asyncio
+from fastapi import Depends, HTTPException, Header, Body, Query, status, APIRouter
+from boto3.dynamodb.conditions import Key, Attr
+from datetime import datetime
+from .db_connection import AsyncDynamoDB, get_db, get_redis_db, get_ddb_helper, get_waitlist
+from .ddb_enrollment_helper import (AsyncDynamoDBRedisHelper, close_class_for_enrollment,
+                                   reopen_class_for_enrollment, batch_get_classes)
+from ..ddb_enrollment_helper import (OPEN_CLASSES_INDEX, OPEN_FOR_ENROLLMENT, enrollment_count_update,
+                                     enrollment_put, cancellation_reasons, student_enrollments_query)
+from ..seat_events import async_publish_seat_freed
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, async_query_page, async_iter_query, ndjson_response
+from ..waitlist import (AsyncWaitlist, MAX_NUMBER_OF_WAITLISTS_PER_STUDENT, JOINED, WAITLIST_FULL,
+                        TOO_MANY_WAITLISTS, REMOVED_FROM_FULL)
+
+student_router = APIRouter()
+
+@student_router.get("/classes/available/")
+async def get_available_classes(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    db: AsyncDynamoDB = Depends(get_db)):
+    """
+    Retreive classes that are in their enrollment window and still
+    have seats or waitlist room.
+
+    Parameters:
+    - limit (int, in the query string): The maximum number of classes to evaluate per page.
+    - cursor (str, in the query string): The next_cursor of the previous page.
+    - format (str, in the query string): "json" for one page, "ndjson" to stream every class.
+
+    Returns:
+    - dict: A page of classes and the cursor of the next page (null on the last page),
+      or an NDJSON stream of all classes.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    query_params = {
+        "IndexName": OPEN_CLASSES_INDEX,
+        "KeyConditionExpression": Key('open_for_enrollment').eq(OPEN_FOR_ENROLLMENT) & Key('enrollment_end').gte(now),
+        "FilterExpression": Attr('enrollment_start').lte(now),
+    }
+    class_table = db.Table("class_table")
+
+    if response_format == "ndjson":
+        return ndjson_response(async_iter_query(class_table, page_size=limit, **query_params))
+
+    try:
+        available_classes, next_cursor = await async_query_page(class_table, limit, cursor, **query_params)
+
+        return {"available_classes" : available_classes, "next_cursor": next_cursor}
+
+    except botocore.exceptions.ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving classes: {str(e)}")
+
+@student_router.get("/enrollment/")
+async def get_schedule(
+    student_id: int = Header(
+        alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
+    db: AsyncDynamoDB = Depends(get_db)):
+    """
+    Retreive the classes the student is enrolled in
+
+    Returns:
+    - dict: A dictionary with the student's enrollments, each holding the
+      details of its class.
+
+    Raises:
+    - HTTPException (500): If there is an internal server error.
+    """
+    try:
+        # One Query on the student-keyed index, then the classes in batches
+        enrollments = [enrollment async for enrollment in
+                       async_iter_query(db.Table("enrollment_table"), **student_enrollments_query(student_id))]
+        classes = await batch_get_classes(db, [enrollment["class_id"] for enrollment in enrollments])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving schedule: {str(e)}")
+
+    return {"enrollments": [
+        {**enrollment, "class": classes.get(enrollment["class_id"])} for enrollment in enrollments
+    ]}
+
+@student_router.post("/enrollment/")
+async def enroll(class_id: Annotated[int, Body(embed=True)],
+                 student_id: int = Header(
+                     alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
+                 first_name: str = Header(alias="x-first-name"),
+                 last_name: str = Header(alias="x-last-name"),
+                 db: AsyncDynamoDB = Depends(get_db),
+                 waitlist: AsyncWaitlist = Depends(get_waitlist)):
+    """
+    Student enrolls in a class
+
+    Parameters:
+    - class_id (int, in the request body): The unique identifier of the class where students will be enrolled.
+    - student_id (int, in the request header): The unique identifier of the student who is enrolling.
+
+    Returns:
+    - HTTP_200_OK on success. If the class is full the student is put on
+      its waitlist and the waitlist position is returned.
+
+    Raises:
+    - HTTPException (400): If there are no available seats and the student cannot be waitlisted.
+    - HTTPException (404): If the specified class does not exist.
+    - HTTPException (409): If a conflict occurs (e.g., The student has already enrolled into the class).
+    - HTTPException (500): If there is an internal server error.
+    """
+
+    enrollment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    transact_items = [
+        enrollment_count_update(class_id, 1, check_capacity=True),
+        enrollment_put(class_id, student_id, enrollment_date),
+    ]
+
+    try:
+        await db.client.transact_write_items(TransactItems=transact_items)
+    except db.client.exceptions.TransactionCanceledException as e:
+        seat_reason, enrollment_reason = cancellation_reasons(e)
+        if enrollment_reason == "ConditionalCheckFailed":
+            raise HTTPException(status_code=409, detail="The student has already enrolled into the class.")
+        if seat_reason != "ConditionalCheckFailed":
+            raise HTTPException(status_code=409, detail={"type": type(e).__name__, "msg": str(e)})
+
+        # Tell a missing class apart from a full one, and try the waitlist
+        class_table = db.Table("class_table")
+        try:
+            class_response, (waitlist_status, waitlist_position) = await asyncio.gather(
+                class_table.get_item(Key={"id": str(class_id)}, ProjectionExpression="id"),
+                waitlist.join(class_id, student_id, time.time()),
+            )
+            class_exists = "Item" in class_response
+            if not class_exists and waitlist_status == JOINED:
+                await waitlist.remove(class_id, student_id)
+            if class_exists and waitlist_status == WAITLIST_FULL:
+                await close_class_for_enrollment(class_table, class_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error enrolling into class: {str(e)}")
+
+        if not class_exists:
+            raise HTTPException(status_code=404, detail="Class Not Found")
+        if waitlist_status == WAITLIST_FULL:
+            raise HTTPException(status_code=400, detail="No open seats and the waitlist is also full")
+        if waitlist_status == TOO_MANY_WAITLISTS:
+            raise HTTPException(
+                status_code=400, detail=f"Cannot exceed {MAX_NUMBER_OF_WAITLISTS_PER_STUDENT} waitlists limit")
+        return {"message": "Added to the waitlist", "waitlist_position": waitlist_position}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error enrolling into class: {str(e)}")
+
+    return {"message": "Enrollment successful"}
+
+
+@student_router.delete("/enrollment/{class_id}", status_code=status.HTTP_200_OK)
+async def drop_class(
+    class_id: int,
+    student_id: int = Header(
+        alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
+    db: AsyncDynamoDB = Depends(get_db),
+    redis_conn: redis.asyncio.Redis = Depends(get_redis_db),
+    ddb_helper: AsyncDynamoDBRedisHelper = Depends(get_ddb_helper)
+):
+    """
+    Handles a DELETE request to drop a student (himself/herself) from a specific class.
+
+    Parameters:
+    - class_id (int): The ID of the class from which the student wants to drop.
+    - student_id (int, in the header): A unique ID for students, instructors, and registrars.
+
+    Returns:
+    - dict: A dictionary with the detail message indicating the success of the operation.
+
+    Raises:
+    - HTTPException (404): If the specified enrollment record is not found.
+    - HTTPException (409): If a conflict occurs.
+    """
+    transact_items = [
+        {
+            "Delete": {
+                "TableName": "enrollment_table",
+                "Key": {"class_id": str(class_id), "student_id": str(student_id)},
+                "ConditionExpression": "attribute_exists(student_id)",
+            }
+        },
+        enrollment_count_update(class_id, -1),
+        {
+            "Put": {
+                "TableName": "droplist_table",
+                "Item": {
+                    "class_id": str(class_id),
+                    "student_id": str(student_id),
+                    "drop_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "administrative": False
+                },
+            }
+        },
+    ]
+
+    try:
+        # The auto-enrollment flag does not depend on the drop, so fetch it concurrently
+        drop_result, auto_enroll = await asyncio.gather(
+            db.client.transact_write_items(TransactItems=transact_items),
+            ddb_helper.is_auto_enroll_enabled(),
+            return_exceptions=True,
+        )
+        if isinstance(drop_result, db.client.exceptions.TransactionCanceledException):
+            if "ConditionalCheckFailed" in cancellation_reasons(drop_result):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Record Not Found"
+                )
+        for result in (drop_result, auto_enroll):
+            if isinstance(result, Exception):
+                raise result
+
+        if auto_enroll:
+            await async_publish_seat_freed(redis_conn, class_id)
+
+    except botocore.exceptions.ClientError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"type": type(e).__name__, "msg": str(e)},
+        )
+
+    return {"detail": "Item deleted successfully"}
+
+
+@student_router.get("/waitlist/positions/")
+async def get_waitlist_positions(
+    student_id: int = Header(
+        alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
+    waitlist: AsyncWaitlist = Depends(get_waitlist)):
+    """
+    Retreive the student's position on every waitlist they are on
+
+    Returns:
+    - dict: A dictionary with one entry per waitlisted class, holding the
+      class ID, the student's position and the length of the waitlist.
+
+    Raises:
+    - HTTPException (500): If Redis cannot be reached.
+    """
+    try:
+        return {"waitlists": await waitlist.positions(student_id)}
+    except redis.exceptions.RedisError as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving waitlist positions: {str(e)}")
+
+@student_router.get("/waitlist/{class_id}/position/")
+async def get_current_waitlist_position(
+    class_id: int,
+    student_id: int = Header(
+        alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
+    redis_conn: redis.asyncio.Redis = Depends(get_redis_db)):
+    """
+    Retreive waitlist position
+
+    Returns:
+    - dict: A dictionary containing the user's waitlist position info
+    """
+    try:
+        waitlist_position = await redis_conn.zrank(f"waitlist_{class_id}", f"{class_id}_{student_id}")
+
+        if waitlist_position is not None:
+            return {"class_id": class_id, "waitlist_position": waitlist_position + 1}
+        else:
+            message = f"You are not in the waitlist for class {class_id}"
+            return {"class_id": class_id, "message": message}
+
+    except redis.exceptions.RedisError as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving waitlist position: {str(e)}")
+
+@student_router.delete("/waitlist/{class_id}/", status_code=status.HTTP_200_OK)
+async def remove_from_waitlist(
+    class_id: int,
+    student_id: int = Header(
+        alias="x-cwid", description="A unique ID for students, instructors, and registrars"
+    ),
+    waitlist: AsyncWaitlist = Depends(get_waitlist),
+    db: AsyncDynamoDB = Depends(get_db)
+):
+    removed = await waitlist.remove(class_id, student_id)
+    if not removed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Record Not Found in Redis"
+        )
+    if removed == REMOVED_FROM_FULL:
+        await reopen_class_for_enrollment(db.Table("class_table"), class_id)
+
+    return {"detail": "Item deleted successfully"}
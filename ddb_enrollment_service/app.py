@@ -1,12 +1,51 @@
+import contextlib
+import anyio.to_thread
+import redis
 from fastapi import FastAPI
+from .db_connection import DynamoDB
+from .ddb_enrollment_helper import DynamoDBRedisHelper
+from .class_cache import ClassCache
+from .configs import ConfigStore
+from .waitlist import Waitlist
+from .tracing import tracing_middleware
+from .metrics import InstrumentedRedis, instrument_dynamodb, mark_process_dead, metrics_middleware, metrics_router
 from .student_router import student_router
 from .instructor_router import instructor_router
 from .registrar_router import registrar_router
 
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Size the connection pools to the threadpool that runs the sync routes
+    pool_size = int(anyio.to_thread.current_default_thread_limiter().total_tokens)
+
+    app.state.dynamodb = DynamoDB(max_pool_connections=pool_size)
+    instrument_dynamodb(app.state.dynamodb.client)
+    # Two extra connections are held by the cache and config subscribers
+    app.state.redis = InstrumentedRedis(
+        connection_pool=redis.BlockingConnectionPool(max_connections=pool_size + 2, decode_responses=True)
+    )
+    app.state.configs = ConfigStore(app.state.dynamodb, app.state.redis)
+    app.state.configs.start()
+    app.state.waitlist = Waitlist(app.state.redis)
+    app.state.ddb_helper = DynamoDBRedisHelper(app.state.dynamodb, app.state.redis, app.state.configs)
+    app.state.class_cache = ClassCache(app.state.dynamodb, app.state.redis)
+    app.state.class_cache.start()
+    yield
+    app.state.class_cache.stop()
+    app.state.configs.stop()
+    app.state.redis.close()
+    app.state.redis.connection_pool.disconnect()
+    app.state.dynamodb.close()
+    mark_process_dead()
+
 # Create the main FastAPI application instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+app.middleware("http")(tracing_middleware)
+app.middleware("http")(metrics_middleware)
 
 # Attach the routers to the main application
+app.include_router(metrics_router)
 app.include_router(student_router)
 app.include_router(instructor_router)
 app.include_router(registrar_router)
@@ -0,0 +1,172 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import redis
+from .db_connection import DynamoDB
+from .ddb_enrollment_helper import DynamoDBRedisHelper
+from .configs import ConfigStore
+from .seat_events import (SEAT_FREED_STREAM, SEAT_FREED_STREAM_MAXLEN, SEAT_FREED_DEAD_LETTER_STREAM,
+                          AUTO_ENROLLMENT_GROUP)
+
+logger = logging.getLogger(__name__)
+
+class AutoEnrollmentWorker:
+    """Promotes waitlisted students when seats are freed.
+
+    Reads seat freed events from a Redis Stream through a consumer group,
+    so several workers can share the load. Events for the same class in
+    one read are coalesced into a single promotion. An event is acked
+    only once its class has been processed; events left pending by a
+    crashed worker are reclaimed with XAUTOCLAIM after min_idle_ms.
+    Malformed events, and events delivered max_deliveries times without
+    being processed, are moved to SEAT_FREED_DEAD_LETTER_STREAM.
+    """
+
+    def __init__(self, ddb_helper, redis_conn, consumer_name=None,
+                 batch_size=100, block_ms=5000, min_idle_ms=60000, max_deliveries=5):
+        """
+        :param ddb_helper: The DynamoDBRedisHelper running the promotions.
+        :param redis_conn: A Redis client created with decode_responses=True.
+        :param consumer_name: The name of this consumer within the group.
+        :param batch_size: The maximum number of events read at once.
+        :param block_ms: How long a read waits for new events.
+        :param min_idle_ms: How long an event stays pending before another
+                            consumer may reclaim it.
+        :param max_deliveries: Deliveries of an event before it is dead-lettered.
+        """
+        self.ddb_helper = ddb_helper
+        self.redis_conn = redis_conn
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.min_idle_ms = min_idle_ms
+        self.max_deliveries = max_deliveries
+        self._stopped = threading.Event()
+
+    def ensure_group(self):
+        try:
+            self.redis_conn.xgroup_create(SEAT_FREED_STREAM, AUTO_ENROLLMENT_GROUP, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def reclaim(self):
+        """Takes over events left unacked by consumers that went away."""
+        messages = []
+        start_id = "0-0"
+        while True:
+            start_id, claimed, *_ = self.redis_conn.xautoclaim(
+                SEAT_FREED_STREAM, AUTO_ENROLLMENT_GROUP, self.consumer_name,
+                min_idle_time=self.min_idle_ms, start_id=start_id, count=self.batch_size,
+            )
+            messages.extend(message for message in claimed if message[1])
+            if start_id == "0-0":
+                break
+
+        # XAUTOCLAIM counts a delivery, but only XPENDING reports the count
+        pipe = self.redis_conn.pipeline(transaction=False)
+        for message_id, _ in messages:
+            pipe.xpending_range(SEAT_FREED_STREAM, AUTO_ENROLLMENT_GROUP, min=message_id, max=message_id, count=1)
+        exhausted = []
+        for message, pending in zip(messages, pipe.execute() if messages else []):
+            if pending and pending[0]["times_delivered"] > self.max_deliveries:
+                exhausted.append(message)
+        if exhausted:
+            self.dead_letter(exhausted, f"Not processed after {self.max_deliveries} deliveries")
+        return [message for message in messages if message not in exhausted]
+
+    def dead_letter(self, messages, reason):
+        """Moves events to the dead-letter stream and acks them."""
+        logger.warning("Dead-lettering %d seat freed events: %s", len(messages), reason)
+        pipe = self.redis_conn.pipeline(transaction=True)
+        for message_id, fields in messages:
+            pipe.xadd(SEAT_FREED_DEAD_LETTER_STREAM, {**fields, "message_id": message_id, "reason": reason},
+                      maxlen=SEAT_FREED_STREAM_MAXLEN, approximate=True)
+        pipe.xack(SEAT_FREED_STREAM, AUTO_ENROLLMENT_GROUP, *(message_id for message_id, _ in messages))
+        pipe.execute()
+
+    def read(self):
+        response = self.redis_conn.xreadgroup(
+            AUTO_ENROLLMENT_GROUP, self.consumer_name, {SEAT_FREED_STREAM: ">"},
+            count=self.batch_size, block=self.block_ms,
+        )
+        return [message for _, messages in response for message in messages]
+
+    def process(self, messages):
+        """
+        Promotes students for every class named in the messages and acks
+        the messages of each class that was processed.
+
+        :return: The number of students enrolled.
+        """
+        message_ids_by_class = {}
+        malformed = []
+        for message_id, fields in messages:
+            if fields.get("class_id"):
+                message_ids_by_class.setdefault(fields["class_id"], []).append(message_id)
+            else:
+                malformed.append((message_id, fields))
+        if malformed:
+            self.dead_letter(malformed, "No class_id")
+
+        enrollment_count = 0
+        for class_id, message_ids in message_ids_by_class.items():
+            try:
+                enrollment_count += self.ddb_helper.enroll_students_from_waitlist([class_id])
+            except Exception:
+                # Left pending; reclaimed once min_idle_ms has passed
+                logger.exception("Couldn't promote waitlisted students of class %s", class_id)
+                continue
+            self.redis_conn.xack(SEAT_FREED_STREAM, AUTO_ENROLLMENT_GROUP, *message_ids)
+        return enrollment_count
+
+    def run_once(self):
+        messages = self.reclaim() + self.read()
+        if messages:
+            return self.process(messages)
+        return 0
+
+    def run(self):
+        self.ensure_group()
+        logger.info("Auto-enrollment worker %s started", self.consumer_name)
+        while not self._stopped.is_set():
+            try:
+                self.run_once()
+            except redis.exceptions.ConnectionError:
+                logger.exception("Lost the Redis connection; retrying")
+                self._stopped.wait(1)
+            except redis.exceptions.ResponseError as e:
+                # The stream or group went away, e.g. after a FLUSHALL
+                if "NOGROUP" in str(e):
+                    logger.warning("Consumer group %s is missing; recreating it", AUTO_ENROLLMENT_GROUP)
+                    self.ensure_group()
+                else:
+                    logger.exception("Redis rejected a command; retrying")
+                    self._stopped.wait(1)
+            except Exception:
+                # Keep consuming; failed events stay pending and are reclaimed
+                logger.exception("Auto-enrollment iteration failed; retrying")
+                self._stopped.wait(1)
+
+    def stop(self, *args):
+        self._stopped.set()
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    dynamodb = DynamoDB()
+    redis_conn = redis.Redis(decode_responses=True)
+    configs = ConfigStore(dynamodb, redis_conn)
+    worker = AutoEnrollmentWorker(DynamoDBRedisHelper(dynamodb, redis_conn, configs), redis_conn)
+
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    try:
+        worker.run()
+    finally:
+        redis_conn.close()
+        dynamodb.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import asyncio
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from .ddb_enrollment_helper import chunks, backoff_delay, MAX_BATCH_ATTEMPTS
+from .pagination import NDJSON_MEDIA_TYPE
+
+CSV_MEDIA_TYPE = "text/csv"
+
+# Items per BatchWriteItem call
+BATCH_WRITE_SIZE = 25
+
+# Valid rows buffered before they are written, and concurrent writes
+IMPORT_BATCH_ROWS = 1000
+MAX_CONCURRENT_WRITES = 8
+
+CREATED = "created"
+INVALID = "invalid"
+CONFLICT = "conflict"
+FAILED = "failed"
+
+async def _iter_lines(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+async def iter_rows(request: Request):
+    """
+    Parses an NDJSON or CSV request body as it arrives.
+
+    CSV bodies start with a header line; records must not contain
+    line breaks. Blank lines are skipped.
+
+    :return: An async iterator of (row number, dict) tuples, or of
+             (row number, error message) tuples for unparseable lines.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in (NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Expected {NDJSON_MEDIA_TYPE} or {CSV_MEDIA_TYPE}",
+        )
+
+    fieldnames = None
+    row_number = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        if media_type == CSV_MEDIA_TYPE:
+            if fieldnames is None:
+                fieldnames = next(csv.reader([line]))
+                continue
+            row_number += 1
+            values = next(csv.reader([line]))
+            if len(values) != len(fieldnames):
+                yield row_number, f"Expected {len(fieldnames)} columns, got {len(values)}"
+            else:
+                yield row_number, dict(zip(fieldnames, values))
+        else:
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield row_number, f"Invalid JSON: {e}"
+                continue
+            yield row_number, row if isinstance(row, dict) else "Expected a JSON object"
+
+def validation_errors(error: ValidationError):
+    return [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in error.errors()]
+
+class BulkImport:
+    """Validates uploaded rows and collects the per-row report.
+
+    Rows are validated against a model and turned into items as they
+    are parsed. Valid items are handed out in batches of
+    IMPORT_BATCH_ROWS so an upload is never held in memory as a whole.
+    Keys are checked against the rest of the upload here and against the
+    table by batch_write, so existing items are never replaced.
+    """
+
+    def __init__(self, model, to_item, key_attributes):
+        """
+        :param model: The pydantic model each row must satisfy.
+        :param to_item: Builds the table item from a validated model.
+        :param key_attributes: The primary key attributes of the table.
+        """
+        self.model = model
+        self.to_item = to_item
+        self.key_attributes = key_attributes
+        self.report = {}
+        self.pending = []
+        self._seen_keys = set()
+
+    def item_key(self, item):
+        return tuple(str(item[name]) for name in self.key_attributes)
+
+    def add(self, row_number, row):
+        """
+        Validates one row and queues its item.
+
+        :return: True once a full batch is waiting to be written.
+        """
+        if isinstance(row, str):
+            self.report[row_number] = {"row": row_number, "status": INVALID, "errors": [row]}
+            return False
+        try:
+            item = self.to_item(self.model.model_validate(row))
+        except ValidationError as e:
+            self.report[row_number] = {"row": row_number, "status": INVALID, "errors": validation_errors(e)}
+            return False
+
+        # BatchWriteItem rejects a batch that writes one key twice
+        key = self.item_key(item)
+        if key in self._seen_keys:
+            self.report[row_number] = {"row": row_number, "status": INVALID, "errors": ["Duplicate key in upload"]}
+            return False
+        self._seen_keys.add(key)
+
+        self.pending.append((row_number, item))
+        return len(self.pending) >= IMPORT_BATCH_ROWS
+
+    def take_pending(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+    def record(self, rows, failures):
+        """
+        Records the outcome of a written batch.
+
+        :param rows: The (row number, item) tuples of the batch.
+        :param failures: (status, error message) tuples by row number for
+                         the rows that were not written.
+        """
+        for row_number, _ in rows:
+            if row_number in failures:
+                row_status, error = failures[row_number]
+                self.report[row_number] = {"row": row_number, "status": row_status, "errors": [error]}
+            else:
+                self.report[row_number] = {"row": row_number, "status": CREATED}
+
+    def summary(self):
+        rows = [self.report[row_number] for row_number in sorted(self.report)]
+        counts = {CREATED: 0, INVALID: 0, CONFLICT: 0, FAILED: 0}
+        for row in rows:
+            counts[row["status"]] += 1
+        return {**counts, "rows": rows}
+
+def _unprocessed_keys(response, table_name, bulk_import):
+    requests = response.get("UnprocessedItems", {}).get(table_name, [])
+    return {bulk_import.item_key(request["PutRequest"]["Item"]) for request in requests}
+
+def _key_request(table_name, bulk_import, rows):
+    names = {f"#k{i}": name for i, name in enumerate(bulk_import.key_attributes)}
+    return {table_name: {
+        "Keys": [{name: item[name] for name in bulk_import.key_attributes} for _, item in rows],
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }}
+
+def _conflicts(table_name, bulk_import, rows, existing):
+    """Splits a chunk into conflict failures and the rows left to write."""
+    conflicts = {row_number: (CONFLICT, f"{table_name} item {', '.join(bulk_import.item_key(item))} already exists")
+                 for row_number, item in rows if bulk_import.item_key(item) in existing}
+    return conflicts, [(row_number, item) for row_number, item in rows if row_number not in conflicts]
+
+def _existing_keys(dynamodb, table_name, bulk_import, rows):
+    """Looks up which keys of a chunk are already in the table."""
+    existing = set()
+    request_items = _key_request(table_name, bulk_import, rows)
+    for attempt in range(MAX_BATCH_ATTEMPTS):
+        response = dynamodb.client.batch_get_item(RequestItems=request_items)
+        existing.update(bulk_import.item_key(item) for item in response["Responses"].get(table_name, []))
+        request_items = response.get("UnprocessedKeys")
+        if not request_items:
+            return existing
+        time.sleep(backoff_delay(attempt))
+    raise RuntimeError("Couldn't check for existing items")
+
+def _write_chunk(dynamodb, table_name, bulk_import, rows):
+    try:
+        existing = _existing_keys(dynamodb, table_name, bulk_import, rows)
+    except Exception as e:
+        return {row_number: (FAILED, str(e)) for row_number, _ in rows}
+    # BatchWriteItem has no condition expressions; a PutRequest would
+    # replace the existing item, counters and all
+    failures, remaining = _conflicts(table_name, bulk_import, rows, existing)
+
+    for attempt in range(MAX_BATCH_ATTEMPTS):
+        if not remaining:
+            return failures
+        try:
+            response = dynamodb.client.batch_write_item(RequestItems={
+                table_name: [{"PutRequest": {"Item": item}} for _, item in remaining]
+            })
+        except Exception as e:
+            return {**failures, **{row_number: (FAILED, str(e)) for row_number, _ in remaining}}
+        unprocessed = _unprocessed_keys(response, table_name, bulk_import)
+        remaining = [(row_number, item) for row_number, item in remaining
+                     if bulk_import.item_key(item) in unprocessed]
+        if remaining:
+            time.sleep(backoff_delay(attempt))
+    return {**failures, **{row_number: (FAILED, "Unprocessed after retries") for row_number, _ in remaining}}
+
+def batch_write(dynamodb, table_name, bulk_import, rows):
+    """
+    Writes new items with parallel BatchWriteItem calls of up to 25
+    items, retrying unprocessed items with jittered backoff. Each chunk
+    is first checked with BatchGetItem; items whose key already exists
+    are reported as conflicts instead of being replaced.
+
+    :param dynamodb: The shared DynamoDB data access object.
+    :param table_name: The name of the table.
+    :param bulk_import: The BulkImport the rows belong to.
+    :param rows: (row number, item) tuples.
+    :return: (status, error message) tuples by row number for the rows
+             not written.
+    """
+    failures = {}
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_WRITES) as executor:
+        for chunk_failures in executor.map(lambda chunk: _write_chunk(dynamodb, table_name, bulk_import, chunk),
+                                           chunks(rows, BATCH_WRITE_SIZE)):
+            failures.update(chunk_failures)
+    return failures
+
+async def _async_existing_keys(dynamodb, table_name, bulk_import, rows):
+    existing = set()
+    request_items = _key_request(table_name, bulk_import, rows)
+    for attempt in range(MAX_BATCH_ATTEMPTS):
+        response = await dynamodb.client.batch_get_item(RequestItems=request_items)
+        existing.update(bulk_import.item_key(item) for item in response["Responses"].get(table_name, []))
+        request_items = response.get("UnprocessedKeys")
+        if not request_items:
+            return existing
+        await asyncio.sleep(backoff_delay(attempt))
+    raise RuntimeError("Couldn't check for existing items")
+
+async def _async_write_chunk(dynamodb, table_name, bulk_import, rows, semaphore):
+    async with semaphore:
+        try:
+            existing = await _async_existing_keys(dynamodb, table_name, bulk_import, rows)
+        except Exception as e:
+            return {row_number: (FAILED, str(e)) for row_number, _ in rows}
+        failures, remaining = _conflicts(table_name, bulk_import, rows, existing)
+
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if not remaining:
+                return failures
+            try:
+                response = await dynamodb.client.batch_write_item(RequestItems={
+                    table_name: [{"PutRequest": {"Item": item}} for _, item in remaining]
+                })
+            except Exception as e:
+                return {**failures, **{row_number: (FAILED, str(e)) for row_number, _ in remaining}}
+            unprocessed = _unprocessed_keys(response, table_name, bulk_import)
+            remaining = [(row_number, item) for row_number, item in remaining
+                         if bulk_import.item_key(item) in unprocessed]
+            if remaining:
+                await asyncio.sleep(backoff_delay(attempt))
+    return {**failures, **{row_number: (FAILED, "Unprocessed after retries") for row_number, _ in remaining}}
+
+async def async_batch_write(dynamodb, table_name, bulk_import, rows):
+    """Asyncio counterpart of batch_write."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_WRITES)
+    results = await asyncio.gather(*(_async_write_chunk(dynamodb, table_name, bulk_import, chunk, semaphore)
+                                     for chunk in chunks(rows, BATCH_WRITE_SIZE)))
+    return {row_number: error for failures in results for row_number, error in failures.items()}
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from decimal import Decimal
+
+INVALIDATION_CHANNEL = "class_cache_invalidation"
+REDIS_KEY_PREFIX = "class_cache:"
+# Bumped by every invalidation; a load only stores its result if the
+# generation it started with is still current
+GENERATION_KEY_PREFIX = "class_cache_generation:"
+
+# KEYS[1]: cached entry, KEYS[2]: generation of the class
+# ARGV: generation read before the DynamoDB read, entry, TTL in seconds
+STORE_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# Attributes that change with every enroll/drop are never cached
+VOLATILE_ATTRIBUTES = ("enrollment_count", "open_for_enrollment")
+
+def _plain(value):
+    """Converts DynamoDB Decimals so both cache tiers return the same types."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, set)):
+        return [_plain(v) for v in value]
+    return value
+
+def class_metadata(item):
+    """
+    Strips the volatile attributes from a class_table item.
+    """
+    return _plain({k: v for k, v in item.items() if k not in VOLATILE_ATTRIBUTES})
+
+async def async_invalidate_class(redis_conn, class_id):
+    """
+    Invalidates a class from the asyncio variant, which keeps no local
+    tier: drops the shared entry and tells every instance to evict it.
+
+    :param redis_conn: A redis.asyncio client.
+    :param class_id: The ID of the class.
+    """
+    pipe = redis_conn.pipeline(transaction=True)
+    pipe.incr(f"{GENERATION_KEY_PREFIX}{class_id}")
+    pipe.delete(f"{REDIS_KEY_PREFIX}{class_id}")
+    pipe.publish(INVALIDATION_CHANNEL, str(class_id))
+    await pipe.execute()
+
+class ClassCache:
+    """Two-tier read-through cache for class metadata.
+
+    The first tier is an in-process LRU with a short TTL, the second is
+    shared by every instance through Redis. Writers call invalidate(),
+    which clears both tiers and broadcasts the class ID over Redis
+    pub/sub so the other instances evict their local copies. Concurrent
+    misses on one key are collapsed into a single DynamoDB read.
+
+    An invalidation wins over a load already in flight: both tiers are
+    versioned by a per-class generation, which invalidations bump, and a
+    load whose generation changed while it ran returns its result
+    without storing it.
+    """
+
+    def __init__(self, dynamodb, redis_conn, maxsize=1024, local_ttl=30, redis_ttl=300):
+        """
+        :param dynamodb: The shared DynamoDB data access object.
+        :param redis_conn: A Redis client created with decode_responses=True.
+        :param maxsize: The maximum number of classes kept in process.
+        :param local_ttl: Seconds an entry stays in the in-process tier.
+        :param redis_ttl: Seconds an entry stays in the Redis tier.
+        """
+        self.dynamodb = dynamodb
+        self.redis_conn = redis_conn
+        self.maxsize = maxsize
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+
+        self._local = OrderedDict()
+        self._generations = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._pubsub_thread = None
+        self._store = redis_conn.register_script(STORE_SCRIPT)
+
+        self.counters = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, class_id):
+        """
+        Returns the metadata of a class, or None if the class does not exist.
+
+        :param class_id: The ID of the class.
+        """
+        class_id = str(class_id)
+
+        with self._lock:
+            entry = self._local.get(class_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._local.move_to_end(class_id)
+                self.counters["local_hits"] += 1
+                return entry[0]
+
+            # Single flight: only the first caller loads, the rest wait for it
+            future = self._inflight.get(class_id)
+            owner = future is None
+            if owner:
+                future = self._inflight[class_id] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            item = self._load(class_id)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(item)
+            return item
+        finally:
+            with self._lock:
+                self._inflight.pop(class_id, None)
+
+    def invalidate(self, class_id):
+        """
+        Evicts a class from both tiers on every instance.
+
+        :param class_id: The ID of the class.
+        """
+        class_id = str(class_id)
+        self._evict_local(class_id)
+        pipe = self.redis_conn.pipeline(transaction=True)
+        pipe.incr(f"{GENERATION_KEY_PREFIX}{class_id}")
+        pipe.delete(f"{REDIS_KEY_PREFIX}{class_id}")
+        pipe.publish(INVALIDATION_CHANNEL, class_id)
+        pipe.execute()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, local_size=len(self._local))
+
+    def start(self):
+        """Starts listening for invalidations published by other instances."""
+        pubsub = self.redis_conn.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_invalidation})
+        self._pubsub_thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def stop(self):
+        if self._pubsub_thread is not None:
+            self._pubsub_thread.stop()
+            self._pubsub_thread = None
+
+    def _on_invalidation(self, message):
+        self._evict_local(message["data"])
+
+    def _evict_local(self, class_id):
+        with self._lock:
+            self._generations[class_id] = self._generations.get(class_id, 0) + 1
+            if self._local.pop(class_id, None) is not None:
+                self.counters["invalidations"] += 1
+
+    def _store_local(self, class_id, item, generation):
+        with self._lock:
+            if self._generations.get(class_id, 0) != generation:
+                return
+            self._local[class_id] = (item, time.monotonic() + self.local_ttl)
+            self._local.move_to_end(class_id)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def _load(self, class_id):
+        redis_key = f"{REDIS_KEY_PREFIX}{class_id}"
+        generation_key = f"{GENERATION_KEY_PREFIX}{class_id}"
+        with self._lock:
+            local_generation = self._generations.get(class_id, 0)
+
+        cached, redis_generation = self.redis_conn.mget(redis_key, generation_key)
+        if cached is not None:
+            item = json.loads(cached)
+            with self._lock:
+                self.counters["redis_hits"] += 1
+        else:
+            response = self.dynamodb.Table("class_table").get_item(Key={"id": class_id})
+            with self._lock:
+                self.counters["misses"] += 1
+            if "Item" not in response:
+                return None
+            item = class_metadata(response["Item"])
+            if not self._store(keys=[redis_key, generation_key],
+                               args=[redis_generation or "0", json.dumps(item), self.redis_ttl]):
+                # Invalidated during the read; the item may predate the write
+                return item
+
+        self._store_local(class_id, item, local_generation)
+        return item
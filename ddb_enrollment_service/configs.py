@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import threading
+import time
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+CONFIGS_CHANGED_CHANNEL = "configs_changed"
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off", "")
+
+def normalize_value(value):
+    """
+    Normalizes a configs_table value at load time. Flags have been
+    written both as the string "1" and as a boolean, so every boolean-like
+    value becomes a bool.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, Decimal) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in TRUE_VALUES + FALSE_VALUES:
+        return value.strip().lower() in TRUE_VALUES
+    return value
+
+class _BaseConfigStore:
+    def __init__(self, dynamodb, redis_conn, ttl=300):
+        """
+        :param dynamodb: The shared DynamoDB data access object.
+        :param redis_conn: A Redis client created with decode_responses=True.
+        :param ttl: Seconds after which the values are reloaded even if no
+                    change was announced (covers a missed pub/sub message).
+        """
+        self.dynamodb = dynamodb
+        self.redis_conn = redis_conn
+        self.ttl = ttl
+        self._values = {}
+        self._loaded_at = 0.0
+
+    def _is_stale(self):
+        return time.monotonic() - self._loaded_at > self.ttl
+
+    def _replace(self, items):
+        self._values = {item["variable_name"]: normalize_value(item.get("value")) for item in items}
+        self._loaded_at = time.monotonic()
+
+class ConfigStore(_BaseConfigStore):
+    """In-memory copy of configs_table.
+
+    Loaded at startup and refreshed when a writer announces a change on
+    the configs_changed Redis channel, or when the TTL runs out.
+    """
+
+    def __init__(self, dynamodb, redis_conn, ttl=300):
+        super().__init__(dynamodb, redis_conn, ttl)
+        self._lock = threading.Lock()
+        self._pubsub_thread = None
+
+    def get(self, name, default=None):
+        if self._is_stale():
+            with self._lock:
+                # Another thread may have reloaded while we waited
+                if self._is_stale():
+                    self.load()
+        return self._values.get(name, default)
+
+    def load(self):
+        table = self.dynamodb.Table("configs_table")
+        items = []
+        scan_params = {}
+        while True:
+            response = table.scan(**scan_params)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                break
+            scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        self._replace(items)
+
+    def publish_change(self, name):
+        """Tells every instance, this one included, to reload."""
+        self.redis_conn.publish(CONFIGS_CHANGED_CHANNEL, name)
+
+    def start(self):
+        self.load()
+        pubsub = self.redis_conn.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{CONFIGS_CHANGED_CHANNEL: self._on_change})
+        self._pubsub_thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def stop(self):
+        if self._pubsub_thread is not None:
+            self._pubsub_thread.stop()
+            self._pubsub_thread = None
+
+    def _on_change(self, message):
+        try:
+            self.load()
+        except Exception:
+            # Keep the subscriber alive; the TTL retries the reload
+            logger.exception("Couldn't reload configs after change of %s", message["data"])
+
+class AsyncConfigStore(_BaseConfigStore):
+    """Asyncio counterpart of ConfigStore."""
+
+    def __init__(self, dynamodb, redis_conn, ttl=300):
+        super().__init__(dynamodb, redis_conn, ttl)
+        self._lock = asyncio.Lock()
+        self._listener = None
+
+    async def get(self, name, default=None):
+        if self._is_stale():
+            async with self._lock:
+                if self._is_stale():
+                    await self.load()
+        return self._values.get(name, default)
+
+    async def load(self):
+        table = self.dynamodb.Table("configs_table")
+        items = []
+        scan_params = {}
+        while True:
+            response = await table.scan(**scan_params)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                break
+            scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        self._replace(items)
+
+    async def publish_change(self, name):
+        await self.redis_conn.publish(CONFIGS_CHANGED_CHANNEL, name)
+
+    async def start(self):
+        await self.load()
+        pubsub = self.redis_conn.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(CONFIGS_CHANGED_CHANNEL)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    await self.load()
+                except Exception:
+                    logger.exception("Couldn't reload configs after change of %s", message["data"])
+        finally:
+            await pubsub.aclose()
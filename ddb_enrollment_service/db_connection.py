@@ -1,15 +1,87 @@
+import os
+import threading
 import boto3
+import botocore.config
 import redis
+from fastapi import Request
 
-def get_db():
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL', 'http://localhost:5300')
+DYNAMODB_REGION_NAME = 'local'
 
-    dynamodb_resource = boto3.resource(
-    'dynamodb',
-    #aws_access_key_id='fakeMyKeyId',
-    #aws_secret_access_key='fakeSecretAccessKey',
-    endpoint_url='http://localhost:5300'
-)
-    return dynamodb_resource
+# AnyIO runs sync routes on a threadpool of 40 workers by default
+DEFAULT_MAX_POOL_CONNECTIONS = 40
 
-def get_redis_db():
-    return redis.Redis()
\ No newline at end of file
+class DynamoDB:
+    """Process-wide DynamoDB data access object.
+
+    Owns a single boto3 session, a low-level client with a tuned
+    connection pool, and cached Table handles. Low-level clients are
+    thread-safe, so one instance is shared by every request thread of
+    the worker. Create it once in the application lifespan.
+    """
+
+    def __init__(self, endpoint_url=DYNAMODB_ENDPOINT_URL, region_name=DYNAMODB_REGION_NAME,
+                 max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS):
+        """
+        :param endpoint_url: The DynamoDB endpoint.
+        :param region_name: The AWS region name.
+        :param max_pool_connections: Size of the HTTP connection pool. Should
+                                     match the number of threads issuing calls.
+        """
+        config = botocore.config.Config(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=True,
+            connect_timeout=2,
+            read_timeout=5,
+            retries={"max_attempts": 3, "mode": "standard"},
+        )
+        self.session = boto3.session.Session()
+        self.resource = self.session.resource(
+            'dynamodb',
+            region_name=region_name,
+            endpoint_url=endpoint_url,
+            config=config,
+        )
+        # Table handles and the resource share this client and its pool
+        self.client = self.resource.meta.client
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def Table(self, table_name):
+        """
+        Returns a cached Table handle.
+
+        :param table_name: The name of the table.
+        :return: A boto3 Table resource bound to the shared client.
+        """
+        table = self._tables.get(table_name)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(table_name)
+                if table is None:
+                    table = self.resource.Table(table_name)
+                    self._tables[table_name] = table
+        return table
+
+    def close(self):
+        """Closes the connection pool of the underlying client."""
+        self._tables.clear()
+        self.client.close()
+
+def get_db(request: Request) -> DynamoDB:
+    return request.app.state.dynamodb
+
+def get_redis_db(request: Request) -> redis.Redis:
+    return request.app.state.redis
+
+def get_ddb_helper(request: Request):
+    return request.app.state.ddb_helper
+
+def get_class_cache(request: Request):
+    return request.app.state.class_cache
+
+def get_configs(request: Request):
+    return request.app.state.configs
+
+def get_waitlist(request: Request):
+    return request.app.state.waitlist
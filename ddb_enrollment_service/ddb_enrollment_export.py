@@ -0,0 +1,265 @@
+"""
+Exports enrollment tables to compressed shards on local disk.
+
+Each table is read with a parallel Scan (one thread per segment) that is
+throttled to a read capacity budget. Every segment streams its rows into
+one shard, either gzip-compressed CSV or Parquet (needs pyarrow), and a
+manifest.json records the row count, size and SHA-256 of every shard.
+
+    python ddb_enrollment_service/ddb_enrollment_export.py --out export \\
+        --segments 8 --rcu 100 --format csv
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+import boto3
+import botocore.config
+from boto3.dynamodb.types import Binary, TypeDeserializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLES = ("enrollment_table", "droplist_table", "class_table")
+
+# Known columns per table; any other attribute goes into EXTRA_COLUMN
+EXPORT_COLUMNS = {
+    "enrollment_table": ["class_id", "student_id", "enrollment_date"],
+    "droplist_table": ["class_id", "student_id", "drop_date", "administrative"],
+    "class_table": ["id", "dept_code", "course_num", "section_no", "academic_year", "semester",
+                    "instructor_id", "room_num", "room_capacity", "course_start_date",
+                    "enrollment_start", "enrollment_end", "enrollment_count", "open_for_enrollment"],
+}
+EXTRA_COLUMN = "_extra"
+
+# pyarrow types of the known columns that are not strings. Every other
+# column, EXTRA_COLUMN included, is a string column in Parquet shards.
+COLUMN_TYPES = {
+    "droplist_table": {"administrative": "bool_"},
+    "class_table": {name: "int64" for name in ("course_num", "section_no", "academic_year", "instructor_id",
+                                                "room_num", "room_capacity", "enrollment_count")},
+}
+
+SCAN_PAGE_SIZE = 1000
+
+class CapacityLimiter:
+    """Keeps the consumed read capacity of all threads under a budget.
+
+    Threads report the capacity each page consumed. Once the budget is
+    overdrawn, the next caller sleeps until the refill has paid it back.
+    """
+
+    def __init__(self, units_per_second):
+        self.units_per_second = units_per_second
+        self._available = float(units_per_second)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, units):
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(self.units_per_second,
+                                  self._available + (now - self._updated) * self.units_per_second)
+            self._updated = now
+            self._available -= units
+            delay = -self._available / self.units_per_second if self._available < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+def plain_value(value):
+    """Converts a deserialized DynamoDB value into plain Python types."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, list)):
+        return [plain_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: plain_value(v) for k, v in value.items()}
+    if isinstance(value, Binary):
+        return bytes(value).hex()
+    return value
+
+def export_row(item, columns):
+    row = {column: plain_value(item.get(column)) for column in columns}
+    extra = {k: plain_value(v) for k, v in item.items() if k not in columns}
+    row[EXTRA_COLUMN] = json.dumps(extra, sort_keys=True) if extra else None
+    return row
+
+class CsvShardWriter:
+    extension = "csv.gz"
+
+    def __init__(self, path, columns, column_types):
+        # CSV stores every value as text, so column_types is not needed
+        self._file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=columns + [EXTRA_COLUMN])
+        self._writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            self._writer.writerow({k: json.dumps(v) if isinstance(v, (list, dict)) else v for k, v in row.items()})
+
+    def close(self):
+        self._file.close()
+
+class ParquetShardWriter:
+    """Writes a shard with a schema declared up front.
+
+    Every shard of a table gets the same schema, whatever values its
+    first page happens to hold. Values of string columns that are not
+    strings are stored as JSON; a value that does not fit a typed column
+    fails the export with the column and row it was found in.
+    """
+    extension = "parquet"
+
+    def __init__(self, path, columns, column_types):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet export needs pyarrow: pip install pyarrow")
+        self._pyarrow = pyarrow
+        self._path = path
+        self._string_columns = [column for column in columns + [EXTRA_COLUMN] if column not in column_types]
+        self._schema = pyarrow.schema([
+            (column, getattr(pyarrow, column_types[column])() if column in column_types else pyarrow.string())
+            for column in columns + [EXTRA_COLUMN]
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression="zstd")
+        self._rows = 0
+
+    def write(self, rows):
+        for row in rows:
+            for column in self._string_columns:
+                if row[column] is not None and not isinstance(row[column], str):
+                    row[column] = json.dumps(row[column])
+        try:
+            table = self._pyarrow.Table.from_pylist(rows, schema=self._schema)
+        except (self._pyarrow.ArrowInvalid, self._pyarrow.ArrowTypeError) as e:
+            raise ValueError(f"{self._path}: {self._describe_mismatch(rows)}: {e}") from e
+        self._writer.write_table(table)
+        self._rows += len(rows)
+
+    def _describe_mismatch(self, rows):
+        for index, row in enumerate(rows):
+            for field in self._schema:
+                try:
+                    self._pyarrow.array([row[field.name]], type=field.type)
+                except (self._pyarrow.ArrowInvalid, self._pyarrow.ArrowTypeError):
+                    return (f"row {self._rows + index + 1} has {row[field.name]!r} in column "
+                            f"{field.name}, declared as {field.type}")
+        return "a page does not match the declared schema"
+
+    def close(self):
+        self._writer.close()
+
+SHARD_WRITERS = {"csv": CsvShardWriter, "parquet": ParquetShardWriter}
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def export_segment(client, table_name, segment, total_segments, limiter, out_dir, shard_format):
+    """
+    Scans one segment of a table into one shard.
+
+    :return: The manifest entry of the shard.
+    """
+    columns = EXPORT_COLUMNS.get(table_name, [])
+    writer_class = SHARD_WRITERS[shard_format]
+    path = os.path.join(out_dir, table_name, f"part-{segment:05d}.{writer_class.extension}")
+    writer = writer_class(path, columns, COLUMN_TYPES.get(table_name, {}))
+    deserializer = TypeDeserializer()
+    rows = 0
+
+    scan_params = {
+        "TableName": table_name,
+        "Segment": segment,
+        "TotalSegments": total_segments,
+        "Limit": SCAN_PAGE_SIZE,
+        "ReturnConsumedCapacity": "TOTAL",
+    }
+    try:
+        while True:
+            response = client.scan(**scan_params)
+            items = [{k: deserializer.deserialize(v) for k, v in item.items()} for item in response["Items"]]
+            writer.write([export_row(item, columns) for item in items])
+            rows += len(items)
+            limiter.consume(response.get("ConsumedCapacity", {}).get("CapacityUnits", 0))
+            if "LastEvaluatedKey" not in response:
+                break
+            scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    finally:
+        writer.close()
+
+    return {
+        "file": os.path.relpath(path, out_dir),
+        "segment": segment,
+        "rows": rows,
+        "bytes": os.path.getsize(path),
+        "sha256": file_sha256(path),
+    }
+
+def export_table(client, table_name, total_segments, limiter, out_dir, shard_format):
+    os.makedirs(os.path.join(out_dir, table_name), exist_ok=True)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        shards = list(executor.map(
+            lambda segment: export_segment(client, table_name, segment, total_segments,
+                                           limiter, out_dir, shard_format),
+            range(total_segments),
+        ))
+    rows = sum(shard["rows"] for shard in shards)
+    logger.info("Exported %d rows of %s in %.1fs", rows, table_name, time.monotonic() - started)
+    return {"rows": rows, "shards": shards}
+
+def export(tables, out_dir, total_segments, rcu, shard_format,
+           endpoint_url="http://localhost:5300", region_name="local"):
+    """
+    Exports tables and writes manifest.json into out_dir.
+
+    :return: The manifest.
+    """
+    config = botocore.config.Config(max_pool_connections=total_segments,
+                                    retries={"max_attempts": 10, "mode": "adaptive"})
+    client = boto3.session.Session().client("dynamodb", region_name=region_name,
+                                            endpoint_url=endpoint_url, config=config)
+    limiter = CapacityLimiter(rcu)
+    manifest = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "format": shard_format,
+        "total_segments": total_segments,
+        "rcu_budget": rcu,
+        "tables": {},
+    }
+    for table_name in tables:
+        manifest["tables"][table_name] = export_table(client, table_name, total_segments,
+                                                      limiter, out_dir, shard_format)
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export enrollment tables to compressed shards.")
+    parser.add_argument("--out", default="export", help="Output directory")
+    parser.add_argument("--tables", nargs="+", default=list(DEFAULT_TABLES))
+    parser.add_argument("--segments", type=int, default=4, help="Parallel scan segments per table")
+    parser.add_argument("--rcu", type=float, default=100, help="Read capacity units per second")
+    parser.add_argument("--format", choices=sorted(SHARD_WRITERS), default="csv")
+    parser.add_argument("--endpoint-url", default="http://localhost:5300")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(args.out, exist_ok=True)
+    manifest = export(args.tables, args.out, args.segments, args.rcu, args.format, endpoint_url=args.endpoint_url)
+    for table_name, table in manifest["tables"].items():
+        print(f"{table_name}: {table['rows']} rows in {len(table['shards'])} shards")
@@ -1,62 +1,328 @@
-import boto3
-import redis
-from datetime import datetime, timedelta
-from fastapi import HTTPException, status
+import random
+import time
+from datetime import datetime
 from boto3.dynamodb.conditions import Key
+from .waitlist import Waitlist
 
-# Create Boto3 DynamoDB resource
-dynamodb_resource = boto3.resource(
-    'dynamodb',
-    endpoint_url='http://localhost:5300'
-)
+OPEN_CLASSES_INDEX = "open_classes_index"
+STUDENT_ENROLLMENTS_INDEX = "student_enrollments_index"
 
-# Create Redis connection
-redis_conn = redis.Redis(decode_responses=True)
+# Value of the sparse open_for_enrollment attribute (GSI partition key)
+OPEN_FOR_ENROLLMENT = "Y"
+
+# Items per promotion transaction: one counter update plus the enrollments
+PROMOTION_BATCH_SIZE = 25
+
+# Keys per BatchGetItem call, and attempts at the keys left unprocessed
+BATCH_GET_SIZE = 100
+MAX_BATCH_ATTEMPTS = 5
+
+def new_class_item(body_data):
+    """
+    Builds a class_table item for a new class.
+
+    :param body_data: A ClassCreate model.
+    :return: The item, with an empty enrollment count and open for enrollment.
+    """
+    return {
+        "id": body_data.id,
+        "dept_code": body_data.dept_code,
+        "course_num": body_data.course_num,
+        "section_no": body_data.section_no,
+        "academic_year": body_data.academic_year,
+        "semester": body_data.semester,
+        "instructor_id": body_data.instructor_id,
+        "room_num": body_data.room_num,
+        "room_capacity": body_data.room_capacity,
+        "course_start_date": body_data.course_start_date,
+        "enrollment_start": body_data.enrollment_start,
+        "enrollment_end": body_data.enrollment_end,
+        "enrollment_count": 0,
+        "open_for_enrollment": OPEN_FOR_ENROLLMENT,
+    }
+
+def new_course_item(course):
+    """
+    Builds a course_table item from a Course model.
+    """
+    return {
+        "department_code": course.department_code,
+        "course_no": course.course_no,
+        "course_name": course.title,
+    }
+
+def class_patch_update(class_id, fields):
+    """
+    Builds the UpdateItem arguments that apply a partial class update.
+
+    :param class_id: The ID of the class.
+    :param fields: The attributes to set, by name.
+    :return: Keyword arguments for Table.update_item.
+    """
+    fields = dict(fields)
+
+    # A capacity change may free seats; put the class back into the open
+    # classes index and let the next full enroll attempt close it again.
+    if "room_capacity" in fields:
+        fields["open_for_enrollment"] = OPEN_FOR_ENROLLMENT
+
+    return {
+        "Key": {"id": str(class_id)},
+        "UpdateExpression": "SET " + ", ".join(f"#{name} = :{name}" for name in fields),
+        "ConditionExpression": "attribute_exists(id)",
+        "ExpressionAttributeNames": {f"#{name}": name for name in fields},
+        "ExpressionAttributeValues": {f":{name}": value for name, value in fields.items()},
+    }
+
+def enrollment_count_update(class_id, delta, check_capacity=False):
+    """
+    Builds a TransactWriteItems entry that atomically adjusts the
+    materialized enrollment_count of a class.
+
+    :param class_id: The ID of the class.
+    :param delta: The amount to add to enrollment_count (negative on drop).
+    :param check_capacity: If True, the update fails when the class is full.
+    :return: An Update entry for TransactWriteItems.
+    """
+    condition = "attribute_exists(id)"
+    update_expression = "ADD enrollment_count :delta"
+    values = {":delta": delta}
+
+    if check_capacity:
+        condition += " AND (attribute_not_exists(enrollment_count) OR enrollment_count < room_capacity)"
+    if delta < 0:
+        # A seat was freed: put the class back into the open classes index
+        update_expression += " SET open_for_enrollment = :open"
+        values[":open"] = OPEN_FOR_ENROLLMENT
+
+    return {
+        "Update": {
+            "TableName": "class_table",
+            "Key": {"id": str(class_id)},
+            "UpdateExpression": update_expression,
+            "ConditionExpression": condition,
+            "ExpressionAttributeValues": values,
+        }
+    }
+
+def enrollment_count_claim(class_id, count, room_capacity):
+    """
+    Builds a TransactWriteItems entry that claims several seats at once.
+    The update fails unless all of them are still free.
+
+    :param class_id: The ID of the class.
+    :param count: The number of seats to claim.
+    :param room_capacity: The capacity the seat budget was computed from.
+    :return: An Update entry for TransactWriteItems.
+    """
+    return {
+        "Update": {
+            "TableName": "class_table",
+            "Key": {"id": str(class_id)},
+            "UpdateExpression": "ADD enrollment_count :count",
+            "ConditionExpression": "attribute_exists(id) AND (attribute_not_exists(enrollment_count) OR enrollment_count <= :limit)",
+            "ExpressionAttributeValues": {":count": count, ":limit": room_capacity - count},
+        }
+    }
+
+def available_seats(class_info):
+    """
+    Returns the number of free seats of a class item (0 if it is missing).
+    """
+    return max(int(class_info.get("room_capacity", 0) - class_info.get("enrollment_count", 0)), 0)
+
+def promotion_batches(claims):
+    """
+    Splits claimed (student_id, score) tuples into groups that fit one
+    promotion transaction next to the counter update.
+    """
+    size = PROMOTION_BATCH_SIZE - 1
+    return [claims[i:i + size] for i in range(0, len(claims), size)]
+
+def chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def backoff_delay(attempt, base=0.05, cap=2.0):
+    """
+    Returns a full-jitter exponential backoff delay, in seconds, before
+    retrying the unprocessed part of a batch call.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def student_enrollments_query(student_id):
+    """
+    Builds the Query arguments that list the enrollments of a student.
+    """
+    return {
+        "IndexName": STUDENT_ENROLLMENTS_INDEX,
+        "KeyConditionExpression": Key("student_id").eq(str(student_id)),
+    }
+
+def batch_get_classes(dynamodb, class_ids):
+    """
+    Fetches class_table items with chunked BatchGetItem calls, retrying
+    unprocessed keys with backoff.
+
+    :param dynamodb: The shared DynamoDB data access object.
+    :param class_ids: The IDs of the classes.
+    :return: The items found, by class ID.
+    """
+    classes = {}
+    for chunk in chunks(sorted(set(map(str, class_ids))), BATCH_GET_SIZE):
+        request_items = {"class_table": {"Keys": [{"id": class_id} for class_id in chunk]}}
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            response = dynamodb.resource.batch_get_item(RequestItems=request_items)
+            for item in response["Responses"].get("class_table", []):
+                classes[item["id"]] = item
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                break
+            time.sleep(backoff_delay(attempt))
+        else:
+            raise RuntimeError(f"Couldn't fetch {len(request_items['class_table']['Keys'])} classes")
+    return classes
+
+def close_class_for_enrollment(class_table, class_id):
+    """
+    Removes a full class from the open classes index. The condition
+    guards against a seat having been freed in the meantime.
+
+    :param class_table: The class_table Table handle.
+    :param class_id: The ID of the class.
+    """
+    try:
+        class_table.update_item(
+            Key={"id": str(class_id)},
+            UpdateExpression="REMOVE open_for_enrollment",
+            ConditionExpression="enrollment_count >= room_capacity",
+        )
+    except class_table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+def reopen_class_for_enrollment(class_table, class_id):
+    """
+    Puts a class back into the open classes index after its waitlist
+    made room. If the class turns out to be full after all, the next
+    enroll attempt that finds the waitlist full closes it again.
+
+    :param class_table: The class_table Table handle.
+    :param class_id: The ID of the class.
+    """
+    try:
+        class_table.update_item(
+            Key={"id": str(class_id)},
+            UpdateExpression="SET open_for_enrollment = :open",
+            ConditionExpression="attribute_exists(id)",
+            ExpressionAttributeValues={":open": OPEN_FOR_ENROLLMENT},
+        )
+    except class_table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+def enrollment_put(class_id, student_id, enrollment_date):
+    """
+    Builds a TransactWriteItems entry that inserts an enrollment record,
+    failing if the student is already enrolled in the class.
+    """
+    return {
+        "Put": {
+            "TableName": "enrollment_table",
+            "Item": {
+                "class_id": str(class_id),
+                "student_id": str(student_id),
+                "enrollment_date": enrollment_date,
+            },
+            "ConditionExpression": "attribute_not_exists(student_id)",
+        }
+    }
+
+def cancellation_reasons(error):
+    """
+    Returns the cancellation reason code of each item of a cancelled
+    transaction, in the order the items were submitted.
+    """
+    return [reason.get("Code", "None") for reason in error.response.get("CancellationReasons", [])]
 
 class DynamoDBRedisHelper:
-    def __init__(self, dynamodb_resource, redis_conn):
+    def __init__(self, dynamodb_resource, redis_conn, configs):
+        """
+        :param dynamodb_resource: The shared DynamoDB data access object.
+        :param redis_conn: A Redis client.
+        :param configs: The ConfigStore holding configs_table in memory.
+        """
         self.dynamodb_resource = dynamodb_resource
         self.redis_conn = redis_conn
+        self.configs = configs
+        self.waitlist = Waitlist(redis_conn)
 
     def is_auto_enroll_enabled(self):
-        configs_table = self.dynamodb_resource.Table("configs_table")
-        response = configs_table.get_item(Key={"variable_name": "automatic_enrollment"})
-
-        if "Item" in response:
-            return response["Item"]["value"] == "1"
-        else:
-            return False
+        return self.configs.get("automatic_enrollment", False) is True
 
     def enroll_students_from_waitlist(self, class_id_list):
-        enrollment_count = 0
+        """
+        Promotes waitlisted students into the free seats of each class.
 
-        for class_id in class_id_list:
-            enrollment_table = self.dynamodb_resource.Table("enrollment_table")
-            waitlist_key = f"waitlist_{class_id}"
-            waitlist_members = self.redis_conn.zrange(waitlist_key, 0, -1)
+        :return: The number of students enrolled.
+        """
+        return sum(self._enroll_class_from_waitlist(class_id) for class_id in class_id_list)
 
-            class_table = self.dynamodb_resource.Table("class_table")
-            class_info = class_table.get_item(Key={"id": class_id}).get("Item", {})
-            available_spots = class_info.get("room_capacity", 0) - class_info.get("enrollment_count", 0)
+    def _enroll_class_from_waitlist(self, class_id):
+        class_table = self.dynamodb_resource.Table("class_table")
+        class_info = class_table.get_item(Key={"id": str(class_id)}).get("Item", {})
 
-            for waitlist_member in waitlist_members[:available_spots]:
-                student_id = waitlist_member.split("_")[1]
-
-                enrollment_table.put_item(
-                    Item={"class_id": class_id, "student_id": student_id, "enrollment_date": datetime.now().isoformat()}
-                )
+        # Popping the claims atomically keeps concurrent promoters from
+        # enrolling the same student twice
+        claims = self.waitlist.claim(class_id, available_seats(class_info))
+        batches = promotion_batches(claims)
+        enrollment_count = 0
 
-                self.redis_conn.zrem(waitlist_key, waitlist_member)
+        for index, batch in enumerate(batches):
+            try:
+                enrolled, unplaced = self._persist_promotions(class_id, batch, class_info["room_capacity"])
+            except Exception:
+                # Unpersisted claims go back with their original scores
+                self.waitlist.restore(class_id, [claim for rest in batches[index:] for claim in rest])
+                raise
+            enrollment_count += enrolled
+            if unplaced:
+                # The seats were taken concurrently; the rest keep waiting
+                self.waitlist.restore(class_id, unplaced + [claim for rest in batches[index + 1:] for claim in rest])
+                break
 
-                enrollment_count += 1
+        # Only a class whose waitlist filled up leaves the index; promoting
+        # from that waitlist made room on it again
+        if enrollment_count and "open_for_enrollment" not in class_info:
+            reopen_class_for_enrollment(class_table, class_id)
 
         return enrollment_count
 
-# Instantiate DynamoDBRedisHelper
-helper = DynamoDBRedisHelper(dynamodb_resource, redis_conn)
+    def _persist_promotions(self, class_id, batch, room_capacity):
+        """
+        Enrolls one batch of claimed students and claims their seats in a
+        single transaction.
+
+        :return: A (enrolled, unplaced) tuple; unplaced holds the claims that
+                 did not fit because the class filled up in the meantime.
+        """
+        client = self.dynamodb_resource.client
+        enrollment_date = datetime.now().isoformat()
+
+        while batch:
+            try:
+                client.transact_write_items(TransactItems=[
+                    enrollment_count_claim(class_id, len(batch), room_capacity),
+                    *(enrollment_put(class_id, student_id, enrollment_date) for student_id, _ in batch),
+                ])
+            except client.exceptions.TransactionCanceledException as e:
+                seat_reason, *enrollment_reasons = cancellation_reasons(e)
+                if seat_reason == "ConditionalCheckFailed":
+                    return 0, batch
+                enrolled = {student_id for (student_id, _), reason in zip(batch, enrollment_reasons)
+                            if reason == "ConditionalCheckFailed"}
+                if not enrolled:
+                    raise
+                # Already enrolled: drop the stale claims and retry the rest
+                batch = [claim for claim in batch if claim[0] not in enrolled]
+            else:
+                return len(batch), []
 
-# Example usage
-if helper.is_auto_enroll_enabled():
-    available_classes = helper.get_available_classes_within_first_2weeks()
-    enrollment_count = helper.enroll_students_from_waitlist(available_classes)
-    print(f"Enrolled {enrollment_count} students from the waitlist.")
+        return 0, []
@@ -17,6 +17,8 @@ items_to_insert = [
         "course_start_date": "2023-06-12",
         "enrollment_start": "2023-06-01 09:00:00",
         "enrollment_end": "2023-06-15 17:00:00",
+        "enrollment_count": 1,
+        "open_for_enrollment": "Y",
     },
 ]
 for item in items_to_insert:
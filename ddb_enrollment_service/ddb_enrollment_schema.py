@@ -1,9 +1,47 @@
+import functools
 import boto3
 from botocore.exceptions import ClientError
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Sparse index: only classes that still have seats or waitlist room carry
+# the open_for_enrollment attribute
+OPEN_CLASSES_INDEX_SCHEMA = {
+    "IndexName": "open_classes_index",
+    "KeySchema": [
+        {"AttributeName": "open_for_enrollment", "KeyType": "HASH"},
+        {"AttributeName": "enrollment_end", "KeyType": "RANGE"},
+    ],
+    "Projection": {"ProjectionType": "ALL"},
+    "ProvisionedThroughput": {
+        "ReadCapacityUnits": 5,
+        "WriteCapacityUnits": 5,
+    },
+}
+OPEN_CLASSES_INDEX_ATTRIBUTES = [
+    {"AttributeName": "open_for_enrollment", "AttributeType": "S"},
+    {"AttributeName": "enrollment_end", "AttributeType": "S"},
+]
+
+# Lists the enrollments of one student without a scan
+STUDENT_ENROLLMENTS_INDEX_SCHEMA = {
+    "IndexName": "student_enrollments_index",
+    "KeySchema": [
+        {"AttributeName": "student_id", "KeyType": "HASH"},
+        {"AttributeName": "class_id", "KeyType": "RANGE"},
+    ],
+    "Projection": {"ProjectionType": "ALL"},
+    "ProvisionedThroughput": {
+        "ReadCapacityUnits": 5,
+        "WriteCapacityUnits": 5,
+    },
+}
+STUDENT_ENROLLMENTS_INDEX_ATTRIBUTES = [
+    {"AttributeName": "class_id", "AttributeType": "S"},
+    {"AttributeName": "student_id", "AttributeType": "S"},
+]
+
 class Class:
     """Encapsulates an Amazon DynamoDB table for configurations."""
 
@@ -38,7 +76,9 @@ class Class:
                 ],
                 AttributeDefinitions=[
                     {"AttributeName": "id", "AttributeType": "S"},
+                    *OPEN_CLASSES_INDEX_ATTRIBUTES,
                 ],
+                GlobalSecondaryIndexes=[OPEN_CLASSES_INDEX_SCHEMA],
                 ProvisionedThroughput={
                     "ReadCapacityUnits": 5,
                     "WriteCapacityUnits": 5,
@@ -250,10 +290,8 @@ class Enrollment:
                     {"AttributeName": "class_id", "KeyType": "HASH"},  # Partition key
                     {"AttributeName": "student_id", "KeyType": "RANGE"} # Sort Key
                 ],
-                AttributeDefinitions=[
-                    {"AttributeName": "class_id", "AttributeType": "S"},
-                    {"AttributeName": "student_id", "AttributeType": "S"}
-                ],
+                AttributeDefinitions=STUDENT_ENROLLMENTS_INDEX_ATTRIBUTES,
+                GlobalSecondaryIndexes=[STUDENT_ENROLLMENTS_INDEX_SCHEMA],
                 ProvisionedThroughput={
                     "ReadCapacityUnits": 5,
                     "WriteCapacityUnits": 5,
@@ -436,27 +474,24 @@ class Student:
         else:
             return self.table                
         
-def create_table_instance(class_type, table_name):
-    dynamodb_resource = boto3.resource(
+@functools.lru_cache(maxsize=None)
+def get_dynamodb_resource():
+    """Returns a DynamoDB resource shared by every caller in this process."""
+    return boto3.resource(
         'dynamodb',
         #aws_access_key_id='fakeMyKeyId',
         #aws_secret_access_key='fakeSecretAccessKey',
         region_name='local',
         endpoint_url='http://localhost:5300'
     )
-    table_manager = class_type(dynamodb_resource)
+
+def create_table_instance(class_type, table_name):
+    table_manager = class_type(get_dynamodb_resource())
     table_manager.table = table_manager.dyn_resource.Table(table_name)
     return table_manager.table
 
 def create_table(class_type, table_name): 
-    dynamodb_resource = boto3.resource(
-        'dynamodb',
-        #aws_access_key_id='fakeMyKeyId',
-        #aws_secret_access_key='fakeSecretAccessKey',
-        region_name='local',
-        endpoint_url='http://localhost:5300'
-    )
-    table_manager = class_type(dynamodb_resource)
+    table_manager = class_type(get_dynamodb_resource())
     table_manager.create_table(table_name)
     print(f"Table {table_name} created successfully.")
 
@@ -0,0 +1,113 @@
+"""
+One-off migration of enrollment tables created by an older version:
+
+- creates the global secondary indexes the services query
+  (open_classes_index, student_enrollments_index) on tables that lack
+  them, and waits until they are ACTIVE;
+- counts the enrollments of every class in enrollment_table and writes
+  the counts to enrollment_count;
+- puts every class into the open classes index. An enroll attempt that
+  finds a class and its waitlist full takes it out again.
+
+Indexes that already exist are left alone, so the migration can be run
+again.
+
+Run it while the enrollment services are stopped; enrollments made
+during the scan would be miscounted.
+
+    python -m ddb_enrollment_service.enrollment_count_backfill
+"""
+import collections
+import logging
+import time
+from .db_connection import DynamoDB
+from .ddb_enrollment_helper import OPEN_FOR_ENROLLMENT
+from .ddb_enrollment_schema import (OPEN_CLASSES_INDEX_SCHEMA, OPEN_CLASSES_INDEX_ATTRIBUTES,
+                                    STUDENT_ENROLLMENTS_INDEX_SCHEMA, STUDENT_ENROLLMENTS_INDEX_ATTRIBUTES)
+
+logger = logging.getLogger(__name__)
+
+# (table, index, attribute definitions of its keys)
+INDEXES = (
+    ("class_table", OPEN_CLASSES_INDEX_SCHEMA, OPEN_CLASSES_INDEX_ATTRIBUTES),
+    ("enrollment_table", STUDENT_ENROLLMENTS_INDEX_SCHEMA, STUDENT_ENROLLMENTS_INDEX_ATTRIBUTES),
+)
+
+INDEX_POLL_INTERVAL = 5
+INDEX_TIMEOUT = 30 * 60
+
+def index_statuses(client, table_name):
+    """Returns the status of every global secondary index of a table, by name."""
+    table = client.describe_table(TableName=table_name)["Table"]
+    return {index["IndexName"]: index["IndexStatus"] for index in table.get("GlobalSecondaryIndexes", [])}
+
+def ensure_index(client, table_name, index, attribute_definitions, timeout=INDEX_TIMEOUT):
+    """
+    Creates a global secondary index unless the table already has it,
+    then waits until it is ACTIVE.
+
+    :return: True if the index was created.
+    """
+    index_name = index["IndexName"]
+    created = index_name not in index_statuses(client, table_name)
+    if created:
+        logger.info("Creating %s on %s", index_name, table_name)
+        client.update_table(TableName=table_name, AttributeDefinitions=attribute_definitions,
+                            GlobalSecondaryIndexUpdates=[{"Create": index}])
+
+    deadline = time.monotonic() + timeout
+    while (status := index_statuses(client, table_name).get(index_name)) != "ACTIVE":
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"{index_name} on {table_name} is still {status} after {timeout}s")
+        time.sleep(INDEX_POLL_INTERVAL)
+    return created
+
+def scan_all(table, **kwargs):
+    """Yields every item of a paginated Scan."""
+    while True:
+        response = table.scan(**kwargs)
+        yield from response["Items"]
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def count_enrollments(dynamodb):
+    """Returns the number of enrollments by class ID."""
+    counts = collections.Counter()
+    for item in scan_all(dynamodb.Table("enrollment_table"), ProjectionExpression="class_id"):
+        counts[str(item["class_id"])] += 1
+    return counts
+
+def backfill(dynamodb):
+    """
+    Sets enrollment_count and open_for_enrollment on every class item.
+
+    :return: The number of classes updated.
+    """
+    counts = count_enrollments(dynamodb)
+    class_table = dynamodb.Table("class_table")
+    updated = 0
+    for item in scan_all(class_table, ProjectionExpression="id"):
+        class_table.update_item(
+            Key={"id": item["id"]},
+            UpdateExpression="SET enrollment_count = :count, open_for_enrollment = :open",
+            ExpressionAttributeValues={":count": counts.pop(str(item["id"]), 0), ":open": OPEN_FOR_ENROLLMENT},
+        )
+        updated += 1
+    if counts:
+        logger.warning("Enrollments in %d classes that do not exist: %s", len(counts), ", ".join(sorted(counts)))
+    return updated
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    dynamodb = DynamoDB()
+    try:
+        for table_name, index, attribute_definitions in INDEXES:
+            if not ensure_index(dynamodb.client, table_name, index, attribute_definitions):
+                logger.info("%s already has %s", table_name, index["IndexName"])
+        logger.info("Backfilled enrollment_count of %d classes", backfill(dynamodb))
+    finally:
+        dynamodb.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
-from typing import Annotated
-import boto3
+from typing import Annotated, Optional
+import botocore
 from redis import Redis
 from datetime import datetime
-from fastapi import Depends, HTTPException, Header, Body, status, APIRouter
-from .db_connection import get_db, get_redis_db
-from .ddb_enrollment_schema import *
+from fastapi import Depends, HTTPException, Header, Body, Query, status, APIRouter
+from .db_connection import DynamoDB, get_db, get_redis_db
 from boto3.dynamodb.conditions import Key
+from .ddb_enrollment_helper import enrollment_count_update, cancellation_reasons
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, query_page, iter_query, ndjson_response
 WAITLIST_CAPACITY = 15
 MAX_NUMBER_OF_WAITLISTS_PER_STUDENT = 3
 
@@ -13,30 +14,35 @@ instructor_router = APIRouter()
 
 @instructor_router.get("/classes/{class_id}/students")
 def get_current_enrollment(class_id: str,
-              db: boto3.resource = Depends(get_db)):
+              limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+              cursor: Optional[str] = None,
+              response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+              db: DynamoDB = Depends(get_db)):
     """
     Retreive current enrollment for the classes.
 
     Parameters:
     - class_id (int): The ID of the class.
+    - limit (int, in the query string): The maximum number of students per page.
+    - cursor (str, in the query string): The next_cursor of the previous page.
+    - format (str, in the query string): "json" for one page, "ndjson" to stream the whole roster.
 
     Returns:
-    - dict: A dictionary containing the details of the classes
+    - dict: A page of enrollments and the cursor of the next page (null on the last page),
+      or an NDJSON stream of all enrollments.
     """
+    enrollment_table_instance = db.Table("enrollment_table")
+    key_condition = Key('class_id').eq(str(class_id))
+
+    if response_format == "ndjson":
+        return ndjson_response(iter_query(enrollment_table_instance, page_size=limit, KeyConditionExpression=key_condition))
+
     try:
-       
-        enrollment_table_instance = create_table_instance(Enrollment, "enrollment_table")
-             
-        response = enrollment_table_instance.query(KeyConditionExpression=Key('class_id').eq(str(class_id)))
-        items = {'Items': response['Items']}
-        #return response['Items']
-        if items:
-            return items
-        else:
-            return "none"
+        items, next_cursor = query_page(enrollment_table_instance, limit, cursor, KeyConditionExpression=key_condition)
+        return {'Items': items, 'next_cursor': next_cursor}
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving drop list: {str(e)}")
+    except botocore.exceptions.ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving enrollment: {str(e)}")
     
 @instructor_router.get("/classes/{class_id}/waitlist/")
 def get_waitlist(class_id: str, db: Redis = Depends(get_redis_db)):
@@ -50,39 +56,44 @@ def get_waitlist(class_id: str, db: Redis = Depends(get_redis_db)):
     - dict: A dictionary containing the details of the classes
     """
     try:
-        return {"waitlist" : db.zrange(class_id,0,-1)}
+        return {"waitlist" : db.zrange(f"waitlist_{class_id}", 0, -1)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving waitlist: {str(e)}")
     
 @instructor_router.get("/classes/{class_id}/droplist/")
-def get_droplist(class_id: str, db: boto3.resource = Depends(get_db)):
+def get_droplist(class_id: str,
+                 limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                 cursor: Optional[str] = None,
+                 response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                 db: DynamoDB = Depends(get_db)):
     """
     Retreive students who have dropped the class.
 
     Parameters:
     - class_id (int): The ID of the class.
-    - instructor_id (int, In the header): A unique ID for students, instructors, and registrars.
+    - limit (int, in the query string): The maximum number of students per page.
+    - cursor (str, in the query string): The next_cursor of the previous page.
+    - format (str, in the query string): "json" for one page, "ndjson" to stream the whole list.
     
     Returns:
-    - dict: A dictionary containing the details of the classes
+    - dict: A page of dropped students and the cursor of the next page (null on the last page),
+      or an NDJSON stream of all of them.
     """
+    droplist_table_instance = db.Table("droplist_table")
+    key_condition = Key('class_id').eq(str(class_id))
+
+    if response_format == "ndjson":
+        return ndjson_response(iter_query(droplist_table_instance, page_size=limit, KeyConditionExpression=key_condition))
+
     try:
-       
-        droplist_table_instance = create_table_instance(Droplist, "droplist_table")
-             
-        response = droplist_table_instance.query(KeyConditionExpression=Key('class_id').eq(str(class_id)))
-        items = {'Items': response['Items']}
-        #return response['Items']
-        if items:
-            return items
-        else:
-            return "none"
+        items, next_cursor = query_page(droplist_table_instance, limit, cursor, KeyConditionExpression=key_condition)
+        return {'Items': items, 'next_cursor': next_cursor}
         
-    except Exception as e:
+    except botocore.exceptions.ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving drop list: {str(e)}")
 
 @instructor_router.delete("/enrollment/{class_id}/{student_id}/administratively/", status_code=status.HTTP_200_OK) 
-def drop_class(class_id: str, student_id: str, db: boto3.resource = Depends(get_db)):
+def drop_class(class_id: str, student_id: str, db: DynamoDB = Depends(get_db)):
     """
     Handles a DELETE request to administratively drop a student from a specific class.
 
@@ -95,6 +106,7 @@ def drop_class(class_id: str, student_id: str, db: boto3.resource = Depends(get_
     - dict: A dictionary with the detail message indicating the success of the administrative drop.
 
     Raises:
+    - HTTPException (404): If the student is not enrolled in the class.
     - HTTPException (409): If there is a conflict in the delete operation.
     """
     
@@ -115,9 +127,11 @@ def drop_class(class_id: str, student_id: str, db: boto3.resource = Depends(get_
                         {
                             'Delete': {
                                 'TableName': 'enrollment_table',
-                                'Key': delete_key
+                                'Key': delete_key,
+                                'ConditionExpression': 'attribute_exists(student_id)'
                             }
                         },
+                        enrollment_count_update(class_id, -1),
                         {
                             'Put': {
                                 'TableName': 'droplist_table',
@@ -126,8 +140,13 @@ def drop_class(class_id: str, student_id: str, db: boto3.resource = Depends(get_
                         }
                     ] 
               
-        response = db.meta.client.transact_write_items(TransactItems = transact_items)
-        
-        print("TransactWriteItems succeeded:", response)
+        db.client.transact_write_items(TransactItems = transact_items)
+    except db.client.exceptions.TransactionCanceledException as e:
+        if "ConditionalCheckFailed" in cancellation_reasons(e):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Record Not Found")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"type": type(e).__name__, "msg": str(e)},
+        )
     except Exception as e:  
         raise HTTPException(status_code=500, detail=f"Error dropping student: {str(e)}")    
\ No newline at end of file
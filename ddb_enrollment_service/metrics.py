@@ -0,0 +1,247 @@
+import os
+import time
+import anyio.to_thread
+import redis
+import redis.asyncio
+from fastapi import APIRouter, Request, Response
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST,
+                               REGISTRY, generate_latest, multiprocess)
+from starlette.routing import Match
+from .tracing import record_call, redis_key_pattern
+
+# Every uvicorn process of every service writes its samples to the
+# directory named by PROMETHEUS_MULTIPROC_DIR; /metrics sums them up.
+METRICS_PREFIX = "enrollment_"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "enrollment_http_request_duration_seconds", "Request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "enrollment_http_requests_in_progress", "Requests being served by route",
+    ["method", "route"], multiprocess_mode="livesum",
+)
+DYNAMODB_LATENCY = Histogram(
+    "enrollment_dynamodb_call_duration_seconds", "DynamoDB API call latency",
+    ["operation", "table", "outcome"], buckets=LATENCY_BUCKETS,
+)
+DYNAMODB_CONSUMED_CAPACITY = Counter(
+    "enrollment_dynamodb_consumed_capacity_units", "Capacity units reported by ReturnConsumedCapacity",
+    ["operation", "table"],
+)
+REDIS_LATENCY = Histogram(
+    "enrollment_redis_command_duration_seconds", "Redis command latency",
+    ["command", "outcome"], buckets=LATENCY_BUCKETS,
+)
+THREADPOOL_BUSY = Gauge(
+    "enrollment_threadpool_busy_threads", "Worker threads running sync routes",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_SIZE = Gauge(
+    "enrollment_threadpool_size", "Worker threads available to sync routes",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_WAITING = Gauge(
+    "enrollment_threadpool_waiting_tasks", "Sync routes waiting for a worker thread",
+    multiprocess_mode="livesum",
+)
+
+# Operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = frozenset((
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems",
+))
+
+def route_template(app, scope):
+    """
+    Returns the path template of the route a request will be served by,
+    so labels stay bounded however many class IDs are requested.
+    """
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+def update_threadpool_gauges():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    THREADPOOL_BUSY.set(statistics.borrowed_tokens)
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+    THREADPOOL_WAITING.set(statistics.tasks_waiting)
+
+async def metrics_middleware(request: Request, call_next):
+    route = route_template(request.app, request.scope)
+    in_progress = REQUESTS_IN_PROGRESS.labels(request.method, route)
+    in_progress.inc()
+    update_threadpool_gauges()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        REQUEST_LATENCY.labels(request.method, route, str(status_code)).observe(time.perf_counter() - started)
+        in_progress.dec()
+        update_threadpool_gauges()
+
+# --- DynamoDB ---------------------------------------------------------------
+
+def _call_table(params):
+    if "TableName" in params:
+        return params["TableName"]
+    if "RequestItems" in params and len(params["RequestItems"]) == 1:
+        return next(iter(params["RequestItems"]))
+    return "multiple"
+
+def _returned_items(parsed):
+    if "Items" in parsed:
+        return len(parsed["Items"])
+    if "Responses" in parsed:
+        responses = parsed["Responses"]
+        return sum(map(len, responses.values())) if isinstance(responses, dict) else len(responses)
+    return 1 if parsed.get("Item") else 0
+
+def _before_parameter_build(params, model, context, **kwargs):
+    context["metrics_operation"] = model.name
+    context["metrics_table"] = _call_table(params)
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+def _before_call(context, **kwargs):
+    context["metrics_started"] = time.perf_counter()
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    started = context.get("metrics_started")
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    table = context.get("metrics_table", "unknown")
+    outcome = "error" if "Error" in parsed else "ok"
+    DYNAMODB_LATENCY.labels(model.name, table, outcome).observe(duration)
+    record_call("dynamodb", model.name, table, duration, _returned_items(parsed))
+
+    consumed = parsed.get("ConsumedCapacity")
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    for capacity in consumed or ():
+        DYNAMODB_CONSUMED_CAPACITY.labels(model.name, capacity.get("TableName", table)).inc(
+            capacity.get("CapacityUnits", 0))
+
+def _after_call_error(context, **kwargs):
+    # Raised before a response was parsed, e.g. on a connection error
+    started = context.get("metrics_started")
+    if started is not None:
+        DYNAMODB_LATENCY.labels(context["metrics_operation"], context.get("metrics_table", "unknown"),
+                                "error").observe(time.perf_counter() - started)
+
+def instrument_dynamodb(client):
+    """
+    Records the latency and consumed capacity of every call made through
+    a botocore (or aiobotocore) DynamoDB client.
+    """
+    events = client.meta.events
+    events.register("before-parameter-build.dynamodb", _before_parameter_build)
+    events.register("before-call.dynamodb", _before_call)
+    events.register("after-call.dynamodb", _after_call)
+    events.register("after-call-error.dynamodb", _after_call_error)
+
+# --- Redis ------------------------------------------------------------------
+
+def _observe_redis(args, outcome, duration, result):
+    command = str(args[0]).upper()
+    REDIS_LATENCY.labels(command, outcome).observe(duration)
+    items = len(result) if isinstance(result, (list, set, dict)) else int(result is not None)
+    record_call("redis", command, redis_key_pattern(args), duration, items)
+
+class _InstrumentedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error=True):
+        started = time.perf_counter()
+        outcome = "error"
+        result = None
+        try:
+            result = super().execute(raise_on_error)
+            outcome = "ok"
+            return result
+        finally:
+            _observe_redis(("PIPELINE",), outcome, time.perf_counter() - started, result)
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that records every command in the metrics and the request trace."""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        outcome = "error"
+        result = None
+        try:
+            result = super().execute_command(*args, **options)
+            outcome = "ok"
+            return result
+        finally:
+            _observe_redis(args, outcome, time.perf_counter() - started, result)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+class _AsyncInstrumentedPipeline(redis.asyncio.client.Pipeline):
+    async def execute(self, raise_on_error=True):
+        started = time.perf_counter()
+        outcome = "error"
+        result = None
+        try:
+            result = await super().execute(raise_on_error)
+            outcome = "ok"
+            return result
+        finally:
+            _observe_redis(("PIPELINE",), outcome, time.perf_counter() - started, result)
+
+class AsyncInstrumentedRedis(redis.asyncio.Redis):
+    """Asyncio counterpart of InstrumentedRedis."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        outcome = "error"
+        result = None
+        try:
+            result = await super().execute_command(*args, **options)
+            outcome = "ok"
+            return result
+        finally:
+            _observe_redis(args, outcome, time.perf_counter() - started, result)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _AsyncInstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+# --- exposition ---------------------------------------------------------------
+
+class _PrefixCollector:
+    """Keeps the metrics of one service out of another's /metrics."""
+
+    def __init__(self, collector, prefix):
+        self.collector = collector
+        self.prefix = prefix
+
+    def collect(self):
+        return (metric for metric in self.collector.collect() if metric.name.startswith(self.prefix))
+
+def exposition(prefix):
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    registry.register(_PrefixCollector(multiprocess.MultiProcessCollector(CollectorRegistry()), prefix))
+    return generate_latest(registry)
+
+def mark_process_dead():
+    """Drops the live gauges of this process; call on shutdown."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    update_threadpool_gauges()
+    return Response(exposition(METRICS_PREFIX), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,109 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def _encode_number(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_cursor(last_evaluated_key):
+    """
+    Turns a LastEvaluatedKey into an opaque, URL-safe cursor token.
+
+    :param last_evaluated_key: The LastEvaluatedKey of a Query, or None.
+    :return: The cursor, or None when there are no more pages.
+    """
+    if not last_evaluated_key:
+        return None
+    payload = json.dumps(last_evaluated_key, separators=(",", ":"), default=_encode_number)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Turns a cursor token back into an ExclusiveStartKey.
+
+    :param cursor: A token produced by encode_cursor, or None.
+    :raises HTTPException (400): If the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded), parse_int=Decimal, parse_float=Decimal)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        key = None
+    if not isinstance(key, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return key
+
+def query_page(table, limit, cursor, **query_params):
+    """
+    Runs a single Query page.
+
+    :param table: A Table handle.
+    :param limit: The maximum number of items to evaluate.
+    :param cursor: The cursor of the previous page, or None.
+    :return: The items of the page and the cursor of the next page (None on the last page).
+    """
+    exclusive_start_key = decode_cursor(cursor)
+    if exclusive_start_key:
+        query_params["ExclusiveStartKey"] = exclusive_start_key
+
+    response = table.query(Limit=limit, **query_params)
+    return response.get("Items", []), encode_cursor(response.get("LastEvaluatedKey"))
+
+def iter_query(table, page_size=DEFAULT_PAGE_SIZE, **query_params):
+    """
+    Yields every item of a Query, fetching one page at a time.
+    """
+    while True:
+        response = table.query(Limit=page_size, **query_params)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+async def async_query_page(table, limit, cursor, **query_params):
+    """Asyncio counterpart of query_page."""
+    exclusive_start_key = decode_cursor(cursor)
+    if exclusive_start_key:
+        query_params["ExclusiveStartKey"] = exclusive_start_key
+
+    response = await table.query(Limit=limit, **query_params)
+    return response.get("Items", []), encode_cursor(response.get("LastEvaluatedKey"))
+
+async def async_iter_query(table, page_size=DEFAULT_PAGE_SIZE, **query_params):
+    """Asyncio counterpart of iter_query."""
+    while True:
+        response = await table.query(Limit=page_size, **query_params)
+        for item in response.get("Items", []):
+            yield item
+        if "LastEvaluatedKey" not in response:
+            return
+        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def ndjson_response(items):
+    """
+    Streams items as newline-delimited JSON. Works with sync and async
+    iterables; only one DynamoDB page is held in memory at a time.
+    """
+    if hasattr(items, "__aiter__"):
+        async def lines():
+            async for item in items:
+                yield json.dumps(jsonable_encoder(item)) + "\n"
+    else:
+        def lines():
+            for item in items:
+                yield json.dumps(jsonable_encoder(item)) + "\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
@@ -1,17 +1,20 @@
 from typing import Annotated
-import boto3
-from fastapi import Depends, Response, HTTPException, Body, status, APIRouter
-from .db_connection import get_db
-from .ddb_enrollment_schema import *
-from boto3.dynamodb.conditions import Key
+from fastapi import Depends, Request, HTTPException, Body, status, APIRouter
+from fastapi.concurrency import run_in_threadpool
+from .db_connection import DynamoDB, get_db, get_class_cache, get_configs
+from .configs import ConfigStore
+from .class_cache import ClassCache
 from .models import Course, ClassCreate, ClassPatch
+from .ddb_enrollment_helper import new_class_item, new_course_item, class_patch_update
+from .bulk_import import BulkImport, iter_rows, batch_write
 WAITLIST_CAPACITY = 15
 MAX_NUMBER_OF_WAITLISTS_PER_STUDENT = 3
 
 registrar_router = APIRouter()
 
 @registrar_router.put("/auto-enrollment/")
-def set_auto_enrollment(enabled: Annotated[bool, Body(embed=True)], db: boto3.resource = Depends(get_db)):
+def set_auto_enrollment(enabled: Annotated[bool, Body(embed=True)], db: DynamoDB = Depends(get_db),
+                        configs: ConfigStore = Depends(get_configs)):
     """
     Endpoint for enabling/disabling automatic enrollment.
 
@@ -32,13 +35,16 @@ def set_auto_enrollment(enabled: Annotated[bool, Body(embed=True)], db: boto3.re
                 'value': enabled,
         }
 )
+        # Every instance keeps configs_table in memory; tell them to reload
+        configs.publish_change('automatic_enrollment')
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving drop list: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error setting auto enrollment: {str(e)}")
 
     return {"detail": f"Auto enrollment: {enabled}"}
 
 @registrar_router.post("/classes/", status_code=status.HTTP_201_CREATED)
-def create_class(body_data: ClassCreate, db: boto3.resource = Depends(get_db)):
+def create_class(body_data: ClassCreate, db: DynamoDB = Depends(get_db),
+                 class_cache: ClassCache = Depends(get_class_cache)):
     """
     Creates a new class.
 
@@ -63,24 +69,12 @@ def create_class(body_data: ClassCreate, db: boto3.resource = Depends(get_db)):
     - HTTPException (409): If a conflict occurs (e.g., duplicate course).
     """
     try:
-        class_table_instance = create_table_instance(Class, "class_table")
-
-        item_to_add = {
-            "id": body_data.id,
-            "dept_code": body_data.dept_code,
-            "course_num": body_data.course_num,
-            "section_no": body_data.section_no,
-            "academic_year": body_data.academic_year,
-            "semester": body_data.semester,
-            "instructor_id": body_data.instructor_id,
-            "room_num": body_data.room_num,
-            "room_capacity": body_data.room_capacity,
-            "course_start_date": body_data.course_start_date,
-            "enrollment_start": body_data.enrollment_start,
-            "enrollment_end": body_data.enrollment_end,
-        }
+        class_table_instance = db.Table("class_table")
+
+        item_to_add = new_class_item(body_data)
 
         class_table_instance.put_item(Item=item_to_add)
+        class_cache.invalidate(item_to_add["id"])
 
         return {"added to class table": item_to_add}
 
@@ -89,7 +83,7 @@ def create_class(body_data: ClassCreate, db: boto3.resource = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error creating class: {str(e)}")
     
 @registrar_router.post("/courses/", status_code=status.HTTP_201_CREATED)
-def create_course(course: Course, db: boto3.resource = Depends(get_db)
+def create_course(course: Course, db: DynamoDB = Depends(get_db)
 ):
     """
     Creates a new course with the provided details.
@@ -108,21 +102,76 @@ def create_course(course: Course, db: boto3.resource = Depends(get_db)
     """
     try:
         table = db.Table('course_table')
-        table.put_item(
-            Item={
-                'department_code': course.department_code,
-                'course_no': course.course_no,
-                'course_name': course.title
-            }
-        )   
+        table.put_item(Item=new_course_item(course))
 
         return {"Course created"}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating course: {str(e)}")
         
+@registrar_router.post("/classes/bulk", status_code=status.HTTP_200_OK)
+async def bulk_create_classes(request: Request, db: DynamoDB = Depends(get_db),
+                              class_cache: ClassCache = Depends(get_class_cache)):
+    """
+    Creates many classes from an NDJSON or CSV upload.
+
+    The body holds one class per line (NDJSON) or one per record after a
+    header line (CSV), with the fields of POST /classes/.
+
+    Returns:
+    - dict: The number of created, invalid, conflicting and failed
+      rows, and the status of every row. Rows whose key already
+      exists are conflicts; existing items are never replaced.
+
+    Raises:
+    - HTTPException (415): If the body is neither NDJSON nor CSV.
+    """
+    def write(rows):
+        failures = batch_write(db, "class_table", bulk_import, rows)
+        for row_number, item in rows:
+            if row_number not in failures:
+                class_cache.invalidate(item["id"])
+        return failures
+
+    bulk_import = BulkImport(ClassCreate, new_class_item, ("id",))
+    async for row_number, row in iter_rows(request):
+        if bulk_import.add(row_number, row):
+            rows = bulk_import.take_pending()
+            bulk_import.record(rows, await run_in_threadpool(write, rows))
+    rows = bulk_import.take_pending()
+    bulk_import.record(rows, await run_in_threadpool(write, rows))
+
+    return bulk_import.summary()
+
+@registrar_router.post("/courses/bulk", status_code=status.HTTP_200_OK)
+async def bulk_create_courses(request: Request, db: DynamoDB = Depends(get_db)):
+    """
+    Creates many courses from an NDJSON or CSV upload.
+
+    The body holds one course per line (NDJSON) or one per record after a
+    header line (CSV), with the fields of POST /courses/.
+
+    Returns:
+    - dict: The number of created, invalid, conflicting and failed
+      rows, and the status of every row. Rows whose key already
+      exists are conflicts; existing items are never replaced.
+
+    Raises:
+    - HTTPException (415): If the body is neither NDJSON nor CSV.
+    """
+    bulk_import = BulkImport(Course, new_course_item, ("department_code", "course_no"))
+    async for row_number, row in iter_rows(request):
+        if bulk_import.add(row_number, row):
+            rows = bulk_import.take_pending()
+            bulk_import.record(rows, await run_in_threadpool(batch_write, db, "course_table", bulk_import, rows))
+    rows = bulk_import.take_pending()
+    bulk_import.record(rows, await run_in_threadpool(batch_write, db, "course_table", bulk_import, rows))
+
+    return bulk_import.summary()
+
 @registrar_router.delete("/classes/{id}", status_code=status.HTTP_200_OK)
-def delete_class(id: int, db: boto3.resource = Depends(get_db)):
+def delete_class(id: int, db: DynamoDB = Depends(get_db),
+                 class_cache: ClassCache = Depends(get_class_cache)):
     """
     Deletes a specific class.
 
@@ -146,6 +195,7 @@ def delete_class(id: int, db: boto3.resource = Depends(get_db)):
                 'id': str(id)
             }
         )  
+        class_cache.invalidate(id)
 
         return {"message": "Item deleted successfully"}
     
@@ -153,7 +203,8 @@ def delete_class(id: int, db: boto3.resource = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error creating course: {str(e)}")
 
 @registrar_router.patch("/classes/{id}", status_code=status.HTTP_200_OK)
-def update_class(id: int, body_data: ClassPatch, db: boto3.resource = Depends(get_db)):
+def update_class(id: int, body_data: ClassPatch, db: DynamoDB = Depends(get_db),
+                 class_cache: ClassCache = Depends(get_class_cache)):
     """
     Updates specific details of a class.
 
@@ -175,19 +226,18 @@ def update_class(id: int, body_data: ClassPatch, db: boto3.resource = Depends(ge
     - HTTPException (404): If the class with the specified ID is not found.
     - HTTPException (409): If there is a conflict in the update operation (e.g., duplicate class details).
     """
+    fields = body_data.model_dump(exclude_none=True)
+    if not fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
     try:
         table = db.Table('class_table')
-        table.update_item(
-            Key={
-                'id': str(id),
-            },
-            UpdateExpression='SET instuctor_id = :val1',
-            ExpressionAttributeValues={
-                ':val1': body_data.instructor_id
-            }
-        )       
+        table.update_item(**class_patch_update(id, fields))
+        class_cache.invalidate(id)
 
         return {"message": "Item updated successfully"}
     
+    except db.client.exceptions.ConditionalCheckFailedException:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Class Not Found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating item: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,29 @@
+SEAT_FREED_STREAM = "seat_freed"
+AUTO_ENROLLMENT_GROUP = "auto_enrollment"
+
+# Approximate cap on the stream length; acked events are not needed again
+SEAT_FREED_STREAM_MAXLEN = 10000
+
+# Events the auto-enrollment worker gave up on, with the reason why
+SEAT_FREED_DEAD_LETTER_STREAM = "seat_freed_dead_letter"
+
+def seat_freed_event(class_id):
+    return {"class_id": str(class_id)}
+
+def publish_seat_freed(redis_conn, class_id):
+    """
+    Appends a seat freed event for the auto-enrollment worker.
+
+    :param redis_conn: A Redis client.
+    :param class_id: The ID of the class that has a free seat.
+    :return: The ID of the stream entry.
+    """
+    return redis_conn.xadd(SEAT_FREED_STREAM, seat_freed_event(class_id),
+                           maxlen=SEAT_FREED_STREAM_MAXLEN, approximate=True)
+
+async def async_publish_seat_freed(redis_conn, class_id):
+    """
+    Asyncio counterpart of publish_seat_freed, for redis.asyncio clients.
+    """
+    return await redis_conn.xadd(SEAT_FREED_STREAM, seat_freed_event(class_id),
+                                 maxlen=SEAT_FREED_STREAM_MAXLEN, approximate=True)
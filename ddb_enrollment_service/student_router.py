@@ -1,59 +1,99 @@
-from typing import Annotated
-import boto3
+from typing import Annotated, Optional
 import botocore
-from fastapi import Depends, HTTPException, Header, Body, status, APIRouter
-from .db_connection import get_db
-from ddb_enrollment_schema import *
-from boto3.dynamodb.conditions import Key
+from fastapi import Depends, HTTPException, Header, Body, Query, status, APIRouter
+from .db_connection import DynamoDB, get_db, get_redis_db, get_ddb_helper, get_class_cache, get_waitlist
+from .class_cache import ClassCache
+from .waitlist import (Waitlist, MAX_NUMBER_OF_WAITLISTS_PER_STUDENT,
+                       WAITLIST_FULL, TOO_MANY_WAITLISTS, REMOVED_FROM_FULL)
+from boto3.dynamodb.conditions import Key, Attr
 from datetime import datetime
+import time
 import redis
-from .ddb_enrollment_helper import DynamoDBRedisHelper
-
-dynamodb_resource = boto3.resource('dynamodb', region_name='local')
-redis_conn = redis.Redis(decode_responses=True)
-ddb_helper_instance = DynamoDBRedisHelper(dynamodb_resource, redis_conn)
-
-class_table_manager = Class(dynamodb_resource)
-
-WAITLIST_CAPACITY = 15
-MAX_NUMBER_OF_WAITLISTS_PER_STUDENT = 3
+from .ddb_enrollment_helper import (DynamoDBRedisHelper, OPEN_CLASSES_INDEX, OPEN_FOR_ENROLLMENT,
+                                    enrollment_count_update, enrollment_put, cancellation_reasons,
+                                    close_class_for_enrollment, reopen_class_for_enrollment, student_enrollments_query,
+                                    batch_get_classes)
+from .seat_events import publish_seat_freed
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, query_page, iter_query, ndjson_response
 
 student_router = APIRouter()
 
 @student_router.get("/classes/available/")
-def get_available_classes(db: boto3.resource = Depends(get_db)):
-    try: 
-        available_classes = []
+def get_available_classes(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    db: DynamoDB = Depends(get_db)):
+    """
+    Retreive classes that are in their enrollment window and still
+    have seats or waitlist room.
 
-        class_table_instance = create_table_instance(Class, "class_table")
-        enrollment_table_instance = create_table_instance(Enrollment, "enrollment_table")
+    Parameters:
+    - limit (int, in the query string): The maximum number of classes to evaluate per page.
+    - cursor (str, in the query string): The next_cursor of the previous page.
+    - format (str, in the query string): "json" for one page, "ndjson" to stream every class.
 
-        response = class_table_instance.scan()
+    Returns:
+    - dict: A page of classes and the cursor of the next page (null on the last page),
+      or an NDJSON stream of all classes.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        items = response.get('Items', [])
+    # The sparse index only holds open classes; closed windows fall
+    # outside the enrollment_end range.
+    query_params = {
+        "IndexName": OPEN_CLASSES_INDEX,
+        "KeyConditionExpression": Key('open_for_enrollment').eq(OPEN_FOR_ENROLLMENT) & Key('enrollment_end').gte(now),
+        "FilterExpression": Attr('enrollment_start').lte(now),
+    }
+    class_table_instance = db.Table("class_table")
 
-        for item in items:
-            class_id = item['id']
-            room_capacity = item['room_capacity']
-            enrollments = enrollment_table_instance.query(KeyConditionExpression=Key('class_id').eq(class_id))
-            num_of_enrollments = len(enrollments.get('Items', []))
-            if num_of_enrollments < room_capacity:
-                available_classes.append(item)
+    if response_format == "ndjson":
+        return ndjson_response(iter_query(class_table_instance, page_size=limit, **query_params))
 
-        for item in available_classes:
-            print(item)
+    try: 
+        available_classes, next_cursor = query_page(class_table_instance, limit, cursor, **query_params)
 
-        return {"available_classes" : available_classes}
+        return {"available_classes" : available_classes, "next_cursor": next_cursor}
     
-    except Exception as e:
+    except botocore.exceptions.ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving classes: {str(e)}")
     
+@student_router.get("/enrollment/")
+def get_schedule(
+    student_id: int = Header(
+        alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
+    db: DynamoDB = Depends(get_db)):
+    """
+    Retreive the classes the student is enrolled in
+
+    Returns:
+    - dict: A dictionary with the student's enrollments, each holding the
+      details of its class.
+
+    Raises:
+    - HTTPException (500): If there is an internal server error.
+    """
+    try:
+        # One Query on the student-keyed index, then the classes in batches
+        enrollments = list(iter_query(db.Table("enrollment_table"), **student_enrollments_query(student_id)))
+        classes = batch_get_classes(db, [enrollment["class_id"] for enrollment in enrollments])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving schedule: {str(e)}")
+
+    return {"enrollments": [
+        {**enrollment, "class": classes.get(enrollment["class_id"])} for enrollment in enrollments
+    ]}
+
 @student_router.post("/enrollment/")
 def enroll(class_id: Annotated[int, Body(embed=True)],
            student_id: int = Header(
                alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
            first_name: str = Header(alias="x-first-name"),
-           last_name: str = Header(alias="x-last-name")):
+           last_name: str = Header(alias="x-last-name"),
+           db: DynamoDB = Depends(get_db),
+           waitlist: Waitlist = Depends(get_waitlist),
+           class_cache: ClassCache = Depends(get_class_cache)):
     """
     Student enrolls in a class
 
@@ -62,40 +102,57 @@ def enroll(class_id: Annotated[int, Body(embed=True)],
     - student_id (int, in the request header): The unique identifier of the student who is enrolling.
 
     Returns:
-    - HTTP_200_OK on success
+    - HTTP_200_OK on success. If the class is full the student is put on
+      its waitlist and the waitlist position is returned.
 
     Raises:
-    - HTTPException (400): If there are no available seats.
+    - HTTPException (400): If there are no available seats and the student cannot be waitlisted.
     - HTTPException (404): If the specified class does not exist.
     - HTTPException (409): If a conflict occurs (e.g., The student has already enrolled into the class).
     - HTTPException (500): If there is an internal server error.
     """
 
-    try:
-        class_table_instance = create_table_instance(Class, "class_table")
-        enrollment_table_instance = create_table_instance(Enrollment, "enrollment_table")
-
-        response = class_table_instance.query(KeyConditionExpression=Key('id').eq(class_id))
-        class_item = response.get('Items', [])[0]
-        room_capacity = class_item['room_capacity']
-        enrollments = enrollment_table_instance.query(KeyConditionExpression=Key('class_id').eq(class_id))
-
-        num_of_enrollments = len(enrollments.get('Items', []))
-        if num_of_enrollments < room_capacity:
-            enrollment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            item_to_add = {
-                "class_id": class_id,
-                "enrollment_date": enrollment_date,
-                "student_id" : student_id
-            }
+    enrollment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            enrollment_table_instance.put_item(Item=item_to_add)
-            return {"message": "Enrollment successful"}
-        else:
-             raise HTTPException(status_code=400, detail="No available seats in the class.")
-        
+    # Claim a seat and insert the enrollment in one conditional transaction,
+    # so the seat check costs no extra read.
+    transact_items = [
+        enrollment_count_update(class_id, 1, check_capacity=True),
+        enrollment_put(class_id, student_id, enrollment_date),
+    ]
+
+    try:
+        db.client.transact_write_items(TransactItems=transact_items)
+    except db.client.exceptions.TransactionCanceledException as e:
+        seat_reason, enrollment_reason = cancellation_reasons(e)
+        if enrollment_reason == "ConditionalCheckFailed":
+            raise HTTPException(status_code=409, detail="The student has already enrolled into the class.")
+        if seat_reason != "ConditionalCheckFailed":
+            raise HTTPException(status_code=409, detail={"type": type(e).__name__, "msg": str(e)})
+
+        # Tell a missing class apart from a full one; if it is full, put
+        # the student on its waitlist instead
+        try:
+            class_exists = class_cache.get(class_id) is not None
+            if class_exists:
+                waitlist_status, waitlist_position = waitlist.join(class_id, student_id, time.time())
+                if waitlist_status == WAITLIST_FULL:
+                    close_class_for_enrollment(db.Table("class_table"), class_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error enrolling into class: {str(e)}")
+
+        if not class_exists:
+            raise HTTPException(status_code=404, detail="Class Not Found")
+        if waitlist_status == WAITLIST_FULL:
+            raise HTTPException(status_code=400, detail="No open seats and the waitlist is also full")
+        if waitlist_status == TOO_MANY_WAITLISTS:
+            raise HTTPException(
+                status_code=400, detail=f"Cannot exceed {MAX_NUMBER_OF_WAITLISTS_PER_STUDENT} waitlists limit")
+        return {"message": "Added to the waitlist", "waitlist_position": waitlist_position}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving classes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error enrolling into class: {str(e)}")
+
+    return {"message": "Enrollment successful"}
 
 
 @student_router.delete("/enrollment/{class_id}", status_code=status.HTTP_200_OK)
@@ -103,7 +160,9 @@ def drop_class(
     class_id: int,
     student_id: int = Header(
         alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
-    db: boto3.resource = Depends(get_db)
+    db: DynamoDB = Depends(get_db),
+    redis_conn: redis.Redis = Depends(get_redis_db),
+    ddb_helper: DynamoDBRedisHelper = Depends(get_ddb_helper)
 ):
     """
     Handles a DELETE request to drop a student (himself/herself) from a specific class.
@@ -119,42 +178,44 @@ def drop_class(
     - HTTPException (404): If the specified enrollment record is not found.
     - HTTPException (409): If a conflict occurs.
     """
-    try:
-        enrollment_table_instance = create_table_instance(Enrollment, "enrollment_table")
-
-        # Check if the enrollment record exists
-        enrollment_response = enrollment_table_instance.query(
-            KeyConditionExpression=Key('class_id').eq(class_id) & Key('student_id').eq(str(student_id))
-        )
-        enrollment_items = enrollment_response.get('Items', [])
-
-        if not enrollment_items:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Record Not Found"
-            )
-
-        # Delete the enrollment record
-        enrollment_table_instance.delete_item(
-            Key={
-                'class_id': class_id,
-                'student_id': str(student_id)
+    transact_items = [
+        {
+            # Delete the enrollment record, if it exists
+            "Delete": {
+                "TableName": "enrollment_table",
+                "Key": {"class_id": str(class_id), "student_id": str(student_id)},
+                "ConditionExpression": "attribute_exists(student_id)",
             }
-        )
-
-        # Insert into Droplist
-        droplist_table_instance = create_table_instance(Droplist, "drolist_table")
-        droplist_table_instance.put_item(
-            Item={
-                "class_id": class_id,
-                "student_id": str(student_id),
-                "drop_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "administrative": False
+        },
+        # Release the seat
+        enrollment_count_update(class_id, -1),
+        {
+            # Insert into Droplist
+            "Put": {
+                "TableName": "droplist_table",
+                "Item": {
+                    "class_id": str(class_id),
+                    "student_id": str(student_id),
+                    "drop_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "administrative": False
+                },
             }
-        )
+        },
+    ]
 
-        # Trigger auto enrollment using the instance
-        if ddb_helper_instance.is_auto_enroll_enabled(db):        
-            ddb_helper_instance.enroll_students_from_waitlist(db, [class_id])
+    try:
+        try:
+            db.client.transact_write_items(TransactItems=transact_items)
+        except db.client.exceptions.TransactionCanceledException as e:
+            if "ConditionalCheckFailed" in cancellation_reasons(e):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Record Not Found"
+                )
+            raise
+
+        # The auto-enrollment worker fills the freed seat from the waitlist
+        if ddb_helper.is_auto_enroll_enabled():
+            publish_seat_freed(redis_conn, class_id)
 
     except botocore.exceptions.ClientError as e:
         raise HTTPException(
@@ -165,11 +226,32 @@ def drop_class(
     return {"detail": "Item deleted successfully"}
 
 
+@student_router.get("/waitlist/positions/")
+def get_waitlist_positions(
+    student_id: int = Header(
+        alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
+    waitlist: Waitlist = Depends(get_waitlist)):
+    """
+    Retreive the student's position on every waitlist they are on
+
+    Returns:
+    - dict: A dictionary with one entry per waitlisted class, holding the
+      class ID, the student's position and the length of the waitlist.
+
+    Raises:
+    - HTTPException (500): If Redis cannot be reached.
+    """
+    try:
+        return {"waitlists": waitlist.positions(student_id)}
+    except redis.exceptions.RedisError as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving waitlist positions: {str(e)}")
+
 @student_router.get("/waitlist/{class_id}/position/")
 def get_current_waitlist_position(
     class_id:int,
     student_id: int = Header(
-        alias="x-cwid", description="A unique ID for students, instructors, and registrars")):
+        alias="x-cwid", description="A unique ID for students, instructors, and registrars"),
+    redis_conn: redis.Redis = Depends(get_redis_db)):
     """
     Retreive waitlist position
 
@@ -180,7 +262,6 @@ def get_current_waitlist_position(
 
     """
     try:
-        redis_conn = redis.Redis(decode_responses=True)
         waitlist_key_to_check = f"waitlist_{class_id}"
 
         waitlist_position = redis_conn.zrank(waitlist_key_to_check, f"{class_id}_{student_id}")
@@ -200,16 +281,18 @@ def remove_from_waitlist(
     class_id: int,
     student_id: int = Header(
         alias="x-cwid", description="A unique ID for students, instructors, and registrars"
-    )
+    ),
+    waitlist: Waitlist = Depends(get_waitlist),
+    db: DynamoDB = Depends(get_db)
 ):
-    # Remove student from Redis waitlist
-    waitlist_key = f"waitlist_{class_id}"
-    member = f"{class_id}_{student_id}"
-
-    if not redis_conn.zrem(waitlist_key, member):
+    # Remove student from Redis waitlist and from the student's waitlist index
+    removed = waitlist.remove(class_id, student_id)
+    if not removed:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Record Not Found in Redis"
         )
+    # A full waitlist took the class out of the open classes index
+    if removed == REMOVED_FROM_FULL:
+        reopen_class_for_enrollment(db.Table("class_table"), class_id)
 
     return {"detail": "Item deleted successfully"}
-     
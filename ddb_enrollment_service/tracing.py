@@ -0,0 +1,170 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import random
+import re
+import time
+import uuid
+from fastapi import Request
+
+# Requests sent with this header get their trace back as JSON
+DEBUG_TRACE_HEADER = "x-debug-trace"
+TRACE_RESPONSE_HEADER = "x-trace"
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.01"))
+# Each worker process writes and rotates its own file, traces-<pid>.jsonl
+TRACE_LOG_PATH = os.environ.get("TRACE_LOG_PATH", "./var/traces.jsonl")
+
+# Calls kept per trace, so a runaway loop can't grow a header without bound
+MAX_TRACED_CALLS = 200
+
+# Proxies reject responses with large headers (KrakenD and nginx allow
+# 8 KiB by default); calls beyond this size are left out of x-trace
+MAX_TRACE_HEADER_BYTES = 6 * 1024
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+_trace_logger = None
+
+def trace_log_path(pid=None):
+    """
+    Returns the trace log of a process. Rotation renames the file, so
+    processes sharing one file would rotate it out from under each other.
+    """
+    root, extension = os.path.splitext(TRACE_LOG_PATH)
+    return f"{root}-{pid or os.getpid()}{extension}"
+
+def _get_trace_logger():
+    """Returns the logger of sampled traces, one JSON object per line."""
+    global _trace_logger
+    if _trace_logger is None:
+        path = trace_log_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=50 * 1024 * 1024, backupCount=5)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(__name__ + ".sampled")
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _trace_logger = logger
+    return _trace_logger
+
+class Trace:
+    """The backend calls made while serving one request.
+
+    Set as a context variable by the middleware; sync routes see it too
+    because the threadpool copies the context into the worker thread.
+    """
+
+    def __init__(self, trace_id, method, path):
+        self.trace_id = trace_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.calls = []
+        self.dropped_calls = 0
+
+    def record(self, backend, operation, target, duration, items):
+        if len(self.calls) >= MAX_TRACED_CALLS:
+            self.dropped_calls += 1
+            return
+        self.calls.append({
+            "backend": backend,
+            "operation": operation,
+            "target": target,
+            "start_ms": round((time.perf_counter() - self.started - duration) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "items": items,
+        })
+
+    def backend_totals(self):
+        totals = {}
+        for call in self.calls:
+            count, duration = totals.get(call["backend"], (0, 0.0))
+            totals[call["backend"]] = (count + 1, duration + call["duration_ms"])
+        return totals
+
+    def server_timing(self, total_ms):
+        """
+        Builds the Server-Timing header value. The app entry is the time
+        not spent waiting on a backend.
+        """
+        entries = []
+        backend_ms = 0.0
+        for backend, (count, duration) in sorted(self.backend_totals().items()):
+            entries.append(f'{backend};dur={duration:.2f};desc="{count} calls"')
+            backend_ms += duration
+        entries.append(f"app;dur={max(total_ms - backend_ms, 0):.2f}")
+        entries.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(entries)
+
+    def to_dict(self, status_code, total_ms):
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status_code,
+            "total_ms": round(total_ms, 3),
+            "calls": self.calls,
+            "dropped_calls": self.dropped_calls,
+        }
+
+    def header_value(self, status_code, total_ms, max_bytes=MAX_TRACE_HEADER_BYTES):
+        """
+        Serializes the trace for the x-trace header, leaving out the
+        latest calls (counted in dropped_calls) to stay under max_bytes.
+        """
+        trace = self.to_dict(status_code, total_ms)
+        value = json.dumps(trace, separators=(",", ":"))
+        calls = self.calls
+        while len(value) > max_bytes and trace["calls"]:
+            # Cut in proportion to the excess, by at least one call
+            keep = min(len(trace["calls"]) - 1, len(trace["calls"]) * max_bytes // len(value))
+            trace["calls"] = calls[:keep]
+            trace["dropped_calls"] = self.dropped_calls + len(calls) - keep
+            value = json.dumps(trace, separators=(",", ":"))
+        return value
+
+def record_call(backend, operation, target, duration, items=0):
+    """
+    Adds a backend call to the trace of the current request, if any.
+
+    :param backend: "dynamodb" or "redis".
+    :param operation: The API operation or Redis command.
+    :param target: The table name or Redis key pattern.
+    :param duration: The duration of the call, in seconds.
+    :param items: The number of items returned.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(backend, operation, target, duration, items)
+
+def redis_key_pattern(args):
+    """
+    Returns the key of a Redis command with IDs replaced by {id}, e.g.
+    waitlist_{id}. For scripts, the first key is used.
+    """
+    if len(args) < 2:
+        return ""
+    key = args[1]
+    if str(args[0]).upper() in ("EVALSHA", "EVAL"):
+        key = args[3] if len(args) > 3 and int(args[2]) > 0 else ""
+    return re.sub(r"\d+", "{id}", str(key))
+
+async def tracing_middleware(request: Request, call_next):
+    trace = Trace(request.headers.get("x-request-id") or uuid.uuid4().hex, request.method, request.url.path)
+    token = _current_trace.set(trace)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_trace.reset(token)
+
+    total_ms = (time.perf_counter() - trace.started) * 1000
+    response.headers["Server-Timing"] = trace.server_timing(total_ms)
+    if request.headers.get(DEBUG_TRACE_HEADER):
+        response.headers[TRACE_RESPONSE_HEADER] = trace.header_value(response.status_code, total_ms)
+    if random.random() < TRACE_SAMPLE_RATE:
+        _get_trace_logger().info(json.dumps(trace.to_dict(response.status_code, total_ms), separators=(",", ":")))
+    return response
@@ -0,0 +1,231 @@
+WAITLIST_CAPACITY = 15
+MAX_NUMBER_OF_WAITLISTS_PER_STUDENT = 3
+
+# Status codes returned by the join script
+JOINED = 1
+ALREADY_WAITLISTED = 0
+WAITLIST_FULL = -1
+TOO_MANY_WAITLISTS = -2
+
+# Status codes returned by the remove script
+NOT_WAITLISTED = 0
+REMOVED = 1
+REMOVED_FROM_FULL = 2
+
+# KEYS[1]: waitlist sorted set, KEYS[2]: per-student index of waitlisted classes
+# ARGV: member, score, class_id, waitlist capacity, max waitlists per student
+JOIN_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return {0, redis.call('ZRANK', KEYS[1], ARGV[1]) + 1}
+end
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[4]) then
+    return {-1, 0}
+end
+if redis.call('SCARD', KEYS[2]) >= tonumber(ARGV[5]) then
+    return {-2, 0}
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[3])
+return {1, redis.call('ZRANK', KEYS[1], ARGV[1]) + 1}
+"""
+
+# KEYS[1]: waitlist sorted set, KEYS[2]: per-student index of waitlisted classes
+# ARGV: member, class_id, waitlist capacity
+REMOVE_SCRIPT = """
+local was_full = redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3])
+local removed = redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('SREM', KEYS[2], ARGV[2])
+if removed == 1 and was_full then
+    return 2
+end
+return removed
+"""
+
+# KEYS[1]: waitlist sorted set
+# ARGV: number of members to claim, student index key prefix, class_id
+# Pops the earliest members and drops the class from their student
+# indexes. The index keys are derived from the members, which is fine on
+# the single Redis node this service uses.
+CLAIM_SCRIPT = """
+local claimed = redis.call('ZPOPMIN', KEYS[1], ARGV[1])
+for i = 1, #claimed, 2 do
+    local student_id = string.match(claimed[i], '_(.*)$')
+    redis.call('SREM', ARGV[2] .. student_id, ARGV[3])
+end
+return claimed
+"""
+
+# KEYS[1]: waitlist sorted set
+# ARGV: student index key prefix, class_id, then member/score pairs
+RESTORE_SCRIPT = """
+for i = 3, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+    local student_id = string.match(ARGV[i], '_(.*)$')
+    redis.call('SADD', ARGV[1] .. student_id, ARGV[2])
+end
+return (#ARGV - 2) / 2
+"""
+
+STUDENT_WAITLISTS_PREFIX = "student_waitlists_"
+
+def waitlist_key(class_id):
+    return f"waitlist_{class_id}"
+
+def student_waitlists_key(student_id):
+    return f"{STUDENT_WAITLISTS_PREFIX}{student_id}"
+
+def waitlist_member(class_id, student_id):
+    return f"{class_id}_{student_id}"
+
+class Waitlist:
+    """Atomic waitlist operations backed by server-side Redis scripts.
+
+    Each class has a waitlist_{class_id} sorted set scored by join time,
+    and each student has a student_waitlists_{student_id} set of the
+    classes they wait on. Both are updated by the same script, so the
+    capacity limits hold across every instance in one round trip
+    (EVALSHA, falling back to EVAL once if the script is not cached).
+    """
+
+    def __init__(self, redis_conn, capacity=WAITLIST_CAPACITY,
+                 max_waitlists_per_student=MAX_NUMBER_OF_WAITLISTS_PER_STUDENT):
+        """
+        :param redis_conn: A Redis client.
+        :param capacity: The maximum number of students on one waitlist.
+        :param max_waitlists_per_student: The maximum number of waitlists a student may be on.
+        """
+        self.redis_conn = redis_conn
+        self.capacity = capacity
+        self.max_waitlists_per_student = max_waitlists_per_student
+        self._join = redis_conn.register_script(JOIN_SCRIPT)
+        self._remove = redis_conn.register_script(REMOVE_SCRIPT)
+        self._claim = redis_conn.register_script(CLAIM_SCRIPT)
+        self._restore = redis_conn.register_script(RESTORE_SCRIPT)
+
+    def join(self, class_id, student_id, score):
+        """
+        Adds a student to the waitlist of a class.
+
+        :param score: The join time; earlier scores are promoted first.
+        :return: A (status, position) tuple where status is one of JOINED,
+                 ALREADY_WAITLISTED, WAITLIST_FULL or TOO_MANY_WAITLISTS.
+        """
+        status, position = self._join(
+            keys=[waitlist_key(class_id), student_waitlists_key(student_id)],
+            args=[waitlist_member(class_id, student_id), score, class_id,
+                  self.capacity, self.max_waitlists_per_student],
+        )
+        return int(status), int(position)
+
+    def remove(self, class_id, student_id):
+        """
+        Removes a student from the waitlist of a class.
+
+        :return: NOT_WAITLISTED (falsy) if the student was not on the
+                 waitlist, REMOVED_FROM_FULL if the waitlist was full
+                 before, REMOVED otherwise.
+        """
+        removed = self._remove(
+            keys=[waitlist_key(class_id), student_waitlists_key(student_id)],
+            args=[waitlist_member(class_id, student_id), class_id, self.capacity],
+        )
+        return int(removed)
+
+    def claim(self, class_id, count):
+        """
+        Atomically pops up to count students from the head of a waitlist.
+        Concurrent callers never receive the same student.
+
+        :return: A list of (student_id, score) tuples in waitlist order.
+        """
+        if count <= 0:
+            return []
+        claimed = self._claim(keys=[waitlist_key(class_id)], args=[count, STUDENT_WAITLISTS_PREFIX, class_id])
+        return _parse_claims(claimed)
+
+    def restore(self, class_id, claims):
+        """
+        Puts claimed students back on the waitlist with their original scores.
+
+        :param claims: (student_id, score) tuples returned by claim().
+        """
+        if claims:
+            self._restore(keys=[waitlist_key(class_id)], args=_restore_args(class_id, claims))
+
+    def positions(self, student_id):
+        """
+        Looks up the student's position on every waitlist they are on,
+        using their waitlist index and one pipelined batch of ZRANK and
+        ZCARD calls.
+
+        :return: A list of dicts with class_id, waitlist_position and
+                 waitlist_length, ordered by class_id.
+        """
+        class_ids = sorted(self.redis_conn.smembers(student_waitlists_key(student_id)))
+        if not class_ids:
+            return []
+        pipe = self.redis_conn.pipeline(transaction=False)
+        for class_id in class_ids:
+            pipe.zrank(waitlist_key(class_id), waitlist_member(class_id, student_id))
+            pipe.zcard(waitlist_key(class_id))
+        return _positions(class_ids, pipe.execute())
+
+def _positions(class_ids, results):
+    positions = []
+    for class_id, rank, length in zip(class_ids, results[0::2], results[1::2]):
+        # Skip index entries whose waitlist entry is already gone
+        if rank is not None:
+            positions.append({"class_id": class_id, "waitlist_position": rank + 1, "waitlist_length": length})
+    return positions
+
+def _parse_claims(claimed):
+    claims = []
+    for member, score in zip(claimed[0::2], claimed[1::2]):
+        if isinstance(member, bytes):
+            member = member.decode("utf-8")
+        claims.append((member.split("_", 1)[1], float(score)))
+    return claims
+
+def _restore_args(class_id, claims):
+    args = [STUDENT_WAITLISTS_PREFIX, class_id]
+    for student_id, score in claims:
+        args.extend([waitlist_member(class_id, student_id), repr(score)])
+    return args
+
+class AsyncWaitlist(Waitlist):
+    """Asyncio counterpart of Waitlist, for redis.asyncio clients."""
+
+    async def join(self, class_id, student_id, score):
+        status, position = await self._join(
+            keys=[waitlist_key(class_id), student_waitlists_key(student_id)],
+            args=[waitlist_member(class_id, student_id), score, class_id,
+                  self.capacity, self.max_waitlists_per_student],
+        )
+        return int(status), int(position)
+
+    async def remove(self, class_id, student_id):
+        removed = await self._remove(
+            keys=[waitlist_key(class_id), student_waitlists_key(student_id)],
+            args=[waitlist_member(class_id, student_id), class_id, self.capacity],
+        )
+        return int(removed)
+
+    async def claim(self, class_id, count):
+        if count <= 0:
+            return []
+        claimed = await self._claim(keys=[waitlist_key(class_id)], args=[count, STUDENT_WAITLISTS_PREFIX, class_id])
+        return _parse_claims(claimed)
+
+    async def restore(self, class_id, claims):
+        if claims:
+            await self._restore(keys=[waitlist_key(class_id)], args=_restore_args(class_id, claims))
+
+    async def positions(self, student_id):
+        class_ids = sorted(await self.redis_conn.smembers(student_waitlists_key(student_id)))
+        if not class_ids:
+            return []
+        pipe = self.redis_conn.pipeline(transaction=False)
+        for class_id in class_ids:
+            pipe.zrank(waitlist_key(class_id), waitlist_member(class_id, student_id))
+            pipe.zcard(waitlist_key(class_id))
+        return _positions(class_ids, await pipe.execute())
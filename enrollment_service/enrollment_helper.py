@@ -32,10 +32,7 @@ def get_available_classes_within_first_2weeks(db: sqlite3.Connection):
         SELECT id 
         FROM class 
         WHERE course_start_date >= datetime('now', '-14 days')
-            AND room_capacity > (SELECT COUNT(student_id)
-                            FROM enrollment
-                            WHERE class_id = id
-                            )
+            AND room_capacity > enrolled_count
         """)
     rows = cursor.fetchall()
     return [row[0] for row in rows]
@@ -64,12 +61,9 @@ def enroll_students_from_waitlist(db: sqlite3.Connection, class_id_list: list[in
                 WHERE class_id=$0
                 ORDER BY waitlist_date ASC
                 LIMIT (
-                        (SELECT room_capacity 
+                        SELECT room_capacity - enrolled_count
                         FROM class
-                        WHERE id=$0) - (SELECT COUNT(student_id)
-                                        FROM enrollment
-                                        WHERE class_id=$0
-                                        )
+                        WHERE id=$0
                     );
             """, [e])
 
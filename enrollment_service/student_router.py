@@ -18,21 +18,15 @@ def get_available_classes(db: sqlite3.Connection = Depends(get_db)):
     - dict: A dictionary containing the details of the classes
     """
     try:
+        # The seat condition must match the WHERE clause of idx_class_open,
+        # with the capacity inlined, for the index to be used
         classes = db.execute(
-            """
+            f"""
             SELECT c.*
             FROM "class" as c
-            WHERE datetime('now') BETWEEN c.enrollment_start AND c.enrollment_end 
-                AND (
-                        (c.room_capacity > 
-                            (SELECT COUNT(enrollment.student_id)
-                            FROM enrollment
-                            WHERE class_id=c.id) > 0) 
-                        OR ((SELECT COUNT(waitlist.student_id)
-                            FROM waitlist
-                            WHERE class_id=c.id) < ?)
-                    );
-            """, [WAITLIST_CAPACITY]
+            WHERE c.enrollment_end >= datetime('now') AND c.enrollment_start <= datetime('now')
+                AND (c.enrolled_count < c.room_capacity OR c.waitlist_count < {int(WAITLIST_CAPACITY)});
+            """
         )
     except sqlite3.Error as e:
         raise HTTPException(
@@ -70,12 +64,12 @@ def enroll(class_id: Annotated[int, Body(embed=True)],
         class_info = db.execute(
             """
             SELECT id, course_start_date, enrollment_start, enrollment_end, datetime('now') AS datetime_now, 
-                    (room_capacity - COUNT(enrollment.class_id)) AS available_seats
-            FROM class LEFT JOIN enrollment ON class.id = enrollment.class_id 
-            WHERE class.id = ?;
+                    (room_capacity - enrolled_count) AS available_seats, waitlist_count
+            FROM class
+            WHERE id = ?;
             """, [class_id]).fetchone()
 
-        if not class_info["id"]:
+        if class_info is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Class Not Found")
 
@@ -97,26 +91,17 @@ def enroll(class_id: Annotated[int, Body(embed=True)],
 
             result = db.execute(
                 """
-                SELECT * 
-                FROM 
-                    (
-                        SELECT COUNT(class_id) AS num_waitlists_student_is_on 
-                        FROM waitlist 
-                        WHERE student_id = ?
-                    ), 
-                    (
-                        SELECT COUNT(student_id) AS num_students_on_this_waitlist 
-                        FROM waitlist 
-                        WHERE class_id = ?
-                    );
-                """, [student_id, class_id]).fetchone()
+                SELECT COUNT(class_id) AS num_waitlists_student_is_on 
+                FROM waitlist 
+                WHERE student_id = ?;
+                """, [student_id]).fetchone()
 
             if int(result["num_waitlists_student_is_on"]) >= MAX_NUMBER_OF_WAITLISTS_PER_STUDENT:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST, 
                     detail=f"Cannot exceed {MAX_NUMBER_OF_WAITLISTS_PER_STUDENT} waitlists limit")
             
-            if int(result["num_students_on_this_waitlist"]) >= WAITLIST_CAPACITY:
+            if int(class_info["waitlist_count"]) >= WAITLIST_CAPACITY:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST, detail="No open seats and the waitlist is also full")
             
@@ -14,6 +14,12 @@ sh ./bin/create-dotenv.sh
 # Create user database if not exists
 sh ./bin/create-user-db.sh
 
+# Add indexes of newer schemas to an existing user database
+sh ./bin/migrate-user-db.sh
+
+# Metrics of the previous run would be summed into the new ones
+rm -rf ./var/prometheus && mkdir -p ./var/prometheus
+
 # Start the services
 #foreman start -m gateway=1,enrollment_service=3,user_service=1,dynamodb=1,redis=1
-foreman start -m gateway=1,enrollment_service=3,user_service_primary=1,user_service_secondary=1,user_service_tertiary=1,dynamodb=1,redis=1
+foreman start -m gateway=1,enrollment_service=3,user_service_primary=1,user_service_secondary=1,user_service_tertiary=1,dynamodb=1,redis=1,auto_enrollment_worker=1
@@ -0,0 +1,61 @@
+-- One-off migration of an enrollment database created before class had
+-- enrolled_count and waitlist_count: adds the columns, the triggers that
+-- maintain them and the index of open classes, then backfills the counts.
+--
+--     sqlite3 ./var/enrollment_local.db < share/enrollment_counters_backfill.sql
+PRAGMA foreign_keys = ON;
+BEGIN TRANSACTION;
+
+ALTER TABLE class ADD COLUMN enrolled_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE class ADD COLUMN waitlist_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE class SET
+	enrolled_count = (SELECT COUNT(*) FROM enrollment WHERE enrollment.class_id = class.id),
+	waitlist_count = (SELECT COUNT(*) FROM waitlist WHERE waitlist.class_id = class.id);
+
+-- Classes a student can enroll or wait in. 15 is WAITLIST_CAPACITY in
+-- enrollment_service/student_router.py; queries must repeat this WHERE
+-- clause word for word for SQLite to use the index.
+CREATE INDEX idx_class_open ON class(enrollment_end, enrollment_start)
+	WHERE enrolled_count < room_capacity OR waitlist_count < 15;
+
+-- Keep class.enrolled_count and class.waitlist_count in step with the
+-- rows of enrollment and waitlist. An update of class_id cascaded from
+-- class(id) leaves no row with the old ID, and the counts moved with it.
+CREATE TRIGGER enrollment_count_insert AFTER INSERT ON enrollment
+BEGIN
+	UPDATE class SET enrolled_count = enrolled_count + 1 WHERE id = NEW.class_id;
+END;
+
+CREATE TRIGGER enrollment_count_delete AFTER DELETE ON enrollment
+BEGIN
+	UPDATE class SET enrolled_count = enrolled_count - 1 WHERE id = OLD.class_id;
+END;
+
+CREATE TRIGGER enrollment_count_update AFTER UPDATE OF class_id ON enrollment
+	WHEN OLD.class_id <> NEW.class_id AND EXISTS (SELECT 1 FROM class WHERE id = OLD.class_id)
+BEGIN
+	UPDATE class SET enrolled_count = enrolled_count - 1 WHERE id = OLD.class_id;
+	UPDATE class SET enrolled_count = enrolled_count + 1 WHERE id = NEW.class_id;
+END;
+
+CREATE TRIGGER waitlist_count_insert AFTER INSERT ON waitlist
+BEGIN
+	UPDATE class SET waitlist_count = waitlist_count + 1 WHERE id = NEW.class_id;
+END;
+
+CREATE TRIGGER waitlist_count_delete AFTER DELETE ON waitlist
+BEGIN
+	UPDATE class SET waitlist_count = waitlist_count - 1 WHERE id = OLD.class_id;
+END;
+
+CREATE TRIGGER waitlist_count_update AFTER UPDATE OF class_id ON waitlist
+	WHEN OLD.class_id <> NEW.class_id AND EXISTS (SELECT 1 FROM class WHERE id = OLD.class_id)
+BEGIN
+	UPDATE class SET waitlist_count = waitlist_count - 1 WHERE id = OLD.class_id;
+	UPDATE class SET waitlist_count = waitlist_count + 1 WHERE id = NEW.class_id;
+END;
+
+ANALYZE;
+
+COMMIT;
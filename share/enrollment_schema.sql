@@ -47,6 +47,9 @@ CREATE TABLE class (
 	course_start_date DATETIME NOT NULL,
 	enrollment_start DATETIME NOT NULL,
 	enrollment_end DATETIME NOT NULL,
+	-- Maintained by the triggers on enrollment and waitlist
+	enrolled_count INTEGER NOT NULL DEFAULT 0,
+	waitlist_count INTEGER NOT NULL DEFAULT 0,
 	UNIQUE (dept_code, course_num, section_no, academic_year, semester),
 	FOREIGN KEY (dept_code, course_num) REFERENCES course(department_code, course_no)
 );
@@ -57,6 +60,12 @@ CREATE INDEX idx_enrollment_start ON class (enrollment_start);
 CREATE INDEX idx_enrollment_end ON class (enrollment_end);
 CREATE INDEX idx_class_instructor ON class(instructor_id);
 
+-- Classes a student can enroll or wait in. 15 is WAITLIST_CAPACITY in
+-- enrollment_service/student_router.py; queries must repeat this WHERE
+-- clause word for word for SQLite to use the index.
+CREATE INDEX idx_class_open ON class(enrollment_end, enrollment_start)
+	WHERE enrolled_count < room_capacity OR waitlist_count < 15;
+
 DROP TABLE IF EXISTS enrollment;
 CREATE TABLE enrollment (
 	class_id INTEGER NOT NULL REFERENCES class(id) ON DELETE RESTRICT ON UPDATE CASCADE,
@@ -76,6 +85,43 @@ CREATE TABLE waitlist (
 CREATE INDEX idx_waitlist_id_date ON waitlist(class_id, waitlist_date);
 CREATE INDEX idx_waitlist_student ON waitlist(student_id);
 
+-- Keep class.enrolled_count and class.waitlist_count in step with the
+-- rows of enrollment and waitlist. An update of class_id cascaded from
+-- class(id) leaves no row with the old ID, and the counts moved with it.
+CREATE TRIGGER enrollment_count_insert AFTER INSERT ON enrollment
+BEGIN
+	UPDATE class SET enrolled_count = enrolled_count + 1 WHERE id = NEW.class_id;
+END;
+
+CREATE TRIGGER enrollment_count_delete AFTER DELETE ON enrollment
+BEGIN
+	UPDATE class SET enrolled_count = enrolled_count - 1 WHERE id = OLD.class_id;
+END;
+
+CREATE TRIGGER enrollment_count_update AFTER UPDATE OF class_id ON enrollment
+	WHEN OLD.class_id <> NEW.class_id AND EXISTS (SELECT 1 FROM class WHERE id = OLD.class_id)
+BEGIN
+	UPDATE class SET enrolled_count = enrolled_count - 1 WHERE id = OLD.class_id;
+	UPDATE class SET enrolled_count = enrolled_count + 1 WHERE id = NEW.class_id;
+END;
+
+CREATE TRIGGER waitlist_count_insert AFTER INSERT ON waitlist
+BEGIN
+	UPDATE class SET waitlist_count = waitlist_count + 1 WHERE id = NEW.class_id;
+END;
+
+CREATE TRIGGER waitlist_count_delete AFTER DELETE ON waitlist
+BEGIN
+	UPDATE class SET waitlist_count = waitlist_count - 1 WHERE id = OLD.class_id;
+END;
+
+CREATE TRIGGER waitlist_count_update AFTER UPDATE OF class_id ON waitlist
+	WHEN OLD.class_id <> NEW.class_id AND EXISTS (SELECT 1 FROM class WHERE id = OLD.class_id)
+BEGIN
+	UPDATE class SET waitlist_count = waitlist_count - 1 WHERE id = OLD.class_id;
+	UPDATE class SET waitlist_count = waitlist_count + 1 WHERE id = NEW.class_id;
+END;
+
 DROP TABLE IF EXISTS droplist;
 CREATE TABLE droplist (
 	class_id INTEGER NOT NULL REFERENCES class(id) ON DELETE RESTRICT ON UPDATE CASCADE,
@@ -10,6 +10,9 @@ CREATE TABLE user (
     last_name TEXT NOT NULL
 );
 
+-- Covers every column login reads, so it never visits the table
+CREATE INDEX user_login_index ON user(username, hashed_password, first_name, last_name);
+
 DROP TABLE IF EXISTS roles;
 CREATE TABLE roles (
     id INTEGER PRIMARY KEY,
@@ -1,3 +1,4 @@
+import json
 import os
 import requests
 from tests.settings import *
@@ -60,6 +61,39 @@ def user_login(username, password):
     
     return None
 
+def user_login_tokens(username, password):
+    # Both signed tokens, or None if the login failed
+    url = f'{BASE_URL}/api/login'
+    myobj = {
+        "username": username,
+        "password": password
+    }
+    response = requests.post(url, json = myobj)
+    if response.status_code == 200:
+        return response.json()
+
+    return None
+
+def user_refresh(refresh_token):
+    headers = {
+        "Authorization": f"Bearer {refresh_token}"
+    }
+    url = f'{BASE_URL}/api/refresh/'
+    response = requests.post(url, headers=headers)
+    return response
+
+def user_bulk_register(users: list[dict], access_token, content_type="application/x-ndjson"):
+    # One JSON object per line
+    headers = {
+        "Content-Type": content_type,
+        "Authorization": f"Bearer {access_token}"
+    }
+    body = "\n".join(json.dumps(user) for user in users)
+
+    url = f'{BASE_URL}/api/register/bulk'
+    response = requests.post(url, headers=headers, data=body)
+    return response
+
 def create_class(dept_code, course_num, section_no, academic_year, semester,
                 instructor_id, room_capacity, 
                 course_start_date, enrollment_start, enrollment_end, access_token):
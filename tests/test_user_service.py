@@ -1,8 +1,19 @@
+import base64
+import hashlib
 import unittest
 import requests
-from tests.helpers import user_register, user_login, unittest_setUp, unittest_tearDown
+from tests.helpers import (user_register, user_login, user_login_tokens, user_refresh, user_bulk_register,
+                           enroll_class, unittest_setUp, unittest_tearDown)
 from tests.settings import BASE_URL, USER_DB_PATH
 
+def bulk_user(user_id, username, roles=("Student",), **password):
+    return {"id": user_id, "username": username, "first_name": "john", "last_name": "smith",
+            "roles": list(roles), **(password or {"password": "1234"})}
+
+def pbkdf2_hash(password, salt="0123456789abcdef", iterations=1000):
+    pw_hash = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations)
+    return f"pbkdf2_sha256${iterations}${salt}${base64.b64encode(pw_hash).decode('ascii')}"
+
 class UserServiceTest(unittest.TestCase):
     def setUp(self):
         unittest_setUp()
@@ -35,5 +46,86 @@ class UserServiceTest(unittest.TestCase):
         access_token = user_login(username="username_does_not_exists", password="1234")
         self.assertIsNone(access_token)   
 
+    # ------------- REFRESH TESTS -------------
+    def test_refresh(self):
+        user_register(2, "nathan", "1234", "nathan", "nguyen", ["Student"])
+        tokens = user_login_tokens(username="nathan", password="1234")
+        response = user_refresh(tokens["refresh_token"])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("access_token", data)
+        self.assertIn("refresh_token", data)
+        # The new refresh token can be exchanged in turn
+        self.assertEqual(user_refresh(data["refresh_token"]).status_code, 200)
+
+    def test_refresh_with_access_token(self):
+        user_register(2, "nathan", "1234", "nathan", "nguyen", ["Student"])
+        tokens = user_login_tokens(username="nathan", password="1234")
+        # Access tokens are issued for another audience
+        response = user_refresh(tokens["access_token"])
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_token_on_role_checked_endpoint(self):
+        user_register(2, "nathan", "1234", "nathan", "nguyen", ["Student"])
+        tokens = user_login_tokens(username="nathan", password="1234")
+        # Refresh tokens carry no roles
+        response = enroll_class(1, tokens["refresh_token"])
+
+        self.assertIn(response.status_code, (401, 403))
+
+    # ------------- BULK REGISTER TESTS -------------
+    def registrar_token(self):
+        user_register(1, "registrar", "1234", "nathan", "nguyen", ["Registrar"])
+        return user_login(username="registrar", password="1234")
+
+    def test_bulk_register(self):
+        access_token = self.registrar_token()
+        users = [bulk_user(user_id, f"student{user_id}") for user_id in range(10, 15)]
+        response = user_bulk_register(users, access_token)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 5)
+        self.assertIsNotNone(user_login(username="student12", password="1234"))
+
+    def test_bulk_register_hashed_password(self):
+        access_token = self.registrar_token()
+        users = [bulk_user(10, "hashed", hashed_password=pbkdf2_hash("secret"))]
+        response = user_bulk_register(users, access_token)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 1)
+        self.assertIsNotNone(user_login(username="hashed", password="secret"))
+        self.assertIsNone(user_login(username="hashed", password="wrong_password"))
+
+    def test_bulk_register_duplicates_in_upload(self):
+        access_token = self.registrar_token()
+        users = [bulk_user(10, "student10"), bulk_user(10, "other"), bulk_user(11, "student10")]
+        response = user_bulk_register(users, access_token)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["created"], data["invalid"]), (1, 2))
+        self.assertEqual([row["status"] for row in data["rows"]], ["created", "invalid", "invalid"])
+
+    def test_bulk_register_conflicts_with_existing_users(self):
+        access_token = self.registrar_token()
+        user_register(10, "nathan", "1234", "nathan", "nguyen", ["Student"])
+        users = [bulk_user(10, "student10"), bulk_user(11, "nathan"), bulk_user(12, "student12")]
+        response = user_bulk_register(users, access_token)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["created"], data["conflict"]), (1, 2))
+        self.assertEqual([row["status"] for row in data["rows"]], ["conflict", "conflict", "created"])
+        self.assertIsNone(user_login(username="student10", password="1234"))
+
+    def test_bulk_register_requires_ndjson(self):
+        access_token = self.registrar_token()
+        response = user_bulk_register([bulk_user(10, "student10")], access_token, content_type="text/csv")
+
+        self.assertEqual(response.status_code, 415)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -11,14 +11,37 @@ import logging
 import secrets
 import hashlib
 import base64
+import functools
+import httpx
 
-from fastapi import FastAPI, Depends, Response, HTTPException, status, Path
-from .db_connection import get_db
-from pydantic import BaseModel
+from fastapi import FastAPI, Depends, Request, Response, HTTPException, status, Path, Header
+from fastapi.concurrency import run_in_threadpool
+from .bulk_register import BulkRegistration, iter_rows, load_role_ids, register_batch
+from .db_connection import create_pool, get_db, settings
+from .metrics import mark_process_dead, metrics_middleware, metrics_router
+from .password_pool import PasswordPool, default_workers, get_password_pool
+from .profile_cache import ProfileCache, get_profile_cache
+from .queries import LOGIN_QUERY, PROFILE_QUERY
+from .replication import FORWARDED_HEADER, TXID_HEADER, Replication, get_replication
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings
 
 ALGORITHM = "pbkdf2_sha256"
 
+ACCESS_TOKEN_MINUTES = 20
+REFRESH_TOKEN_MINUTES = 24 * 60
+
+# Only /api/refresh/ accepts this audience, and refresh tokens carry no
+# roles, so neither kind of token can stand in for the other
+ACCESS_AUDIENCE = "krakend.local.gd"
+REFRESH_AUDIENCE = "krakend.local.gd/refresh"
+
+# Seconds a replica waits for the primary to register a forwarded upload
+BULK_FORWARD_TIMEOUT = 300
+
+# Seconds a failed login on a replica waits to catch up with the primary
+LOGIN_CATCH_UP_TIMEOUT = 0.5
+
 class UserRegisterModel(BaseModel):
     id: int
     username: str
@@ -27,11 +50,48 @@ class UserRegisterModel(BaseModel):
     last_name: str
     roles: list[str]
 
+class UserBulkRegisterModel(BaseModel):
+    id: int
+    username: str
+    password: str | None = None
+    hashed_password: str | None = None
+    first_name: str
+    last_name: str
+    roles: list[str]
+
+    @model_validator(mode="after")
+    def check_password(self):
+        if (self.password is None) == (self.hashed_password is None):
+            raise ValueError("Exactly one of password and hashed_password is required")
+        if self.hashed_password is not None:
+            parts = self.hashed_password.split("$")
+            if len(parts) != 4 or parts[0] != ALGORITHM or not parts[1].isdigit() or not parts[2] or not parts[3]:
+                raise ValueError(f"hashed_password must be {ALGORITHM}$<iterations>$<salt>$<hash>")
+        return self
+
 class UserLoginModel(BaseModel):
     username: str
     password: str    
 
-app = FastAPI()    
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # PBKDF2 runs in worker processes, off the request threads
+    app.state.db_pool = create_pool()
+    app.state.replication = Replication(settings.db_path, settings.USER_SERVICE_PRIMARY_URL)
+    app.state.password_pool = PasswordPool(
+        hash_password, verify_password,
+        max_workers=settings.USER_SERVICE_PASSWORD_WORKERS or default_workers(settings.USER_SERVICE_LOCAL_INSTANCES),
+    )
+    app.state.profile_cache = ProfileCache(functools.partial(load_profile, app.state.db_pool))
+    yield
+    app.state.password_pool.shutdown()
+    app.state.db_pool.close()
+    app.state.replication.close()
+    mark_process_dead()
+
+app = FastAPI(lifespan=lifespan)
+app.middleware("http")(metrics_middleware)
+app.include_router(metrics_router)
  
 def hash_password(password, salt=None, iterations=260000):
     if salt is None:
@@ -61,10 +121,11 @@ def expiration_in(minutes):
 
 
 def generate_claims(username, user_id, roles, first_name, last_name):
-    _, exp = expiration_in(20)
+    _, exp = expiration_in(ACCESS_TOKEN_MINUTES)
+    _, refresh_exp = expiration_in(REFRESH_TOKEN_MINUTES)
 
     claims = {
-        "aud": "krakend.local.gd",
+        "aud": ACCESS_AUDIENCE,
         "iss": "auth.local.gd",
         "sub": username,
         "jti": str(user_id),
@@ -73,20 +134,74 @@ def generate_claims(username, user_id, roles, first_name, last_name):
         "first_name": first_name,
         "last_name": last_name   
     }
+    refresh_claims = {
+        "aud": REFRESH_AUDIENCE,
+        "iss": "auth.local.gd",
+        "sub": username,
+        "jti": str(user_id),
+        "exp": int(refresh_exp.timestamp()),
+    }
     token = {
         "access_token": claims,
-        "refresh_token": claims,
+        "refresh_token": refresh_claims,
         "exp": int(exp.timestamp()),
     }
     return token
+
+def load_profile(db_pool, user_id):
+    """
+    Reads the claims of a user for the profile cache.
+
+    :return: The username, roles and name, or None if there is no such user.
+    """
+    with db_pool.connection() as db:
+        user = db.execute(PROFILE_QUERY, [user_id]).fetchone()
+    if user is None:
+        return None
+    return {
+        "username": user["username"],
+        "roles": json.loads(user["roles"]),
+        "first_name": user["first_name"],
+        "last_name": user["last_name"],
+    }
  
     
+def forward_to_primary(replication, path, **kwargs):
+    """
+    Sends a write received by a replica to the primary, then waits until
+    the local replica has applied it, so the client can read its write
+    from this instance. The response body of the primary is passed on
+    as is; it need not be JSON, e.g. a plain-text 500.
+    """
+    try:
+        primary_response = replication.forward(path, **kwargs)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Primary unavailable")
+
+    headers = {name: primary_response.headers[name]
+               for name in ("Retry-After", TXID_HEADER) if name in primary_response.headers}
+    if TXID_HEADER in headers:
+        replication.wait_for(int(headers[TXID_HEADER], 16))
+    return Response(primary_response.content, status_code=primary_response.status_code, headers=headers,
+                    media_type=primary_response.headers.get("content-type"))
+
 # Operation/Resource 13
 @app.post("/register/", description="Register a new user")
-def register_new_user(usermodel: UserRegisterModel, db: sqlite3.Connection = Depends(get_db)):
+def register_new_user(usermodel: UserRegisterModel, response: Response,
+                      forwarded: bool = Header(False, alias=FORWARDED_HEADER, include_in_schema=False),
+                      db: sqlite3.Connection = Depends(get_db),
+                      password_pool: PasswordPool = Depends(get_password_pool),
+                      replication: Replication = Depends(get_replication)):
+    # Replicas are read-only; the primary hashes the password too
+    if not replication.is_primary():
+        if forwarded:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Not the primary", headers={"Retry-After": "1"})
+        return forward_to_primary(replication, "/register/", json=usermodel.model_dump())
+
     try:
         # Generate a random salt for each user 
-        hashed_password = hash_password(usermodel.password)
+        hashed_password = password_pool.hash(usermodel.password)
         cursor = db.cursor()
         cursor.execute("INSERT INTO user(id, username, hashed_password, first_name, last_name) VALUES (?, ?, ?, ?, ?)",
                        [usermodel.id, usermodel.username, hashed_password, usermodel.first_name, usermodel.last_name])
@@ -108,38 +223,111 @@ def register_new_user(usermodel: UserRegisterModel, db: sqlite3.Connection = Dep
             """, data)
         
         db.commit()
+        response.headers[TXID_HEADER] = format(replication.position(), "016x")
         return {"message": "User registration successful"}
 
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                             detail="Conflicts")
+    except HTTPException:
+        raise
     except Exception as e:
         #logger.exception("An error occurred during user registration")
         raise HTTPException(status_code=500, detail="User registration failed")
 
+@app.post("/register/bulk", description="Register many users from an NDJSON upload")
+async def bulk_register(request: Request, response: Response,
+                        forwarded: bool = Header(False, alias=FORWARDED_HEADER, include_in_schema=False),
+                        db: sqlite3.Connection = Depends(get_db),
+                        password_pool: PasswordPool = Depends(get_password_pool),
+                        replication: Replication = Depends(get_replication)):
+    """
+    The body holds one user per line, with the fields of POST /register/.
+    A line may carry a pbkdf2_sha256 hashed_password instead of a
+    password. Users are inserted in batches of 1000, one transaction each.
+
+    Returns:
+    - dict: The number of created, invalid, conflicting and failed rows,
+      and the status of every row.
+
+    Raises:
+    - HTTPException (415): If the body is not NDJSON.
+    """
+    if not replication.is_primary():
+        if forwarded:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Not the primary", headers={"Retry-After": "1"})
+        return await run_in_threadpool(forward_to_primary, replication, "/register/bulk",
+                                       content=await request.body(), timeout=BULK_FORWARD_TIMEOUT,
+                                       headers={"Content-Type": request.headers.get("content-type", "")})
+
+    registration = BulkRegistration(UserBulkRegisterModel, await run_in_threadpool(load_role_ids, db))
+    async for row_number, row in iter_rows(request):
+        if registration.add(row_number, row):
+            await run_in_threadpool(register_batch, db, password_pool, registration, registration.take_pending())
+    await run_in_threadpool(register_batch, db, password_pool, registration, registration.take_pending())
+
+    response.headers[TXID_HEADER] = format(replication.position(), "016x")
+    return registration.summary()
+
 # Operation/Resource 14
 @app.post("/login/", description="User Login")
-def login(logindata: UserLoginModel, db: sqlite3.Connection = Depends(get_db)):
+def login(logindata: UserLoginModel, db: sqlite3.Connection = Depends(get_db),
+          password_pool: PasswordPool = Depends(get_password_pool),
+          profile_cache: ProfileCache = Depends(get_profile_cache),
+          replication: Replication = Depends(get_replication),
+          txid: str | None = Header(None, alias=TXID_HEADER,
+                                    description="The TXID returned by a recent /register/")):
     try:
-        cursor = db.cursor()
-        cursor.execute("SELECT id, hashed_password, first_name, last_name FROM user WHERE username=? LIMIT 1", [logindata.username])
-        result = cursor.fetchone()
+        result = db.execute(LOGIN_QUERY, [logindata.username]).fetchone()
+
+        # The user may have just registered on the primary; catch up with
+        # the TXID of the registration, or else briefly with a recent
+        # primary position, before giving up
+        if not result and not replication.is_primary():
+            try:
+                target = int(txid, 16) if txid else replication.recent_primary_position()
+                caught_up = replication.wait_for(target, timeout=LOGIN_CATCH_UP_TIMEOUT)
+            except (ValueError, httpx.HTTPError):
+                caught_up = False
+            if caught_up:
+                result = db.execute(LOGIN_QUERY, [logindata.username]).fetchone()
 
         if not result:
             raise HTTPException(status_code=401, detail="wrong username & password combination") 
 
-        if not verify_password(logindata.password, result["hashed_password"]):
+        if not password_pool.verify(logindata.password, result["hashed_password"]):
             raise HTTPException(status_code=404, detail="Password mismatch")
         else:
-            cursor.execute('''SELECT roles.role_name
-                              FROM roles INNER JOIN user_role ON roles.id = user_role.role_id
-                              WHERE user_role.user_id = ? ''', [result["id"]])
-            rows = cursor.fetchall()       
-            list_of_rolenames = [row[0] for row in rows]
+            list_of_rolenames = json.loads(result["roles"])
+            profile_cache.put(result["id"], {"username": logindata.username, "roles": list_of_rolenames,
+                                             "first_name": result["first_name"], "last_name": result["last_name"]})
             return generate_claims(logindata.username, result["id"], list_of_rolenames, result["first_name"], result["last_name"])
             
 
+    except HTTPException:
+        raise
     except Exception as e:
         #logger.exception("An error occurred during password verification")    
         #raise HTTPException(status_code=e.status_code, detail=str(e.detail)) 
-        raise HTTPException(status_code=500, detail="User login failed")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="User login failed")
+
+# Operation/Resource 15
+@app.post("/refresh/", description="Re-issue tokens for a valid refresh token")
+def refresh(user_id: int = Header(alias="x-user-id", description="The jti claim of the refresh token"),
+            username: str = Header(alias="x-username", description="The sub claim of the refresh token"),
+            profile_cache: ProfileCache = Depends(get_profile_cache)):
+    # The gateway has already checked the signature, audience and expiry
+    # of the refresh token and passed its claims on as headers
+    try:
+        profile = profile_cache.get(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Token refresh failed")
+
+    if profile is None or profile["username"] != username:
+        raise HTTPException(status_code=401, detail="Unknown user")
+    return generate_claims(username, user_id, profile["roles"], profile["first_name"], profile["last_name"])
+
+@app.get("/replication/position/", include_in_schema=False)
+def replication_position(replication: Replication = Depends(get_replication)):
+    return {"txid": replication.position(), "primary": replication.is_primary()}
@@ -0,0 +1,217 @@
+import json
+import sqlite3
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows checked, hashed and inserted per transaction
+REGISTER_BATCH_ROWS = 1000
+
+CREATED = "created"
+INVALID = "invalid"
+CONFLICT = "conflict"
+FAILED = "failed"
+
+async def iter_rows(request: Request):
+    """
+    Parses an NDJSON request body as it arrives. Blank lines are skipped.
+
+    :return: An async iterator of (row number, dict) tuples, or of
+             (row number, error message) tuples for unparseable lines.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type != NDJSON_MEDIA_TYPE:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail=f"Expected {NDJSON_MEDIA_TYPE}")
+
+    row_number = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                row_number += 1
+                yield row_number, _parse_line(line)
+    if buffer.strip():
+        yield row_number + 1, _parse_line(buffer)
+
+def _parse_line(line):
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return f"Invalid JSON: {e}"
+    return row if isinstance(row, dict) else "Expected a JSON object"
+
+class BulkRegistration:
+    """Validates uploaded users and collects the per-row report.
+
+    Valid users are handed out in batches of REGISTER_BATCH_ROWS, so an
+    upload is never held in memory as a whole. IDs and usernames are
+    checked against the rest of the upload here and against the
+    database by register_batch.
+    """
+
+    def __init__(self, model, role_ids):
+        """
+        :param model: The pydantic model each row must satisfy.
+        :param role_ids: Role IDs by role name.
+        """
+        self.model = model
+        self.role_ids = role_ids
+        self.report = {}
+        self.pending = []
+        self._seen_ids = set()
+        self._seen_usernames = set()
+
+    def add(self, row_number, row):
+        """
+        Validates one row and queues its user.
+
+        :return: True once a full batch is waiting to be registered.
+        """
+        if isinstance(row, str):
+            self.record(row_number, INVALID, row)
+            return False
+        try:
+            user = self.model.model_validate(row)
+        except ValidationError as e:
+            self.record(row_number, INVALID, *(f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                                               for err in e.errors()))
+            return False
+
+        unknown_roles = [role for role in user.roles if role not in self.role_ids]
+        if unknown_roles:
+            self.record(row_number, INVALID, f"Unknown roles: {', '.join(unknown_roles)}")
+            return False
+        if user.id in self._seen_ids or user.username in self._seen_usernames:
+            self.record(row_number, INVALID, "Duplicate id or username in upload")
+            return False
+        self._seen_ids.add(user.id)
+        self._seen_usernames.add(user.username)
+
+        self.pending.append((row_number, user))
+        return len(self.pending) >= REGISTER_BATCH_ROWS
+
+    def take_pending(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+    def record(self, row_number, row_status, *errors):
+        self.report[row_number] = {"row": row_number, "status": row_status}
+        if errors:
+            self.report[row_number]["errors"] = list(errors)
+
+    def summary(self):
+        rows = [self.report[row_number] for row_number in sorted(self.report)]
+        counts = {CREATED: 0, INVALID: 0, CONFLICT: 0, FAILED: 0}
+        for row in rows:
+            counts[row["status"]] += 1
+        return {**counts, "rows": rows}
+
+def load_role_ids(db):
+    return {row["role_name"]: row["id"] for row in db.execute("SELECT id, role_name FROM roles")}
+
+def find_conflicts(db, rows):
+    """
+    Looks up the users of a batch whose id or username is taken.
+
+    :return: Error messages by row number.
+    """
+    ids = json.dumps([user.id for _, user in rows])
+    usernames = json.dumps([user.username for _, user in rows])
+    existing = db.execute("""
+        SELECT id, username FROM user
+        WHERE id IN (SELECT value FROM json_each(?)) OR username IN (SELECT value FROM json_each(?))
+    """, [ids, usernames]).fetchall()
+    taken_ids = {row["id"] for row in existing}
+    taken_usernames = {row["username"] for row in existing}
+
+    conflicts = {}
+    for row_number, user in rows:
+        if user.id in taken_ids:
+            conflicts[row_number] = f"User id {user.id} already exists"
+        elif user.username in taken_usernames:
+            conflicts[row_number] = f"Username {user.username} already exists"
+    return conflicts
+
+def _role_rows(user, role_ids):
+    return [(user.id, role_ids[role]) for role in dict.fromkeys(user.roles)]
+
+def insert_users(db, users, role_ids):
+    """
+    Inserts users and their roles in one transaction.
+
+    Tries a single executemany per table first. If a user registered
+    concurrently makes that fail, the batch is retried row by row under
+    savepoints, so only the conflicting rows are left out.
+
+    :param users: (row number, user, hashed password) tuples.
+    :return: Error messages of the rows that were not inserted, by row number.
+    """
+    user_rows = [(user.id, user.username, hashed_password, user.first_name, user.last_name)
+                 for _, user, hashed_password in users]
+    role_rows = [role_row for _, user, _ in users for role_row in _role_rows(user, role_ids)]
+    try:
+        with db:
+            db.executemany("INSERT INTO user(id, username, hashed_password, first_name, last_name) VALUES (?, ?, ?, ?, ?)",
+                           user_rows)
+            db.executemany("INSERT INTO user_role(user_id, role_id) VALUES (?, ?)", role_rows)
+        return {}
+    except sqlite3.IntegrityError:
+        pass
+
+    failures = {}
+    db.execute("BEGIN")
+    try:
+        for (row_number, user, _), user_row in zip(users, user_rows):
+            db.execute("SAVEPOINT bulk_row")
+            try:
+                db.execute("INSERT INTO user(id, username, hashed_password, first_name, last_name) VALUES (?, ?, ?, ?, ?)",
+                           user_row)
+                db.executemany("INSERT INTO user_role(user_id, role_id) VALUES (?, ?)", _role_rows(user, role_ids))
+            except sqlite3.IntegrityError as e:
+                db.execute("ROLLBACK TO bulk_row")
+                failures[row_number] = f"Conflicts: {e}"
+            db.execute("RELEASE bulk_row")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return failures
+
+def register_batch(db, password_pool, registration, rows):
+    """
+    Registers a batch of validated users: skips the ones that conflict
+    with existing users, hashes the plain-text passwords in parallel,
+    then inserts the rest. Runs on a worker thread.
+    """
+    if not rows:
+        return
+    conflicts = find_conflicts(db, rows)
+    for row_number, message in conflicts.items():
+        registration.record(row_number, CONFLICT, message)
+    rows = [(row_number, user) for row_number, user in rows if row_number not in conflicts]
+
+    plain = [user.password for _, user in rows if user.hashed_password is None]
+    try:
+        hashes = iter(password_pool.hash_many(plain))
+    except Exception as e:
+        # e.g. BrokenProcessPool after a worker process died
+        for row_number, _ in rows:
+            registration.record(row_number, FAILED, f"Password hashing failed: {e!r}")
+        return
+    users = [(row_number, user, user.hashed_password or next(hashes)) for row_number, user in rows]
+
+    try:
+        failures = insert_users(db, users, registration.role_ids)
+    except sqlite3.Error as e:
+        for row_number, _ in rows:
+            registration.record(row_number, FAILED, str(e))
+        return
+    for row_number, _ in rows:
+        if row_number in failures:
+            registration.record(row_number, CONFLICT, failures[row_number])
+        else:
+            registration.record(row_number, CREATED)
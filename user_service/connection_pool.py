@@ -0,0 +1,90 @@
+import contextlib
+import sqlite3
+import threading
+
+class ConnectionPool:
+    """Long-lived SQLite connections, one per concurrently running request.
+
+    Connections are configured once when they are opened instead of on
+    every request. A connection is handed to one request at a time, but
+    FastAPI may run a sync dependency and its route on different
+    threadpool threads, so connections are opened with
+    check_same_thread=False. Idle connections are reused LIFO, so the
+    pool settles at the number of busy worker threads.
+    """
+
+    def __init__(self, path, size=40, cached_statements=256, mmap_size=64 * 1024 * 1024, busy_timeout_ms=5000):
+        """
+        :param path: The path of the database file.
+        :param size: The maximum number of idle connections kept.
+        :param cached_statements: Prepared statements cached per connection.
+        :param mmap_size: Bytes of the database file to memory-map.
+        :param busy_timeout_ms: How long a writer waits for a lock.
+        """
+        self.path = path
+        self.size = size
+        self.cached_statements = cached_statements
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                             cached_statements=self.cached_statements, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA foreign_keys=ON")
+        db.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        db.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        db.execute("PRAGMA temp_store=MEMORY")
+        #db.set_trace_callback(logging.debug)
+        return db
+
+    @staticmethod
+    def _healthy(db):
+        try:
+            db.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def checkout(self):
+        while True:
+            with self._lock:
+                db = self._idle.pop() if self._idle else None
+            if db is None:
+                return self._connect()
+            if self._healthy(db):
+                return db
+            with contextlib.suppress(sqlite3.Error):
+                db.close()
+
+    def checkin(self, db):
+        try:
+            # A route that raised may have left a transaction open
+            if db.in_transaction:
+                db.rollback()
+        except sqlite3.Error:
+            with contextlib.suppress(sqlite3.Error):
+                db.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(db)
+                return
+        db.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        db = self.checkout()
+        try:
+            yield db
+        finally:
+            self.checkin(db)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db in idle:
+            with contextlib.suppress(sqlite3.Error):
+                db.close()
@@ -1,19 +1,46 @@
-import sqlite3
-import contextlib
 # import logging
+from fastapi import Request
 from pydantic_settings import BaseSettings
+from .connection_pool import ConnectionPool
 
 class Settings(BaseSettings, env_file=".env", extra="ignore"):
     USER_SERVICE_PRIMARY_DB_PATH: str
+    USER_SERVICE_SECONDARY_DB_PATH: str | None = None
+    USER_SERVICE_TERTIARY_DB_PATH: str | None = None
+    # The LiteFS node this instance runs on: PRIMARY, SECONDARY or TERTIARY
+    USER_SERVICE_REPLICA: str = "PRIMARY"
+    USER_SERVICE_PRIMARY_URL: str = "http://localhost:5200"
+    USER_SERVICE_DB_POOL_SIZE: int = 40
+    USER_SERVICE_DB_CACHED_STATEMENTS: int = 256
+    USER_SERVICE_DB_MMAP_SIZE: int = 64 * 1024 * 1024
+    USER_SERVICE_DB_BUSY_TIMEOUT_MS: int = 5000
+    # Instances sharing the cores of this host (one per LiteFS node); each
+    # gets cores / instances password workers unless set explicitly
+    USER_SERVICE_LOCAL_INSTANCES: int = 3
+    USER_SERVICE_PASSWORD_WORKERS: int | None = None
     #logging_config: str #= "./etc/logging.ini"
 
+    @property
+    def db_path(self):
+        """The path of the database replica local to this instance."""
+        path = getattr(self, f"USER_SERVICE_{self.USER_SERVICE_REPLICA.upper()}_DB_PATH", None)
+        if path is None:
+            raise ValueError(f"No database path set for replica {self.USER_SERVICE_REPLICA}")
+        return path
+
 # logging.basicConfig(filename=f'{__name__}.log', format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.DEBUG)
 
 settings = Settings()
 
-def get_db():
-    with contextlib.closing(sqlite3.connect(settings.USER_SERVICE_PRIMARY_DB_PATH)) as db:
-        db.row_factory = sqlite3.Row
-        db.execute("PRAGMA foreign_keys=ON")
-        #db.set_trace_callback(logging.debug)
-        yield db
\ No newline at end of file
+def create_pool(path=None):
+    return ConnectionPool(
+        path or settings.db_path,
+        size=settings.USER_SERVICE_DB_POOL_SIZE,
+        cached_statements=settings.USER_SERVICE_DB_CACHED_STATEMENTS,
+        mmap_size=settings.USER_SERVICE_DB_MMAP_SIZE,
+        busy_timeout_ms=settings.USER_SERVICE_DB_BUSY_TIMEOUT_MS,
+    )
+
+def get_db(request: Request):
+    with request.app.state.db_pool.connection() as db:
+        yield db
@@ -0,0 +1,90 @@
+import os
+import time
+import anyio.to_thread
+from fastapi import APIRouter, Request, Response
+from prometheus_client import (CollectorRegistry, Gauge, Histogram, CONTENT_TYPE_LATEST,
+                               REGISTRY, generate_latest, multiprocess)
+from starlette.routing import Match
+
+# Samples of every uvicorn process are written to PROMETHEUS_MULTIPROC_DIR,
+# which the enrollment service shares; only user_ metrics are exposed here.
+METRICS_PREFIX = "user_"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "user_http_request_duration_seconds", "Request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "user_http_requests_in_progress", "Requests being served by route",
+    ["method", "route"], multiprocess_mode="livesum",
+)
+THREADPOOL_BUSY = Gauge(
+    "user_threadpool_busy_threads", "Worker threads running sync routes",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_SIZE = Gauge(
+    "user_threadpool_size", "Worker threads available to sync routes",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_WAITING = Gauge(
+    "user_threadpool_waiting_tasks", "Sync routes waiting for a worker thread",
+    multiprocess_mode="livesum",
+)
+
+def route_template(app, scope):
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+def update_threadpool_gauges():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    THREADPOOL_BUSY.set(statistics.borrowed_tokens)
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+    THREADPOOL_WAITING.set(statistics.tasks_waiting)
+
+async def metrics_middleware(request: Request, call_next):
+    route = route_template(request.app, request.scope)
+    in_progress = REQUESTS_IN_PROGRESS.labels(request.method, route)
+    in_progress.inc()
+    update_threadpool_gauges()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        REQUEST_LATENCY.labels(request.method, route, str(status_code)).observe(time.perf_counter() - started)
+        in_progress.dec()
+        update_threadpool_gauges()
+
+class _PrefixCollector:
+    def __init__(self, collector, prefix):
+        self.collector = collector
+        self.prefix = prefix
+
+    def collect(self):
+        return (metric for metric in self.collector.collect() if metric.name.startswith(self.prefix))
+
+def exposition():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    registry.register(_PrefixCollector(multiprocess.MultiProcessCollector(CollectorRegistry()), METRICS_PREFIX))
+    return generate_latest(registry)
+
+def mark_process_dead():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    update_threadpool_gauges()
+    return Response(exposition(), media_type=CONTENT_TYPE_LATEST)
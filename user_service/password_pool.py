@@ -0,0 +1,111 @@
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, Request, status
+from prometheus_client import Counter, Gauge, Histogram
+
+HASH_LATENCY = Histogram(
+    "user_password_hash_duration_seconds", "Time to hash or verify a password, queueing included",
+    ["operation"], buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+QUEUE_DEPTH = Gauge(
+    "user_password_queue_depth", "Password operations submitted and not finished",
+    multiprocess_mode="livesum",
+)
+REJECTED = Counter(
+    "user_password_rejected", "Password operations rejected because the queue was full",
+    ["operation"],
+)
+
+# Seconds a rejected client is asked to wait before retrying
+RETRY_AFTER_SECONDS = 1
+
+def default_workers(instances=1):
+    """Returns this process's share of the available cores, at least one."""
+    return max(len(os.sched_getaffinity(0)) // max(instances, 1), 1)
+
+class PasswordPool:
+    """Runs PBKDF2 hashing and verification in a process pool.
+
+    Keeps the CPU-bound work off the request threads and outside the
+    GIL. At most max_pending operations are queued or running; beyond
+    that, callers get an immediate 503 with Retry-After, so a login
+    burst cannot build an unbounded queue or starve other routes.
+    """
+
+    def __init__(self, hash_password, verify_password, max_workers=None, max_pending=None):
+        """
+        :param hash_password: The hashing function; must be picklable.
+        :param verify_password: The verification function; must be picklable.
+        :param max_workers: Worker processes (default: available cores).
+        :param max_pending: Operations queued or running (default: 4 per worker).
+        """
+        self.hash_password = hash_password
+        self.verify_password = verify_password
+        self.max_workers = max_workers or default_workers()
+        self.max_pending = max_pending or self.max_workers * 4
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        # Bulk hashing holds at most one slot per worker at a time
+        self._bulk_slots = threading.BoundedSemaphore(self.max_workers)
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def _run(self, operation, func, *args):
+        if not self._slots.acquire(blocking=False):
+            REJECTED.labels(operation).inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent password operations",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        QUEUE_DEPTH.inc()
+        started = time.perf_counter()
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            HASH_LATENCY.labels(operation).observe(time.perf_counter() - started)
+            QUEUE_DEPTH.dec()
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run("hash", self.hash_password, password)
+
+    def verify(self, password, password_hash):
+        return self._run("verify", self.verify_password, password, password_hash)
+
+    def hash_many(self, passwords):
+        """
+        Hashes a batch of passwords in parallel.
+
+        Unlike hash(), waits for free slots instead of rejecting, but never
+        holds more than max_workers of them, so a bulk upload keeps every
+        worker busy while logins can still be admitted.
+        """
+        def done(started, future):
+            HASH_LATENCY.labels("bulk_hash").observe(time.perf_counter() - started)
+            QUEUE_DEPTH.dec()
+            self._slots.release()
+            self._bulk_slots.release()
+
+        futures = []
+        for password in passwords:
+            self._bulk_slots.acquire()
+            self._slots.acquire()
+            QUEUE_DEPTH.inc()
+            try:
+                future = self._executor.submit(self.hash_password, password)
+            except Exception:
+                QUEUE_DEPTH.dec()
+                self._slots.release()
+                self._bulk_slots.release()
+                raise
+            future.add_done_callback(functools.partial(done, time.perf_counter()))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        self._executor.shutdown(cancel_futures=True)
+
+def get_password_pool(request: Request) -> PasswordPool:
+    return request.app.state.password_pool
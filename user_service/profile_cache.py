@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Request
+
+class ProfileCache:
+    """In-process LRU of the claims of a user: username, roles and name.
+
+    Lets /refresh/ re-issue tokens without touching the database on the
+    hot path. Users are never updated after registration, so a short TTL
+    is enough to bound staleness.
+    """
+
+    def __init__(self, load_profile, maxsize=4096, ttl=300):
+        """
+        :param load_profile: Called with a user ID on a miss; returns the
+            profile dict, or None when the user does not exist.
+        :param maxsize: The maximum number of users kept.
+        :param ttl: Seconds an entry is served before it is reloaded.
+        """
+        self.load_profile = load_profile
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        profile = self.load_profile(user_id)
+        if profile is not None:
+            self.put(user_id, profile)
+        return profile
+
+    def put(self, user_id, profile):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, profile)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+def get_profile_cache(request: Request) -> ProfileCache:
+    return request.app.state.profile_cache
@@ -0,0 +1,22 @@
+# The user row and its role names in one statement. The user columns are
+# all read from user_login_index; the roles come from the user_role
+# primary key, as a JSON array ("[]" for a user without roles).
+# INDEXED BY is needed because the planner otherwise takes the index of
+# the UNIQUE constraint on username, which is not covering.
+LOGIN_QUERY = """
+    SELECT id, hashed_password, first_name, last_name,
+           (SELECT json_group_array(roles.role_name)
+            FROM user_role INNER JOIN roles ON roles.id = user_role.role_id
+            WHERE user_role.user_id = user.id) AS roles
+    FROM user INDEXED BY user_login_index
+    WHERE username = ?
+"""
+
+PROFILE_QUERY = """
+    SELECT username, first_name, last_name,
+           (SELECT json_group_array(roles.role_name)
+            FROM user_role INNER JOIN roles ON roles.id = user_role.role_id
+            WHERE user_role.user_id = user.id) AS roles
+    FROM user
+    WHERE id = ?
+"""
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+import httpx
+from fastapi import Request
+
+# Set by a replica on a write it forwards, so a node that has lost the
+# primary lease answers 503 instead of forwarding the write again
+FORWARDED_HEADER = "x-forwarded-to-primary"
+
+# Sent by the primary with every write: the LiteFS TXID that contains it
+TXID_HEADER = "x-litefs-txid"
+
+POLL_INTERVAL = 0.01
+
+# A failed login on a replica checks whether the user was registered on
+# the primary since. Those checks share one recent primary position, and
+# neither fetching it nor catching up with it may stall a login for long.
+PRIMARY_POSITION_MAX_AGE = 0.5
+PRIMARY_POSITION_TIMEOUT = 0.2
+
+class Replication:
+    """The LiteFS node an instance of the user service runs on.
+
+    LiteFS creates a .primary file in the mount directory of every
+    replica, and keeps the replication position of each database in a
+    "<database>-pos" file holding "<TXID>/<checksum>" in hex. Outside
+    LiteFS neither file exists, so the instance acts as a primary.
+    """
+
+    def __init__(self, db_path, primary_url, wait_timeout=5.0, forward_timeout=30.0):
+        """
+        :param db_path: The path of the database in the LiteFS mount.
+        :param primary_url: The base URL of the instance on the primary node.
+        :param wait_timeout: Seconds to wait for this replica to catch up.
+        :param forward_timeout: Seconds to wait for a forwarded write.
+        """
+        self.db_path = db_path
+        self.primary_url = primary_url.rstrip("/")
+        self.wait_timeout = wait_timeout
+        self._client = httpx.Client(timeout=forward_timeout)
+        self._primary_position = (0, float("-inf"))  # (TXID, time.monotonic() it was read)
+        self._primary_position_lock = threading.Lock()
+
+    def is_primary(self):
+        return not os.path.exists(os.path.join(os.path.dirname(self.db_path), ".primary"))
+
+    def position(self):
+        """Returns the TXID this node has applied, or 0 outside LiteFS."""
+        try:
+            with open(f"{self.db_path}-pos") as f:
+                return int(f.read().split("/", 1)[0], 16)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def wait_for(self, txid, timeout=None):
+        """
+        Blocks until this node has applied the given TXID.
+
+        :param timeout: Seconds to wait, wait_timeout by default.
+        :return: False if the node did not catch up in time.
+        """
+        deadline = time.monotonic() + (self.wait_timeout if timeout is None else timeout)
+        while self.position() < txid:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+        return True
+
+    def forward(self, path, json=None, content=None, headers=None, timeout=httpx.USE_CLIENT_DEFAULT):
+        """POSTs a write to the primary and returns its httpx.Response."""
+        return self._client.post(f"{self.primary_url}{path}", json=json, content=content,
+                                 headers={**(headers or {}), FORWARDED_HEADER: "1"}, timeout=timeout)
+
+    def primary_position(self, timeout=httpx.USE_CLIENT_DEFAULT):
+        response = self._client.get(f"{self.primary_url}/replication/position/", timeout=timeout)
+        response.raise_for_status()
+        return response.json()["txid"]
+
+    def recent_primary_position(self):
+        """
+        Returns the TXID of the primary as read at most
+        PRIMARY_POSITION_MAX_AGE seconds ago. Concurrent callers share
+        one request.
+        """
+        with self._primary_position_lock:
+            txid, read_at = self._primary_position
+            if time.monotonic() - read_at > PRIMARY_POSITION_MAX_AGE:
+                txid = self.primary_position(timeout=PRIMARY_POSITION_TIMEOUT)
+                self._primary_position = (txid, time.monotonic())
+            return txid
+
+    def close(self):
+        self._client.close()
+
+def get_replication(request: Request) -> Replication:
+    return request.app.state.replication